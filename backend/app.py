@@ -1,11 +1,37 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-import psycopg2
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Match
+from contextlib import asynccontextmanager
+import asyncio
+import time
 from dotenv import load_dotenv
-import os
 from typing import Optional
+from datetime import datetime
+from starlette.concurrency import run_in_threadpool
+import psycopg2
+import db
+import metrics
+import search
+from db import execute_query, to_columnar
+from cache import FastJSONResponse, cached_response, cache_stats, current_snapshot_id
+from snapshots import LATEST_SNAPSHOT, row_time_bounds, valid_at
+from downsample import lttb
+from rollups import BUCKET_SIZES
+from export import EXPORT_TABLES, FORMATS as EXPORT_FORMATS, build_export_query, encode_csv, encode_ndjson
+from pagination import decode_cursor, keyset_condition, order_by, page_size, paginate
 
-app = FastAPI(title="Gaming Intelligence API")
+@asynccontextmanager
+async def lifespan(app):
+    try:
+        await run_in_threadpool(db.init_pool)
+    except Exception as e:
+        # The pool is created lazily on first query if the database is unreachable at boot
+        print(f"Database pool initialization failed: {e}")
+    yield
+    await run_in_threadpool(db.close_pool)
+
+app = FastAPI(title="Gaming Intelligence API", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,7 +42,43 @@ app.add_middleware(
 )
 
 load_dotenv()
-SUPABASE_URL = os.getenv("SUPABASE_URL")
+
+def route_template(scope):
+    """Path template of the route a request will hit, so metrics are not labelled per game name"""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    endpoint = route_template(request.scope)
+    context = {"endpoint": endpoint, "db_error": False}
+    token = metrics.request_context.set(context)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    except Exception:
+        metrics.HTTP_REQUEST_ERRORS.inc(endpoint=endpoint, kind="exception")
+        raise
+    finally:
+        metrics.request_context.reset(token)
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, method=request.method, status=status)
+        if context["db_error"]:
+            metrics.HTTP_REQUEST_ERRORS.inc(endpoint=endpoint, kind="db_error")
+        elif status >= 500:
+            metrics.HTTP_REQUEST_ERRORS.inc(endpoint=endpoint, kind="http_5xx")
+
+@app.get("/metrics")
+async def get_metrics():
+    stats = db.pool_stats()
+    for state in ("in_use", "idle"):
+        metrics.DB_POOL.set(stats.get(state, 0), state=state)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 async def root():
@@ -27,128 +89,405 @@ async def root():
             "/top-genres", 
             "/playtime-insights",
             "/affordable-games",
-            "/top-creators"
+            "/top-creators",
+            "/dashboard",
+            "/search",
+            "/metrics",
+            "/pool-stats",
+            "/cache-stats",
+            "/games/{name}/history",
+            "/creators/{creator_id}/history",
+            "/export/{table}"
         ]
     }
 
-def execute_query(query, params=None):
-    """Helper function to execute SQL queries and return results as dictionaries"""
+@app.get("/pool-stats")
+async def get_pool_stats():
+    return db.pool_stats()
+
+@app.get("/cache-stats")
+async def get_cache_stats():
+    return cache_stats()
+
+async def load_snapshot_id():
+    rows = await execute_query("SELECT snapshot_id FROM current_snapshot", name="current_snapshot")
+    if isinstance(rows, list) and rows:
+        return rows[0]["snapshot_id"]
+    return None
+
+def cached_query(request, endpoint, key_params, query, params=None, transform=None, format="rows"):
+    """Run an endpoint query through the snapshot-scoped response cache.
+
+    format="columnar" returns {columns, data} instead of a list of row objects.
+    """
+    columnar = format == "columnar"
+
+    async def load():
+        if columnar and transform is None:
+            return await execute_query(query, params, columnar=True, name=endpoint)
+        rows = await execute_query(query, params, name=endpoint)
+        rows = transform(rows) if transform else rows
+        return to_columnar(rows) if columnar else rows
+    key_params = {**key_params, "format": "columnar" if columnar else None}
+    return cached_response(request, endpoint, key_params, load, load_snapshot_id)
+
+def parse_cursor(cursor, order, filters):
     try:
-        conn = psycopg2.connect(SUPABASE_URL)
-        cursor = conn.cursor()
-        
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-            
-        columns = [desc[0] for desc in cursor.description] if cursor.description else []
-        results = []
-        for row in cursor.fetchall():
-            results.append(dict(zip(columns, row)))
-        
-        cursor.close()
-        conn.close()
-        return results
-    except psycopg2.Error as e:
-        return {"error": f"Database query error: {str(e)}"}
+        return decode_cursor(cursor, order, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/trending-games")
-async def get_trending_games(limit: int = 10, genre: Optional[str] = None, source: Optional[str] = None):
-    query = """
-        SELECT DISTINCT name, player_count, price, avg_playtime, genres, timestamp, source
+TRENDING_ORDER = [
+    ("player_count", "DESC", "player_count"),
+    ("name", "ASC", "name"),
+    ("source", "ASC", "source"),
+]
+
+ENGAGEMENT_SCORE = "CASE WHEN video_count > 0 THEN total_views::FLOAT / video_count ELSE 0 END"
+CREATOR_TIEBREAK = [
+    ("name", "ASC", "name"),
+    ("platform", "ASC", "platform"),
+    ("creator_id", "ASC", "creator_id"),
+    ("game_name", "ASC", "game_name"),
+]
+CREATOR_ORDERS = {
+    "total_views": [("total_views", "DESC", "total_views")] + CREATOR_TIEBREAK,
+    "subscriber_count": [("subscriber_count", "DESC", "subscriber_count")] + CREATOR_TIEBREAK,
+    "engagement_score": [(ENGAGEMENT_SCORE, "DESC", "engagement_score")] + CREATOR_TIEBREAK,
+}
+
+def snapshot_filter(snapshot_id=None):
+    """WHERE condition for one snapshot; the published one unless an explicit id is pinned"""
+    if snapshot_id is None:
+        return f"snapshot_id = {LATEST_SNAPSHOT}", []
+    return "snapshot_id = %s", [snapshot_id]
+
+def game_snapshot_filter(snapshot_id=None):
+    """snapshot_filter for game_stats, bounded to the snapshot's row timestamps so a
+    partitioned game_stats only scans the partitions holding the snapshot"""
+    snapshot_sql, params = snapshot_filter(snapshot_id)
+    bounds_sql, bounds_params = row_time_bounds(snapshot_id)
+    return f"{snapshot_sql} AND {bounds_sql}", params + bounds_params
+
+def trending_games_query(limit=10, genre=None, source=None, cursor_values=None, snapshot_id=None):
+    snapshot_sql, params = game_snapshot_filter(snapshot_id)
+    query = f"""
+        SELECT name, player_count, price, avg_playtime, genres, timestamp, source
         FROM game_stats
-        WHERE DATE(timestamp) = (
-            SELECT DATE(MAX(timestamp))
-            FROM game_stats
-        )
+        WHERE {snapshot_sql}
     """
-    params = []
     if genre:
-        query += " AND genres LIKE %s"
-        params.append(f"%{genre}%")
+        query += " AND genre_list @> ARRAY[%s]::TEXT[]"
+        params.append(genre)
     if source:
         query += " AND source = %s"
         params.append(source)
-    query += " ORDER BY player_count DESC, name ASC LIMIT %s"
+    if cursor_values:
+        keyset_sql, keyset_params = keyset_condition(TRENDING_ORDER, cursor_values)
+        query += keyset_sql
+        params.extend(keyset_params)
+    query += order_by(TRENDING_ORDER) + " LIMIT %s"
     params.append(limit)
-    
-    return execute_query(query, params)
+    return query, params
 
-@app.get("/top-genres")
-async def get_top_genres():
-    query = """
-        SELECT UNNEST(STRING_TO_ARRAY(genres, ', ')) AS genre, SUM(player_count) AS total_players
-        FROM game_stats
-        WHERE DATE(timestamp) = (
-            SELECT DATE(MAX(timestamp))
-            FROM game_stats
-        )
-        GROUP BY genre
-        ORDER BY total_players DESC
+def top_genres_query(snapshot_id=None):
+    snapshot_sql, params = snapshot_filter(snapshot_id)
+    query = f"""
+        SELECT genre, total_players
+        FROM genre_stats
+        WHERE {snapshot_sql}
+        ORDER BY total_players DESC, genre ASC
         LIMIT 5
     """
-    return execute_query(query)
+    return query, params
 
-@app.get("/playtime-insights")
-async def get_playtime_insights():
-    query = """
+def playtime_insights_query(snapshot_id=None):
+    snapshot_sql, params = game_snapshot_filter(snapshot_id)
+    query = f"""
         SELECT name, avg_playtime, genres, source
         FROM game_stats
-        WHERE DATE(timestamp) = (
-            SELECT DATE(MAX(timestamp))
-            FROM game_stats
-        )
+        WHERE {snapshot_sql}
         ORDER BY avg_playtime DESC
         LIMIT 5
     """
-    return execute_query(query)
+    return query, params
 
-@app.get("/affordable-games")
-async def get_affordable_games():
-    query = """
+def affordable_games_query(max_price=10.0, currency="USD", snapshot_id=None):
+    snapshot_sql, params = game_snapshot_filter(snapshot_id)
+    query = f"""
         SELECT name, player_count, price, genres, source
         FROM game_stats
-        WHERE DATE(timestamp) = (
-            SELECT DATE(MAX(timestamp))
-            FROM game_stats
-        )
-        AND (
-            price = 'Free'
-            OR (
-                price ~ '^\\$?\\d*\\.?\\d{0,2}$'
-                AND CAST(REGEXP_REPLACE(price, '[^\\d.]', '') AS FLOAT) <= 10.0
-            )
-        )
+        WHERE {snapshot_sql}
+        AND price_cents <= %s
+        AND (price_cents = 0 OR currency = %s)
         ORDER BY player_count DESC, name ASC
         LIMIT 5
     """
-    return execute_query(query)
+    params += [round(max_price * 100), currency]
+    return query, params
 
-@app.get("/top-creators")
-async def get_top_creators(limit: int = 10, platform: Optional[str] = None, game_name: Optional[str] = None, sort_by: str = "total_views"):
-    sort_column = "total_views"
-    if sort_by == "subscriber_count":
-        sort_column = "subscriber_count"
-    elif sort_by == "engagement_score":
-        sort_column = "CASE WHEN video_count > 0 THEN total_views::FLOAT / video_count ELSE 0 END"
+def top_creators_query(limit=10, platform=None, game_name=None, sort_by="total_views", cursor_values=None, snapshot_id=None):
+    order = CREATOR_ORDERS.get(sort_by, CREATOR_ORDERS["total_views"])
+    # creator_stats only stores changes, so a snapshot's state is the rows valid at it
+    snapshot_sql, params = valid_at(snapshot_id)
     query = f"""
         SELECT creator_id, name, platform, subscriber_count, video_count, total_views, game_name,
-            CASE WHEN video_count > 0 THEN total_views::FLOAT / video_count ELSE 0 END AS engagement_score
+            {ENGAGEMENT_SCORE} AS engagement_score
         FROM creator_stats
-        WHERE DATE(timestamp) = (
-            SELECT DATE(MAX(timestamp))
-            FROM creator_stats
-        )
+        WHERE {snapshot_sql}
     """
-    params = []
     if platform:
         query += " AND platform = %s"
         params.append(platform)
     if game_name:
         query += " AND game_name = %s"
         params.append(game_name)
-    query += f" ORDER BY {sort_column} DESC, name ASC LIMIT %s"
+    if cursor_values:
+        keyset_sql, keyset_params = keyset_condition(order, cursor_values)
+        query += keyset_sql
+        params.extend(keyset_params)
+    query += order_by(order) + " LIMIT %s"
     params.append(limit)
+    return query, params
+
+@app.get("/trending-games")
+async def get_trending_games(request: Request, limit: int = 10, genre: Optional[str] = None, source: Optional[str] = None,
+                             cursor: Optional[str] = None, format: str = "rows"):
+    """Pass cursor (empty for the first page) to page through results as {data, next_cursor}"""
+    filters = {"genre": genre, "source": source}
+    cursor_values = parse_cursor(cursor, TRENDING_ORDER, filters) if cursor else None
+    query, params = trending_games_query(page_size(limit, cursor), genre, source, cursor_values)
+    
+    key_params = {"limit": limit, "genre": genre, "source": source}
+    if cursor is None:
+        return await cached_query(request, "trending-games", key_params, query, params, format=format)
+    return await cached_query(
+        request, "trending-games:page", {**key_params, "cursor": cursor}, query, params,
+        transform=lambda rows: paginate(rows, limit, TRENDING_ORDER, filters), format=format
+    )
+
+@app.get("/top-genres")
+async def get_top_genres(request: Request, format: str = "rows"):
+    query, params = top_genres_query()
+    return await cached_query(request, "top-genres", {}, query, params, format=format)
+
+@app.get("/playtime-insights")
+async def get_playtime_insights(request: Request, format: str = "rows"):
+    query, params = playtime_insights_query()
+    return await cached_query(request, "playtime-insights", {}, query, params, format=format)
+
+@app.get("/affordable-games")
+async def get_affordable_games(request: Request, max_price: float = 10.0, currency: str = "USD", format: str = "rows"):
+    query, params = affordable_games_query(max_price, currency)
+    return await cached_query(
+        request, "affordable-games", {"max_price": max_price, "currency": currency}, query, params, format=format
+    )
+
+@app.get("/top-creators")
+async def get_top_creators(request: Request, limit: int = 10, platform: Optional[str] = None, game_name: Optional[str] = None, sort_by: str = "total_views",
+                           cursor: Optional[str] = None, format: str = "rows"):
+    """Pass cursor (empty for the first page) to page through results as {data, next_cursor}"""
+    order = CREATOR_ORDERS.get(sort_by, CREATOR_ORDERS["total_views"])
+    filters = {"platform": platform, "game_name": game_name}
+    cursor_values = parse_cursor(cursor, order, filters) if cursor else None
+    query, params = top_creators_query(page_size(limit, cursor), platform, game_name, sort_by, cursor_values)
     
-    return execute_query(query, params)
\ No newline at end of file
+    key_params = {"limit": limit, "platform": platform, "game_name": game_name, "sort_by": sort_by}
+    if cursor is None:
+        return await cached_query(request, "top-creators", key_params, query, params, format=format)
+    return await cached_query(
+        request, "top-creators:page", {**key_params, "cursor": cursor}, query, params,
+        transform=lambda rows: paginate(rows, limit, order, filters), format=format
+    )
+
+DASHBOARD_PANELS = ("trending_games", "top_genres", "playtime_insights", "affordable_games", "top_creators")
+
+@app.get("/dashboard")
+async def get_dashboard(request: Request, panels: Optional[str] = None,
+                        trending_limit: int = 10, genre: Optional[str] = None, source: Optional[str] = None,
+                        max_price: float = 10.0, currency: str = "USD",
+                        creators_limit: int = 10, platform: Optional[str] = None, game_name: Optional[str] = None,
+                        sort_by: str = "total_views"):
+    """Several dashboard panels in one response, all read from the same snapshot.
+
+    panels is a comma-separated subset of DASHBOARD_PANELS (default: all). The other
+    parameters are passed through to the matching panel.
+    """
+    selected = [panel for panel in DASHBOARD_PANELS if panels is None or panel in panels.split(",")]
+
+    async def load():
+        snapshot_id = await load_snapshot_id()
+        if snapshot_id is None:
+            return {"snapshot_id": None, **{panel: [] for panel in selected}}
+        builders = {
+            "trending_games": lambda: trending_games_query(trending_limit, genre, source, snapshot_id=snapshot_id),
+            "top_genres": lambda: top_genres_query(snapshot_id),
+            "playtime_insights": lambda: playtime_insights_query(snapshot_id),
+            "affordable_games": lambda: affordable_games_query(max_price, currency, snapshot_id),
+            "top_creators": lambda: top_creators_query(creators_limit, platform, game_name, sort_by, snapshot_id=snapshot_id),
+        }
+        # Each panel runs on its own pooled connection, so they execute concurrently
+        results = await asyncio.gather(*(execute_query(*builders[panel](), name=f"dashboard:{panel}") for panel in selected))
+        payload = {"snapshot_id": snapshot_id}
+        for panel, result in zip(selected, results):
+            if isinstance(result, dict):
+                return result
+            payload[panel] = result
+        return payload
+
+    return await cached_response(
+        request, "dashboard",
+        {"panels": ",".join(selected), "trending_limit": trending_limit, "genre": genre, "source": source,
+         "max_price": max_price, "currency": currency, "creators_limit": creators_limit,
+         "platform": platform, "game_name": game_name, "sort_by": sort_by},
+        load, load_snapshot_id,
+    )
+
+@app.get("/search")
+async def search_names(q: str, limit: int = 10, types: Optional[str] = None, fuzzy: bool = True):
+    """Games, creators and genres whose names match q, best first, for search boxes and autocomplete.
+
+    Served from an in-process index of the current snapshot, so a query costs no database
+    round trip. types is a comma-separated subset of game, creator and genre (default: all).
+    """
+    kinds = tuple(types.split(",")) if types else search.KINDS
+    unknown = [kind for kind in kinds if kind not in search.KINDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown types {', '.join(unknown)}, expected {', '.join(search.KINDS)}")
+    index = await search.current_index(await current_snapshot_id(load_snapshot_id))
+    if isinstance(index, dict):
+        return index
+    with metrics.phase("search"):
+        results = index.search(q, max(1, min(limit, search.SEARCH_MAX_LIMIT)), kinds, fuzzy)
+    return {"query": q, "snapshot_id": index.snapshot_id, "results": results}
+
+def check_history_params(bucket, points):
+    if bucket not in BUCKET_SIZES:
+        raise HTTPException(status_code=400, detail=f"Unknown bucket, expected one of {', '.join(BUCKET_SIZES)}")
+    if points < 3:
+        raise HTTPException(status_code=400, detail="points must be at least 3")
+
+def _delta(current, previous):
+    return None if current is None or previous is None else current - previous
+
+def creator_deltas(rows):
+    """Subscriber and view growth of each returned point since the previous returned point
+    of its platform; a platform's first point counts from the start of its own bucket"""
+    previous = {}
+    result = []
+    for row in rows:
+        last = previous.get(row["platform"])
+        point = {
+            "bucket_start": row["bucket_start"],
+            "platform": row["platform"],
+            "subscriber_count": row["subscriber_count"],
+            "total_views": row["total_views"],
+            "video_count": row["video_count"],
+            "subscriber_delta": _delta(row["subscriber_count"], last["subscriber_count"] if last else row["first_subscribers"]),
+            "views_delta": _delta(row["total_views"], last["total_views"] if last else row["first_views"]),
+        }
+        previous[row["platform"]] = point
+        result.append(point)
+    return result
+
+async def downsampled_history(name, query, params, points, y_key, format="rows", transform=None):
+    """Rows of a history query downsampled to points; transform then runs on the kept rows only"""
+    rows = await execute_query(query, params, name=name)
+    if isinstance(rows, dict):
+        return rows
+    rows = lttb(rows, points, lambda row: row["bucket_start"].timestamp(), lambda row: float(row[y_key] or 0))
+    if transform:
+        rows = transform(rows)
+    return to_columnar(rows) if format == "columnar" else rows
+
+@app.get("/games/{name}/history")
+async def get_game_history(request: Request, name: str, bucket: str = "day", source: Optional[str] = None,
+                           start: Optional[datetime] = None, end: Optional[datetime] = None, points: int = 200,
+                           format: str = "rows"):
+    check_history_params(bucket, points)
+    query = """
+        SELECT bucket_start, source, min_players, max_players,
+            sum_players::FLOAT / sample_count AS avg_players, last_players
+        FROM game_stats_rollup
+        WHERE bucket_size = %s AND name = %s
+    """
+    params = [bucket, name]
+    if source:
+        query += " AND source = %s"
+        params.append(source)
+    if start:
+        query += " AND bucket_start >= %s"
+        params.append(start)
+    if end:
+        query += " AND bucket_start < %s"
+        params.append(end)
+    query += " ORDER BY bucket_start ASC"
+
+    return await cached_response(
+        request, "game-history",
+        {"name": name, "bucket": bucket, "source": source, "start": start, "end": end, "points": points,
+         "format": format},
+        lambda: downsampled_history("game-history", query, params, points, "avg_players", format),
+        load_snapshot_id,
+    )
+
+@app.get("/creators/{creator_id}/history")
+async def get_creator_history(request: Request, creator_id: str, bucket: str = "day", platform: Optional[str] = None,
+                              start: Optional[datetime] = None, end: Optional[datetime] = None, points: int = 200,
+                              format: str = "rows"):
+    check_history_params(bucket, points)
+    # Deltas are computed after downsampling, between the points actually returned
+    query = """
+        SELECT bucket_start, platform,
+            last_subscribers AS subscriber_count,
+            last_views AS total_views,
+            last_video_count AS video_count,
+            first_subscribers, first_views
+        FROM creator_stats_rollup
+        WHERE bucket_size = %s AND creator_id = %s
+    """
+    params = [bucket, creator_id]
+    if platform:
+        query += " AND platform = %s"
+        params.append(platform)
+    if start:
+        query += " AND bucket_start >= %s"
+        params.append(start)
+    if end:
+        query += " AND bucket_start < %s"
+        params.append(end)
+    query += " ORDER BY bucket_start ASC"
+
+    return await cached_response(
+        request, "creator-history",
+        {"creator_id": creator_id, "bucket": bucket, "platform": platform, "start": start, "end": end, "points": points,
+         "format": format},
+        lambda: downsampled_history("creator-history", query, params, points, "total_views", format, creator_deltas),
+        load_snapshot_id,
+    )
+
+@app.get("/export/{table}")
+async def export_table(table: str, format: str = "ndjson", snapshot: Optional[str] = None,
+                       start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """Stream a whole table as NDJSON or CSV; snapshot takes an id or "latest", start/end filter by timestamp"""
+    if table not in EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown table, expected one of {', '.join(EXPORT_TABLES)}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format, expected one of {', '.join(EXPORT_FORMATS)}")
+    if snapshot not in (None, "latest") and not snapshot.isdigit():
+        raise HTTPException(status_code=400, detail="snapshot must be a snapshot id or 'latest'")
+
+    query, params = build_export_query(table, snapshot, start, end)
+    rows = db.stream_query(query, params)
+    try:
+        # Run the query before committing to a 200 so database errors surface like other endpoints
+        columns = await run_in_threadpool(next, rows)
+    except psycopg2.Error as e:
+        return {"error": f"Database query error: {str(e)}"}
+
+    encode = encode_ndjson if format == "ndjson" else encode_csv
+    return StreamingResponse(
+        encode(columns, rows),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'},
+    )
@@ -0,0 +1,74 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# Benchmarks write synthetic data, so they never fall back to SUPABASE_URL
+BENCH_DATABASE_URL = os.getenv("BENCH_DATABASE_URL")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def require_database_url(database_url):
+    if not database_url:
+        sys.exit("Set BENCH_DATABASE_URL or pass --database-url pointing at a disposable local Postgres")
+    return database_url
+
+
+def percentile(sorted_samples, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return None
+    rank = max(0, min(len(sorted_samples) - 1, round(fraction * len(sorted_samples)) - 1))
+    return sorted_samples[rank]
+
+
+def summarize(samples_ms):
+    """Latency summary in milliseconds"""
+    ordered = sorted(samples_ms)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "min_ms": round(ordered[0], 3),
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "p50_ms": round(percentile(ordered, 0.50), 3),
+        "p95_ms": round(percentile(ordered, 0.95), 3),
+        "p99_ms": round(percentile(ordered, 0.99), 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(kind, config, results, output=None):
+    """Write one run as JSON, with enough metadata to compare it against other runs later"""
+    now = datetime.now(timezone.utc)
+    document = {
+        "benchmark": kind,
+        "started_at": now.isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{kind}-{now.strftime('%Y%m%dT%H%M%SZ')}.json")
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2, default=str)
+    print(f"Wrote {kind} results to {output}")
+    return output
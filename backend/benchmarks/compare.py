@@ -0,0 +1,57 @@
+"""Compare two benchmark result files of the same kind, metric by metric.
+
+    python -m benchmarks.compare results/load-A.json results/load-B.json
+"""
+import argparse
+import json
+import sys
+
+
+def flatten(value, prefix=""):
+    """Numeric leaves of a results document as {"a.b.c": number}"""
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+        return flat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: value}
+    return {}
+
+
+def compare(base, new):
+    """(metric, base, new, percent change) for every metric present in both runs"""
+    base_flat, new_flat = flatten(base["results"]), flatten(new["results"])
+    rows = []
+    for metric in sorted(base_flat.keys() & new_flat.keys()):
+        before, after = base_flat[metric], new_flat[metric]
+        change = (after - before) / before * 100 if before else None
+        rows.append((metric, before, after, change))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--filter", help="Only metrics containing this substring, e.g. p99_ms")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if base["benchmark"] != new["benchmark"]:
+        sys.exit(f"Cannot compare a {base['benchmark']} run with a {new['benchmark']} run")
+
+    print(f"{base['benchmark']}: {base.get('git_revision')} ({base['started_at']}) -> "
+          f"{new.get('git_revision')} ({new['started_at']})")
+    for metric, before, after, change in compare(base, new):
+        if args.filter and args.filter not in metric:
+            continue
+        change_text = f"{change:+.1f}%" if change is not None else "n/a"
+        print(f"{metric:60} {before:>12} {after:>12} {change_text:>9}")
+
+
+if __name__ == "__main__":
+    main()
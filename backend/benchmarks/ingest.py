@@ -0,0 +1,93 @@
+"""Run fetch_game_data end to end against the stub upstream server and a local Postgres.
+
+    python -m benchmarks.ingest --apps 100 --latency-ms 50
+    python -m benchmarks.ingest --replay recordings/upstream.json --unthrottled
+
+Rate limits stay at their production values unless --unthrottled is given, so the
+default run shows how long a real ingest would take with upstreams answering in
+--latency-ms.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.common import BENCH_DATABASE_URL, require_database_url, write_results
+from benchmarks.stub_upstream import StubUpstream
+
+STUB_HOSTS = ("api.steampowered.com", "store.steampowered.com", "steamspy.com", "api.twitch.tv", "id.twitch.tv",
+              "itch.io")
+
+
+def configure_environment(base_url, database_url, work_dir, unthrottled):
+    """Point the ingest modules at the stub before they are imported; they read config at import time"""
+    os.environ.update({
+        "UPSTREAM_BASE_URL": base_url,
+        "SUPABASE_URL": database_url,
+        "STEAM_API_KEY": "stub",
+        "TWITCH_CLIENT_ID": "stub",
+        "TWITCH_CLIENT_SECRET": "stub",
+        "YOUTUBE_API_KEY": "stub",
+        # Fresh HTTP and creator caches per run, so every request reaches the stub
+        "HTTP_CACHE_DIR": work_dir,
+        "CREATOR_CACHE_FILE": os.path.join(work_dir, "creator_cache.json"),
+        "INGEST_METRICS_FILE": os.path.join(work_dir, "ingest_metrics.prom"),
+    })
+    os.environ.pop("REDIS_URL", None)
+    if unthrottled:
+        os.environ["UPSTREAM_RATE_LIMITS"] = ",".join(f"{host}=1000:1000" for host in STUB_HOSTS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=BENCH_DATABASE_URL)
+    parser.add_argument("--apps", type=int, default=100, help="Synthetic apps in top100in2weeks")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Stub response delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub responses that are 429s")
+    parser.add_argument("--replay", help="Recording made with benchmarks.stub_upstream --record")
+    parser.add_argument("--unthrottled", action="store_true", help="Lift the per-host rate limits")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/ingest-<time>.json)")
+    args = parser.parse_args()
+    database_url = require_database_url(args.database_url)
+
+    stub = StubUpstream(latency_ms=args.latency_ms, error_rate=args.error_rate, apps=args.apps, replay=args.replay)
+    base_url = stub.start()
+    with tempfile.TemporaryDirectory() as work_dir:
+        configure_environment(base_url, database_url, work_dir, args.unthrottled)
+
+        import psycopg2
+        import fetch_data
+        import metrics
+        import upstream
+        from benchmarks.seed import ensure_schema
+
+        conn = psycopg2.connect(database_url)
+        try:
+            ensure_schema(conn)
+        finally:
+            conn.close()
+
+        start = time.perf_counter()
+        try:
+            fetch_data.fetch_game_data()
+        finally:
+            elapsed = time.perf_counter() - start
+            stub.stop()
+
+    stages = {labels["stage"]: value for labels, value in metrics.INGEST_STAGE_SECONDS.values()}
+    rows = {labels["table"]: value for labels, value in metrics.INGEST_ROWS.values()}
+    print(f"Ingest finished in {elapsed:.1f}s: {stages}")
+    write_results("ingest", {
+        "apps": args.apps, "latency_ms": args.latency_ms, "error_rate": args.error_rate,
+        "replay": args.replay, "unthrottled": args.unthrottled,
+    }, {
+        "seconds": round(elapsed, 3),
+        "stages": stages,
+        "rows": rows,
+        "upstream": upstream.stats(),
+        "stub": stub.stats,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""HTTP load driver for every app.py endpoint, reporting p50/p95/p99 latency and RPS.
+
+Seed a database with benchmarks.seed first, then either point at a running API
+or let the driver start one:
+
+    python -m benchmarks.load --spawn --concurrency 8 --duration 10
+    python -m benchmarks.load --base-url http://127.0.0.1:8000 --only trending_games,dashboard
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+
+from benchmarks.common import BENCH_DATABASE_URL, require_database_url, summarize, write_results
+
+# (name, path); {game}, {creator} and {trending_cursor} are filled in from the seeded data
+SCENARIOS = [
+    ("root", "/"),
+    ("trending_games", "/trending-games?limit=10"),
+    ("trending_games_genre", "/trending-games?limit=10&genre=Action"),
+    ("trending_games_columnar", "/trending-games?limit=100&format=columnar"),
+    ("trending_games_page", "/trending-games?limit=10&cursor={trending_cursor}"),
+    ("top_genres", "/top-genres"),
+    ("playtime_insights", "/playtime-insights"),
+    ("affordable_games", "/affordable-games?max_price=10"),
+    ("top_creators", "/top-creators?limit=10"),
+    ("top_creators_engagement", "/top-creators?limit=10&platform=YouTube&sort_by=engagement_score"),
+    ("dashboard", "/dashboard"),
+    ("search_prefix", "/search?q=synth"),
+    ("search_fuzzy", "/search?q=syntetic+gme&types=game"),
+    ("game_history", "/games/{game}/history?bucket=day&points=100"),
+    ("creator_history", "/creators/{creator}/history?bucket=day&points=100"),
+    ("export_game_stats", "/export/game_stats?snapshot=latest&format=ndjson"),
+    ("export_creator_stats_csv", "/export/creator_stats?snapshot=latest&format=csv"),
+    ("pool_stats", "/pool-stats"),
+    ("cache_stats", "/cache-stats"),
+    ("metrics", "/metrics"),
+]
+
+
+def uncovered_routes():
+    """GET routes in app.py with no scenario, so new endpoints do not silently go unmeasured"""
+    from app import app
+
+    covered = {path.split("?")[0] for _, path in SCENARIOS}
+    covered |= {"/games/{name}/history", "/creators/{creator_id}/history", "/export/{table}"}
+    return sorted(
+        route.path for route in app.routes
+        if "GET" in getattr(route, "methods", ()) and route.path not in covered
+        and not route.path.startswith(("/docs", "/redoc", "/openapi"))
+    )
+
+
+def spawn_server(database_url, port, workers):
+    env = dict(os.environ, SUPABASE_URL=database_url)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(base_url + "/", timeout=1)
+            return process, base_url
+        except requests.ConnectionError:
+            if process.poll() is not None:
+                sys.exit("uvicorn exited before it started serving")
+            time.sleep(0.2)
+    process.terminate()
+    sys.exit("uvicorn did not start within 30s")
+
+
+def placeholders(base_url):
+    """Real game, creator and cursor values, so path scenarios hit rows that exist"""
+    page = requests.get(base_url + "/trending-games", params={"limit": 10, "cursor": ""}, timeout=30).json()
+    creators = requests.get(base_url + "/top-creators", params={"limit": 1}, timeout=30).json()
+    if not isinstance(page, dict) or not page.get("data"):
+        sys.exit(f"No trending games to benchmark against, seed the database first: {page}")
+    creator = creators[0]["creator_id"] if isinstance(creators, list) and creators else "unknown"
+    return {
+        "game": quote(page["data"][0]["name"], safe=""),
+        "creator": quote(creator, safe=""),
+        "trending_cursor": page.get("next_cursor") or "",
+    }
+
+
+def run_scenario(base_url, path, concurrency, duration, max_requests, warmup):
+    local = threading.local()
+    latencies = []
+    statuses = {}
+    bytes_received = [0]
+    lock = threading.Lock()
+    issued = [0]
+    deadline = [0.0]
+
+    def session():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    def one_request():
+        start = time.perf_counter()
+        try:
+            response = session().get(base_url + path, timeout=60)
+            status = str(response.status_code)
+            size = len(response.content)
+        except requests.RequestException as e:
+            status = type(e).__name__
+            size = 0
+        return (time.perf_counter() - start) * 1000, status, size
+
+    def worker():
+        while True:
+            with lock:
+                if time.monotonic() >= deadline[0] or (max_requests and issued[0] >= max_requests):
+                    return
+                issued[0] += 1
+            elapsed_ms, status, size = one_request()
+            with lock:
+                latencies.append(elapsed_ms)
+                statuses[status] = statuses.get(status, 0) + 1
+                bytes_received[0] += size
+
+    # The first request of a scenario fills the response cache; report it on its own
+    first_ms, first_status, _ = one_request()
+    for _ in range(warmup):
+        one_request()
+
+    started = time.monotonic()
+    deadline[0] = started + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    wall = time.monotonic() - started
+
+    return {
+        "path": path,
+        "first_request_ms": round(first_ms, 3),
+        "first_status": first_status,
+        "latency": summarize(latencies),
+        "rps": round(len(latencies) / wall, 1) if wall else None,
+        "statuses": statuses,
+        "bytes_per_request": round(bytes_received[0] / len(latencies)) if latencies else 0,
+        "wall_seconds": round(wall, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="Start uvicorn against --database-url")
+    parser.add_argument("--database-url", default=BENCH_DATABASE_URL)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when spawning")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario")
+    parser.add_argument("--requests", type=int, default=0, help="Stop a scenario after this many requests")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--only", help="Comma-separated scenario names")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/load-<time>.json)")
+    args = parser.parse_args()
+
+    missing = uncovered_routes()
+    if missing:
+        print(f"Warning: no load scenario for {', '.join(missing)}")
+
+    process = None
+    base_url = args.base_url.rstrip("/")
+    if args.spawn:
+        process, base_url = spawn_server(require_database_url(args.database_url), args.port, args.workers)
+    try:
+        values = placeholders(base_url)
+        selected = [(name, path) for name, path in SCENARIOS
+                    if not args.only or name in args.only.split(",")]
+        results = {}
+        for name, path in selected:
+            result = run_scenario(base_url, path.format(**values), args.concurrency, args.duration,
+                                  args.requests, args.warmup)
+            results[name] = result
+            latency = result["latency"]
+            print(f"{name:28} {result['rps']:>8} rps  p50 {latency.get('p50_ms')}ms  "
+                  f"p95 {latency.get('p95_ms')}ms  p99 {latency.get('p99_ms')}ms  {result['statuses']}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    write_results("load", {
+        "base_url": base_url, "spawned": args.spawn, "workers": args.workers, "concurrency": args.concurrency,
+        "duration": args.duration, "requests": args.requests, "warmup": args.warmup,
+    }, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
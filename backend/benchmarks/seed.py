@@ -0,0 +1,193 @@
+"""Seed a disposable Postgres with synthetic history: one published snapshot per day.
+
+    python -m benchmarks.seed --days 30 --games 100 --creators 200 --reset
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+from benchmarks.common import BENCH_DATABASE_URL, require_database_url, write_results
+
+# The tables fetch_data.py originally wrote to; everything else comes from schema.MIGRATIONS
+BASE_TABLES = """
+    CREATE TABLE IF NOT EXISTS game_stats (
+        id BIGSERIAL PRIMARY KEY,
+        name TEXT,
+        player_count INTEGER,
+        price TEXT,
+        avg_playtime DOUBLE PRECISION,
+        genres TEXT,
+        timestamp TIMESTAMP,
+        source TEXT
+    );
+    CREATE TABLE IF NOT EXISTS price_history (
+        id BIGSERIAL PRIMARY KEY,
+        game_id TEXT,
+        name TEXT,
+        price TEXT,
+        timestamp TIMESTAMP,
+        source TEXT
+    );
+    CREATE TABLE IF NOT EXISTS creator_stats (
+        id BIGSERIAL PRIMARY KEY,
+        creator_id TEXT,
+        name TEXT,
+        platform TEXT,
+        subscriber_count BIGINT,
+        video_count INTEGER,
+        total_views BIGINT,
+        game_name TEXT,
+        timestamp TIMESTAMP
+    );
+"""
+SEEDED_TABLES = ("game_stats", "price_history", "creator_stats", "genre_stats", "game_stats_rollup",
+                 "creator_stats_rollup", "current_snapshot", "ingest_snapshots")
+GENRES = ("Action", "Adventure", "Casual", "Free to Play", "Indie", "Massively Multiplayer", "RPG",
+          "Racing", "Simulation", "Sports", "Strategy", "Early Access")
+PRICES_CENTS = (0, 0, 499, 999, 1499, 1999, 2999, 3999, 5999, 6999)
+
+
+def ensure_schema(conn):
+    """Create the base tables if missing and bring the database up to the current migration"""
+    from schema import apply_migrations
+
+    with conn.cursor() as cursor:
+        cursor.execute(BASE_TABLES)
+    conn.commit()
+    apply_migrations(conn)
+
+
+def reset(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(f"TRUNCATE {', '.join(SEEDED_TABLES)} RESTART IDENTITY")
+    conn.commit()
+
+
+def make_catalog(rng, games, creators):
+    """Fixed games and creators reused across days. Player counts follow a power law,
+    so a few hot games dominate the way they do on Steam."""
+    catalog = []
+    for i in range(games):
+        source = "itch.io" if i % 10 == 9 else "Steam"
+        price_cents = 0 if source == "itch.io" else rng.choice(PRICES_CENTS)
+        catalog.append({
+            "game_id": f"itch_game-{i}" if source == "itch.io" else str(100000 + i),
+            "name": f"Synthetic Game {i:05d}",
+            "source": source,
+            "base_players": int(500000 / (i + 1) ** 1.1) if source == "Steam" else 0,
+            "price_cents": price_cents,
+            "genres": ", ".join(rng.sample(GENRES, rng.randint(1, 3))),
+            "avg_playtime": round(rng.uniform(0.5, 40.0), 2),
+        })
+    roster = []
+    for i in range(creators):
+        platform = "YouTube" if i % 2 else "Twitch"
+        roster.append({
+            "creator_id": f"UC{i:022d}" if platform == "YouTube" else str(900000 + i),
+            "name": f"Synthetic Creator {i:05d}",
+            "platform": platform,
+            "subscriber_count": int(rng.paretovariate(1.2) * 1000),
+            "video_count": rng.randint(1, 2000),
+            "total_views": int(rng.paretovariate(1.1) * 50000),
+            "game_name": catalog[min(int(rng.paretovariate(1.5)) - 1, games - 1)]["name"],
+        })
+    return catalog, roster
+
+
+def game_rows(rng, catalog, timestamp):
+    rows = []
+    for game in catalog:
+        # Occasional sales, so price_history carries real changes
+        price_cents = game["price_cents"]
+        if price_cents and rng.random() < 0.05:
+            price_cents = price_cents // 2
+        rows.append({
+            "game_id": game["game_id"],
+            "name": game["name"],
+            "source": game["source"],
+            "player_count": max(0, int(game["base_players"] * rng.uniform(0.7, 1.3))),
+            "price": f"${price_cents / 100:.2f}" if price_cents else "Free",
+            "price_cents": price_cents,
+            "currency": "USD" if game["source"] == "Steam" else None,
+            "avg_playtime": game["avg_playtime"],
+            "genres": game["genres"],
+            "timestamp": timestamp.isoformat(),
+        })
+    return rows
+
+
+def creator_rows(rng, roster, timestamp):
+    rows = []
+    for creator in roster:
+        creator["subscriber_count"] += rng.randint(0, 50)
+        creator["total_views"] += rng.randint(0, 5000)
+        rows.append(dict(creator, timestamp=timestamp.isoformat()))
+    return rows
+
+
+def seed(conn, days, games, creators, seed_value=0, end=None):
+    """Write days snapshots ending at end (default: now); returns rows written per table"""
+    from partitions import ensure_range
+    from snapshots import begin_snapshot
+    from storage import write_snapshot
+
+    rng = random.Random(seed_value)
+    catalog, roster = make_catalog(rng, games, creators)
+    end = end or datetime.now().replace(microsecond=0)
+    ensure_range(conn, end - timedelta(days=days), end)
+    totals = {}
+    for day in range(days, 0, -1):
+        timestamp = end - timedelta(days=day - 1)
+        with conn.cursor() as cursor:
+            snapshot_id = begin_snapshot(cursor)
+            cursor.execute("UPDATE ingest_snapshots SET started_at = %s WHERE snapshot_id = %s",
+                           (timestamp, snapshot_id))
+        conn.commit()
+        counts = write_snapshot(conn, snapshot_id, game_rows(rng, catalog, timestamp),
+                                creator_rows(rng, roster, timestamp))
+        for table, table_counts in counts.items():
+            totals[table] = totals.get(table, 0) + table_counts["inserted"]
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=BENCH_DATABASE_URL)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--creators", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reset", action="store_true", help="Truncate every seeded table first")
+    parser.add_argument("--partition", choices=("day", "month"), help="Convert the stat tables to partitions first")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/seed-<time>.json)")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(require_database_url(args.database_url))
+    try:
+        ensure_schema(conn)
+        if args.partition:
+            from partitions import PARTITION_COLUMNS, convert
+            for table in PARTITION_COLUMNS:
+                convert(conn, table, args.partition)
+        if args.reset:
+            reset(conn)
+        start = time.perf_counter()
+        totals = seed(conn, args.days, args.games, args.creators, args.seed)
+        elapsed = time.perf_counter() - start
+    finally:
+        conn.close()
+
+    rows = sum(totals.values())
+    print(f"Seeded {args.days} snapshots, {rows} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:.0f} rows/sec)")
+    write_results("seed", {
+        "days": args.days, "games": args.games, "creators": args.creators, "seed": args.seed, "reset": args.reset,
+        "partition": args.partition,
+    }, {"seconds": round(elapsed, 3), "rows": totals, "rows_per_sec": round(rows / elapsed, 1) if elapsed else None},
+        args.output)
+
+
+if __name__ == "__main__":
+    main()
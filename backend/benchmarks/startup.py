@@ -0,0 +1,128 @@
+"""Cold and warm start times of the serverless entry point in index.py.
+
+Each sample is a fresh interpreter, like a new serverless instance: it times the
+import of index, the first (cold) request and then warm requests, calling the ASGI
+app in-process so no server or network sits in between.
+
+    python -m benchmarks.startup --runs 10 --path / --path /trending-games
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+async def _call(asgi_app, path):
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"host", b"localhost")], "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+    status = []
+    requested = []
+    finished = asyncio.Event()
+
+    async def receive():
+        if not requested:
+            requested.append(True)
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Like a server, report the client gone only once the response has been sent
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            finished.set()
+
+    await asyncio.wait_for(asgi_app(scope, receive, send), timeout=60)
+    return status[0] if status else None
+
+
+def child(paths, warm_requests):
+    """One simulated instance; prints its timings as JSON"""
+    start = time.perf_counter()
+    import index
+    import_seconds = time.perf_counter() - start
+
+    async def run():
+        timings = {}
+        cold_start = time.perf_counter()
+        status = await _call(index.app, paths[0])
+        timings["cold_request_seconds"] = time.perf_counter() - cold_start
+        timings["cold_status"] = status
+        warm = {}
+        for path in paths:
+            samples = []
+            for _ in range(warm_requests):
+                request_start = time.perf_counter()
+                await _call(index.app, path)
+                samples.append((time.perf_counter() - request_start) * 1000)
+            warm[path] = samples
+        timings["warm_ms"] = warm
+        return timings
+
+    timings = asyncio.run(run())
+    print(json.dumps({"index_import_seconds": import_seconds, **index.startup, **timings}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters to start")
+    parser.add_argument("--warm", type=int, default=20, help="Warm requests per path per run")
+    parser.add_argument("--path", action="append", help="Request path; the first one is the cold request")
+    parser.add_argument("--database-url", help="Database for the app (default: BENCH_DATABASE_URL)")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/startup-<time>.json)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    paths = args.path or ["/"]
+    if args.child:
+        child(paths, args.warm)
+        return
+
+    from benchmarks.common import BENCH_DATABASE_URL, summarize, write_results
+
+    env = dict(os.environ)
+    database_url = args.database_url or BENCH_DATABASE_URL
+    if database_url:
+        env["SUPABASE_URL"] = database_url
+    command = [sys.executable, "-m", "benchmarks.startup", "--child", "--warm", str(args.warm)]
+    for path in paths:
+        command += ["--path", path]
+
+    samples = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        output = subprocess.run(command, capture_output=True, text=True, check=True, env=env,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+        sample = json.loads(output.strip().splitlines()[-1])
+        sample["process_seconds"] = time.perf_counter() - start
+        samples.append(sample)
+
+    def seconds_summary(key):
+        return summarize([sample[key] * 1000 for sample in samples if sample.get(key) is not None])
+
+    results = {
+        "process_total": seconds_summary("process_seconds"),
+        "index_import": seconds_summary("index_import_seconds"),
+        "app_import": seconds_summary("app_import_seconds"),
+        "cold_request": seconds_summary("cold_request_seconds"),
+        "cold_statuses": sorted({sample["cold_status"] for sample in samples}, key=str),
+        "warm": {path: summarize([ms for sample in samples for ms in sample["warm_ms"][path]]) for path in paths},
+    }
+    print(f"index import p50 {results['index_import']['p50_ms']}ms, app import p50 {results['app_import']['p50_ms']}ms, "
+          f"cold request p50 {results['cold_request']['p50_ms']}ms")
+    for path, summary in results["warm"].items():
+        print(f"warm {path}: p50 {summary['p50_ms']}ms p99 {summary['p99_ms']}ms")
+    write_results("startup", {"runs": args.runs, "warm": args.warm, "paths": paths,
+                              "database": bool(database_url)}, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Local stand-in for Steam, SteamSpy, itch.io, Twitch and YouTube.
+
+upstream.rewrite_url sends https://host/path?query to <stub>/host/path?query when
+UPSTREAM_BASE_URL is set. The stub answers from a recording when one has the request
+and otherwise synthesizes a deterministic response, so an ingest run needs no network.
+
+Record real responses once (needs real API keys in the environment):
+
+    python -m benchmarks.stub_upstream --record recordings/upstream.json --port 8900
+    UPSTREAM_BASE_URL=http://127.0.0.1:8900 python fetch_data.py
+
+and replay them with `python -m benchmarks.ingest --replay recordings/upstream.json`.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+from xml.sax.saxutils import escape
+
+import requests
+
+# Query parameters that carry credentials; never part of a recording key or a recording
+SECRET_PARAMS = {"key", "client_secret", "access_token"}
+GENRES = ("Action", "Adventure", "Casual", "Indie", "RPG", "Simulation", "Strategy", "Sports")
+CREATOR_POOL = 400
+
+
+def _number(*parts, modulo=1_000_000):
+    """Stable pseudo-random number for a request, so repeated runs see identical data"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return int(digest[:12], 16) % modulo
+
+
+def recording_key(method, host, path, query):
+    params = sorted((name, value) for name, value in parse_qsl(query, keep_blank_values=True)
+                    if name not in SECRET_PARAMS)
+    return f"{method} {host}{path}?{urlencode(params)}"
+
+
+class Synthetic:
+    """Deterministic responses shaped like the real APIs, for apps top100in2weeks apps"""
+
+    def __init__(self, apps=100, itch_items=3):
+        self.apps = apps
+        self.itch_items = itch_items
+
+    def respond(self, method, host, path, params):
+        handler = {
+            ("steamspy.com", "/api.php"): self.steamspy,
+            ("api.steampowered.com", "/ISteamUserStats/GetNumberOfCurrentPlayers/v1/"): self.player_count,
+            ("store.steampowered.com", "/api/appdetails"): self.appdetails,
+            ("itch.io", "/games/top-rated.rss"): self.itch_rss,
+            ("id.twitch.tv", "/oauth2/token"): self.twitch_token,
+            ("youtube.googleapis.com", "/youtube/v3/search"): self.youtube_search,
+            ("youtube.googleapis.com", "/youtube/v3/channels"): self.youtube_channels,
+        }.get((host, path))
+        if handler is None and host == "api.twitch.tv" and path.startswith("/helix/"):
+            handler = getattr(self, f"helix_{path[len('/helix/'):]}", None)
+        if handler is None:
+            return 404, "application/json", json.dumps({"error": f"No stub for {host}{path}"})
+        return handler(params)
+
+    def _json(self, payload):
+        return 200, "application/json", json.dumps(payload)
+
+    def _first(self, params, name, default=None):
+        values = [value for key, value in params if key == name]
+        return values[0] if values else default
+
+    def steamspy(self, params):
+        if self._first(params, "request") == "top100in2weeks":
+            return self._json({
+                str(10 + appid * 10): {"appid": 10 + appid * 10, "name": f"Synthetic Game {appid:05d}"}
+                for appid in range(self.apps)
+            })
+        appid = self._first(params, "appid")
+        return self._json({"appid": int(appid), "average_2weeks": _number("playtime", appid, modulo=3000)})
+
+    def player_count(self, params):
+        appid = int(self._first(params, "appid"))
+        rank = (appid - 10) // 10 + 1
+        return self._json({"response": {"player_count": int(800000 / rank ** 1.1) + _number("players", appid, modulo=500),
+                                        "result": 1}})
+
+    def appdetails(self, params):
+        appid = self._first(params, "appids")
+        data = {"genres": [{"id": str(i), "description": genre}
+                           for i, genre in enumerate(GENRES) if _number("genre", appid, genre, modulo=3) == 0]}
+        cents = (0, 499, 999, 1999, 2999, 5999)[_number("price", appid, modulo=6)]
+        if cents:
+            data["price_overview"] = {"currency": "USD", "initial": cents, "final": cents,
+                                      "final_formatted": f"${cents / 100:.2f}"}
+        return self._json({appid: {"success": True, "data": data}})
+
+    def itch_rss(self, params):
+        items = "".join(
+            f"<item><title>{escape(f'Synthetic Indie {i:03d}')}</title>"
+            f"<link>https://example.itch.io/synthetic-indie-{i}</link>"
+            f"<category>Indie</category><category>Puzzle</category></item>"
+            for i in range(self.itch_items)
+        )
+        body = f'<?xml version="1.0"?><rss version="2.0"><channel><title>Top rated</title>{items}</channel></rss>'
+        return 200, "application/rss+xml", body
+
+    def twitch_token(self, params):
+        return self._json({"access_token": "stub-token", "expires_in": 5000000, "token_type": "bearer"})
+
+    def helix_games(self, params):
+        return self._json({"data": [{"id": str(_number("twitch-game", name)), "name": name}
+                                    for key, name in params if key == "name"]})
+
+    def helix_streams(self, params):
+        game_id = self._first(params, "game_id")
+        first = int(self._first(params, "first", 20))
+        # Streamers are drawn from a shared pool, so the same creator shows up under several games
+        return self._json({"data": [{"user_id": str(_number("streamer", game_id, i, modulo=CREATOR_POOL)),
+                                     "game_id": game_id} for i in range(first)]})
+
+    def helix_users(self, params):
+        return self._json({"data": [{"id": user_id, "display_name": f"Streamer {user_id}"}
+                                    for key, user_id in params if key == "id"]})
+
+    def helix_videos(self, params):
+        user_id = self._first(params, "user_id")
+        first = int(self._first(params, "first", 20))
+        return self._json({"data": [{"id": f"{user_id}-{i}", "view_count": _number("views", user_id, i, modulo=100000)}
+                                    for i in range(_number("videos", user_id, modulo=first + 1))]})
+
+    def youtube_search(self, params):
+        query = self._first(params, "q", "")
+        results = int(self._first(params, "maxResults", 5))
+        return self._json({"items": [
+            {"snippet": {"channelId": f"UC{_number('channel', query, i, modulo=CREATOR_POOL):022d}"}}
+            for i in range(results)
+        ]})
+
+    def youtube_channels(self, params):
+        ids = [channel_id for value in [self._first(params, "id", "")] for channel_id in value.split(",") if channel_id]
+        return self._json({"items": [{
+            "id": channel_id,
+            "snippet": {"title": f"Channel {channel_id[-6:]}"},
+            "statistics": {"subscriberCount": str(_number("subs", channel_id)),
+                           "videoCount": str(_number("videos", channel_id, modulo=3000)),
+                           "viewCount": str(_number("views", channel_id) * 100)},
+        } for channel_id in ids]})
+
+
+class StubUpstream:
+    """Threaded stub server; start() returns the base URL to use as UPSTREAM_BASE_URL"""
+
+    def __init__(self, port=0, latency_ms=0.0, error_rate=0.0, apps=100, replay=None, record=None):
+        self.port = port
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.synthetic = Synthetic(apps)
+        self.recording = {}
+        if replay:
+            with open(replay) as f:
+                self.recording = json.load(f)
+        self.record_path = record
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+        self._server = None
+
+    def _count(self, host, outcome):
+        with self._lock:
+            host_stats = self.stats.setdefault(host, {})
+            host_stats[outcome] = host_stats.get(outcome, 0) + 1
+
+    def handle(self, method, host, path, query, headers, body):
+        key = recording_key(method, host, path, query)
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            fail = self.error_rate and self._random.random() < self.error_rate
+        if fail:
+            self._count(host, "injected_429")
+            return 429, "application/json", json.dumps({"error": "stub rate limit"}), {"Retry-After": "1"}
+        if self.record_path:
+            return self._proxy(key, method, host, path, query, headers, body) + ({},)
+        if key in self.recording:
+            self._count(host, "replayed")
+            entry = self.recording[key]
+            return entry["status"], entry["content_type"], entry["body"], {}
+        self._count(host, "synthetic")
+        return self.synthetic.respond(method, host, path, parse_qsl(query, keep_blank_values=True)) + ({},)
+
+    def _proxy(self, key, method, host, path, query, headers, body):
+        response = requests.request(
+            method, f"https://{host}{path}" + (f"?{query}" if query else ""),
+            headers={name: value for name, value in headers.items()
+                     if name.lower() in ("authorization", "client-id", "content-type", "accept")},
+            data=body, timeout=30,
+        )
+        content_type = response.headers.get("Content-Type", "application/octet-stream")
+        entry = {"status": response.status_code, "content_type": content_type, "body": response.text}
+        if host == "id.twitch.tv":
+            # Keep real tokens out of recordings; any token works against the stub
+            entry["status"], entry["content_type"], entry["body"] = self.synthetic.twitch_token([])
+        with self._lock:
+            self.recording[key] = entry
+        self._count(host, "recorded")
+        return entry["status"], content_type, entry["body"]
+
+    def save(self):
+        if self.record_path:
+            with open(self.record_path, "w") as f:
+                json.dump(self.recording, f, indent=1, sort_keys=True)
+            print(f"Saved {len(self.recording)} recorded responses to {self.record_path}")
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _serve(self):
+                url = urlsplit(self.path)
+                host, _, path = url.path.lstrip("/").partition("/")
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else None
+                status, content_type, text, extra_headers = stub.handle(
+                    self.command, host, "/" + path, url.query, self.headers, body)
+                payload = text.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in extra_headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = _serve
+            do_POST = _serve
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        self.save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added delay per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument("--apps", type=int, default=100, help="Synthetic apps in top100in2weeks")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--replay", help="Serve responses from this recording")
+    group.add_argument("--record", help="Proxy to the real APIs and save responses to this file")
+    args = parser.parse_args()
+
+    stub = StubUpstream(args.port, args.latency_ms, args.error_rate, args.apps, args.replay, args.record)
+    base_url = stub.start()
+    print(f"Stub upstream listening on {base_url}, set UPSTREAM_BASE_URL={base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.stop()
+        print(json.dumps(stub.stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from urllib.parse import urlencode
+
+import orjson
+from dotenv import load_dotenv
+from fastapi.responses import ORJSONResponse, Response
+
+import metrics
+
+load_dotenv()
+REDIS_URL = os.getenv("REDIS_URL")
+CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "512"))
+CACHE_MAX_AGE = int(os.getenv("CACHE_MAX_AGE", "60"))
+SNAPSHOT_POLL_INTERVAL = float(os.getenv("SNAPSHOT_POLL_INTERVAL", "30"))
+# The Redis pointer only speeds up the switch to a new snapshot; it expires so that a stale
+# value (a failed publish, a restored dump) falls back to the database quickly
+SNAPSHOT_POINTER_TTL = int(os.getenv("SNAPSHOT_POINTER_TTL", "60"))
+
+REDIS_PREFIX = "gamepulse:resp:"
+REDIS_SNAPSHOT_KEY = "gamepulse:current_snapshot"
+
+
+class LRUCache:
+    """Thread-safe in-process LRU with a per-entry TTL"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_local = LRUCache()
+_redis = None
+_redis_failed = False
+_snapshot = {"id": None, "checked_at": 0.0}
+_stats = {"redis_hits": 0, "redis_misses": 0, "not_modified": 0, "invalidations": 0}
+
+
+def _get_redis():
+    """Lazily connect the optional Redis tier; disabled when REDIS_URL is unset or redis is missing"""
+    global _redis, _redis_failed
+    if _redis is None and REDIS_URL and not _redis_failed:
+        try:
+            import redis.asyncio as redis_asyncio
+            _redis = redis_asyncio.from_url(REDIS_URL, socket_timeout=0.5)
+        except ImportError:
+            print("REDIS_URL is set but the redis package is not installed; using the in-process cache only")
+            _redis_failed = True
+    return _redis
+
+
+async def _redis_call(method, *args, **kwargs):
+    client = _get_redis()
+    if client is None:
+        return None
+    try:
+        return await getattr(client, method)(*args, **kwargs)
+    except Exception as e:
+        print(f"Redis cache error ({method}): {e}")
+        return None
+
+
+async def current_snapshot_id(load_snapshot_id):
+    """Published snapshot id, read from Redis when available and otherwise polled from the database.
+
+    The Redis pointer lives SNAPSHOT_POINTER_TTL seconds after a publish, then reads go
+    back to the database, so a wrong pointer is trusted for that long at most. A change
+    of snapshot drops the local tier, so stale entries never outlive an ingest.
+    """
+    now = time.monotonic()
+    snapshot_id = None
+    if _get_redis() is not None:
+        value = await _redis_call("get", REDIS_SNAPSHOT_KEY)
+        if value is not None:
+            snapshot_id = int(value)
+    if snapshot_id is None:
+        if _snapshot["id"] is not None and now - _snapshot["checked_at"] < SNAPSHOT_POLL_INTERVAL:
+            return _snapshot["id"]
+        snapshot_id = await load_snapshot_id()
+        _snapshot["checked_at"] = now
+    if snapshot_id != _snapshot["id"]:
+        if _snapshot["id"] is not None:
+            _local.clear()
+            _stats["invalidations"] += 1
+        _snapshot["id"] = snapshot_id
+    return snapshot_id
+
+
+def make_key(endpoint, params):
+    """Cache key from the endpoint and its query parameters, with unset values dropped and keys sorted"""
+    normalized = {}
+    for name, value in params.items():
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+            if not value:
+                continue
+        normalized[name] = value
+    return f"{endpoint}?{urlencode(sorted(normalized.items()))}"
+
+
+def _default(value):
+    # orjson handles datetimes natively; NUMERIC columns come back from psycopg2 as Decimal
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def render_json(data):
+    with metrics.phase("serialization"):
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(ORJSONResponse):
+    """orjson response that also accepts Decimal; the app's default response class"""
+
+    def render(self, content):
+        return render_json(content)
+
+
+def _etag(snapshot_id, body):
+    return f'"{snapshot_id}-{hashlib.sha1(body).hexdigest()[:16]}"'
+
+
+def _response(request, snapshot_id, body, etag):
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={CACHE_MAX_AGE}, stale-while-revalidate={CACHE_MAX_AGE * 5}",
+        "X-Snapshot-Id": str(snapshot_id),
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        _stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def cached_response(request, endpoint, params, load, load_snapshot_id):
+    """Serve endpoint output from the cache tiers, computing it with load() on a miss.
+
+    Entries are scoped to the current snapshot. Error payloads and responses computed
+    before any snapshot exists are returned as-is and never cached.
+    """
+    snapshot_id = await current_snapshot_id(load_snapshot_id)
+    if snapshot_id is None:
+        return await load()
+
+    key = f"{snapshot_id}:{make_key(endpoint, params)}"
+    cached = _local.get(key)
+    if cached is None and _get_redis() is not None:
+        value = await _redis_call("get", REDIS_PREFIX + key)
+        if value is not None:
+            _stats["redis_hits"] += 1
+            cached = (value, _etag(snapshot_id, value))
+            _local.set(key, cached)
+        else:
+            _stats["redis_misses"] += 1
+    if cached is not None:
+        return _response(request, snapshot_id, *cached)
+
+    data = await load()
+    if isinstance(data, dict) and "error" in data:
+        return data
+    body = render_json(data)
+    etag = _etag(snapshot_id, body)
+    _local.set(key, (body, etag))
+    if _get_redis() is not None:
+        await _redis_call("set", REDIS_PREFIX + key, body, ex=CACHE_TTL)
+    return _response(request, snapshot_id, body, etag)
+
+
+def cache_stats():
+    return {
+        "local_entries": len(_local),
+        "local_hits": _local.hits,
+        "local_misses": _local.misses,
+        "redis_enabled": _get_redis() is not None,
+        "snapshot_id": _snapshot["id"],
+        **_stats,
+    }
+
+
+def publish_snapshot(snapshot_id):
+    """Called by the ingest job once a snapshot is committed.
+
+    Sets the shared snapshot pointer and drops cached responses from older snapshots,
+    so every API process switches over immediately instead of waiting for its next poll.
+    """
+    if not REDIS_URL:
+        return
+    try:
+        import redis
+    except ImportError:
+        return
+    try:
+        client = redis.from_url(REDIS_URL, socket_timeout=2)
+        client.set(REDIS_SNAPSHOT_KEY, snapshot_id, ex=SNAPSHOT_POINTER_TTL)
+        current_prefix = f"{REDIS_PREFIX}{snapshot_id}:".encode()
+        stale = [key for key in client.scan_iter(match=f"{REDIS_PREFIX}*", count=500)
+                 if not key.startswith(current_prefix)]
+        for start in range(0, len(stale), 500):
+            client.delete(*stale[start:start + 500])
+        print(f"Published snapshot {snapshot_id} to Redis, dropped {len(stale)} cached responses")
+    except redis.RedisError as e:
+        print(f"Could not publish snapshot {snapshot_id} to Redis: {e}")
@@ -0,0 +1,274 @@
+"""Creator discovery for every game of an ingest run.
+
+Discovery has two stages on one bounded thread pool:
+
+1. Search: each (platform, game) pair is searched concurrently. The hits tie creators
+   to games, so they are kept per game.
+2. Profiles: every distinct creator found across all games is fetched once. A channel
+   listed under five games costs one lookup, and YouTube ids share channels.list batches.
+
+Search hits and profiles both go into a cache with a TTL, saved to CREATOR_CACHE_FILE.
+A channel already seen in an earlier run is not fetched again until its entry expires.
+The per-host rate limiters in upstream still pace the actual requests.
+
+A YouTube search costs 100 quota units, so searches stop once the day's quota
+(youtube.YOUTUBE_DAILY_QUOTA) would be reached. Platforms cut off that way, or whose
+searches or profile lookups failed, are reported as incomplete. Their creators missing
+from the rows were not looked at, and must not be taken as gone.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import requests
+from dotenv import load_dotenv
+
+import metrics
+import twitch
+import youtube
+
+load_dotenv()
+CREATOR_WORKERS = int(os.getenv("CREATOR_WORKERS", "8"))
+CREATORS_PER_GAME = int(os.getenv("CREATORS_PER_GAME", "2"))
+# A YouTube search costs 100 quota units, so hits are kept for a day; profiles change faster
+CREATOR_SEARCH_TTL = float(os.getenv("CREATOR_SEARCH_TTL", str(24 * 3600)))
+CREATOR_PROFILE_TTL = float(os.getenv("CREATOR_PROFILE_TTL", str(6 * 3600)))
+CREATOR_CACHE_FILE = os.getenv(
+    "CREATOR_CACHE_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "creator_cache.json")
+)
+
+
+class CreatorCache:
+    """Search hits per (platform, game) and profiles per (platform, creator id), each with
+    the time it was fetched. Shared between threads; load and save go through one JSON file."""
+
+    def __init__(self, path=CREATOR_CACHE_FILE):
+        self.path = path
+        self.entries = {"searches": {}, "profiles": {}}
+        self.loaded = False
+        self._lock = threading.Lock()
+        # Serializes load and save, which may run from concurrent discover calls
+        self._file_lock = threading.Lock()
+
+    def load(self):
+        with self._file_lock:
+            if self.loaded:
+                return
+            self.loaded = True
+            try:
+                with open(self.path) as f:
+                    stored = json.load(f)
+            except FileNotFoundError:
+                return
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable creator cache {self.path}: {e}")
+                return
+            with self._lock:
+                for section in self.entries:
+                    self.entries[section].update(stored.get(section, {}))
+
+    def get(self, section, key, ttl):
+        """Cached value, or None when missing or older than ttl seconds"""
+        with self._lock:
+            entry = self.entries[section].get(key)
+        if entry is not None and time.time() - entry[0] < ttl:
+            metrics.CREATOR_CACHE_LOOKUPS.inc(section=section, outcome="hit")
+            return entry[1]
+        metrics.CREATOR_CACHE_LOOKUPS.inc(section=section, outcome="miss")
+        return None
+
+    def put(self, section, key, value):
+        with self._lock:
+            self.entries[section][key] = (time.time(), value)
+
+    def save(self):
+        """Drop expired entries and write the rest atomically"""
+        now = time.time()
+        ttls = {"searches": CREATOR_SEARCH_TTL, "profiles": CREATOR_PROFILE_TTL}
+        with self._lock:
+            for section, entries in self.entries.items():
+                for key in [key for key, (fetched_at, _) in entries.items() if now - fetched_at >= ttls[section]]:
+                    del entries[key]
+            state = json.dumps(self.entries)
+        with self._file_lock:
+            try:
+                with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(self.path), suffix=".tmp", delete=False) as f:
+                    f.write(state)
+                os.replace(f.name, self.path)
+            except OSError as e:
+                print(f"Could not save creator cache {self.path}: {e}")
+
+
+_cache = None
+
+
+def get_cache():
+    """Process-wide cache, so the ingest daemon keeps it in memory between jobs"""
+    global _cache
+    if _cache is None:
+        _cache = CreatorCache()
+    return _cache
+
+
+def youtube_searches(game_names, per_game):
+    return [(game_name, lambda game_name=game_name: youtube.search_channels(game_name, per_game))
+            for game_name in game_names]
+
+
+def twitch_searches(game_names, per_game):
+    """One batched category lookup, then a streams search per game on Twitch"""
+    if not game_names:
+        return []
+    client = twitch.get_client()
+    game_ids = client.get_game_ids(game_names)
+    return [(game_name, lambda game_id=game_ids[game_name]: client.get_streamers(game_id, first=per_game))
+            for game_name in game_names if game_name in game_ids]
+
+
+def youtube_profiles(executor, channel_ids):
+    batches = [channel_ids[start:start + youtube.CHANNELS_BATCH_SIZE]
+               for start in range(0, len(channel_ids), youtube.CHANNELS_BATCH_SIZE)]
+    profiles = {}
+    for batch_profiles in executor.map(youtube.fetch_profiles, batches):
+        profiles.update(batch_profiles)
+    return profiles
+
+
+def twitch_profiles(executor, user_ids):
+    """Users in batches of 100; videos need one request per user, so those run on the pool"""
+    client = twitch.get_client()
+    users = client.get_users(user_ids)
+    videos = {user_id: executor.submit(client.get_videos, user_id) for user_id in user_ids}
+    profiles = {}
+    for user_id, future in videos.items():
+        try:
+            profiles[user_id] = twitch.user_profile(users.get(user_id, {}), future.result())
+        except requests.RequestException as e:
+            print(f"Error fetching Twitch videos for user {user_id}: {e}")
+    return profiles
+
+
+# platform: (searches for a list of games, profile fetcher for a list of creator ids)
+PLATFORMS = {
+    "YouTube": (youtube_searches, youtube_profiles),
+    "Twitch": (twitch_searches, twitch_profiles),
+}
+
+
+def configured_platforms():
+    platforms = []
+    if youtube.YOUTUBE_API_KEY:
+        platforms.append("YouTube")
+    if twitch.TWITCH_CLIENT_ID and twitch.TWITCH_CLIENT_SECRET:
+        platforms.append("Twitch")
+    return platforms
+
+
+def search(executor, cache, platforms, game_names, per_game, stats, incomplete):
+    """{(platform, game): [creator ids]} for every game, from the cache or a search.
+    Platforms not searched for every game are added to incomplete."""
+    hits = {}
+    jobs = {}
+    for platform in platforms:
+        pending = []
+        for game_name in game_names:
+            cached = cache.get("searches", f"{platform}:{game_name}", CREATOR_SEARCH_TTL)
+            if cached is None:
+                pending.append(game_name)
+            else:
+                hits[(platform, game_name)] = cached
+        if platform == "YouTube":
+            affordable = youtube.units_left(youtube.YOUTUBE_PROFILE_RESERVE) // youtube.QUOTA_COSTS["search.list"]
+            if len(pending) > affordable:
+                print(f"YouTube quota allows {affordable} of {len(pending)} searches; skipping the rest")
+                pending = pending[:affordable]
+                incomplete.add(platform)
+        try:
+            searches = PLATFORMS[platform][0](pending, per_game)
+        except requests.RequestException as e:
+            print(f"Error preparing {platform} creator searches: {e}")
+            incomplete.add(platform)
+            continue
+        for game_name, job in searches:
+            jobs[executor.submit(job)] = (platform, game_name)
+    stats["searches"] = len(jobs)
+
+    # Google's client raises its own error types, so any failure only costs that one game
+    for future in as_completed(jobs):
+        platform, game_name = jobs[future]
+        try:
+            creator_ids = future.result()
+        except Exception as e:
+            print(f"Error searching {platform} creators for {game_name}: {e}")
+            incomplete.add(platform)
+            continue
+        hits[(platform, game_name)] = creator_ids
+        cache.put("searches", f"{platform}:{game_name}", creator_ids)
+    # Keep the games' order, not the order searches finished in
+    return {(platform, game_name): hits[(platform, game_name)]
+            for platform in platforms for game_name in game_names if (platform, game_name) in hits}
+
+
+def fetch_profiles(executor, cache, hits, stats, incomplete):
+    """{(platform, creator id): profile} for every distinct creator in hits; platforms
+    whose lookup failed are added to incomplete"""
+    profiles = {}
+    missing = {}
+    for (platform, _), creator_ids in hits.items():
+        for creator_id in creator_ids:
+            key = (platform, creator_id)
+            if key in profiles or creator_id in missing.get(platform, {}):
+                continue
+            cached = cache.get("profiles", f"{platform}:{creator_id}", CREATOR_PROFILE_TTL)
+            if cached is None:
+                missing.setdefault(platform, {})[creator_id] = None
+            else:
+                profiles[key] = cached
+    stats["creators"] = len(profiles) + sum(len(creator_ids) for creator_ids in missing.values())
+
+    for platform, creator_ids in missing.items():
+        try:
+            fetched = PLATFORMS[platform][1](executor, list(creator_ids))
+        except Exception as e:
+            print(f"Error fetching {platform} creator profiles: {e}")
+            incomplete.add(platform)
+            continue
+        stats["profiles_fetched"] += len(fetched)
+        for creator_id, profile in fetched.items():
+            profiles[(platform, creator_id)] = profile
+            cache.put("profiles", f"{platform}:{creator_id}", profile)
+    return profiles
+
+
+def discover(game_names, per_game=CREATORS_PER_GAME, workers=CREATOR_WORKERS, platforms=None, cache=None):
+    """Creator rows for every game, one per (game, creator) hit, in the fetch_data row format,
+    and this call's stats: counts of games, searches, distinct creators, fetched profiles
+    and rows, plus the platforms left incomplete by failures or the YouTube quota"""
+    game_names = list(dict.fromkeys(game_names))
+    platforms = configured_platforms() if platforms is None else platforms
+    cache = cache or get_cache()
+    cache.load()
+    stats = {"games": len(game_names), "searches": 0, "creators": 0, "profiles_fetched": 0}
+    incomplete = set()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        hits = search(executor, cache, platforms, game_names, per_game, stats, incomplete)
+        profiles = fetch_profiles(executor, cache, hits, stats, incomplete)
+    cache.save()
+
+    timestamp = datetime.now().isoformat()
+    creator_data = []
+    for (platform, game_name), creator_ids in hits.items():
+        for creator_id in dict.fromkeys(creator_ids):
+            profile = profiles.get((platform, creator_id))
+            if profile is not None:
+                creator_data.append({"creator_id": creator_id, "platform": platform, "game_name": game_name,
+                                     "timestamp": timestamp, **profile})
+    stats["rows"] = len(creator_data)
+    stats["incomplete"] = sorted(incomplete)
+    return creator_data, stats
@@ -0,0 +1,240 @@
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+
+load_dotenv()
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+# Connections idle longer than this are pinged before use. A serverless instance can be
+# frozen between invocations long enough for the server or a proxy to drop them.
+DB_PING_AFTER = float(os.getenv("DB_PING_AFTER", "30"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+_last_used = {}
+# Tracked here rather than read from the pool's private lists: ids of the open
+# connections handed out so far, and how many of them are checked out now
+_open = set()
+_in_use = 0
+_stats_lock = threading.Lock()
+_stats = {
+    "checkouts": 0,
+    "waits": 0,
+    "timeouts": 0,
+    "discarded": 0,
+    "pings": 0,
+}
+
+
+def _bump(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _track(conn, checked_out):
+    global _in_use
+    with _stats_lock:
+        _in_use += 1 if checked_out else -1
+        if checked_out:
+            _open.add(id(conn))
+
+
+def init_pool(minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX):
+    """Create the shared connection pool (no-op if it already exists)"""
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            _pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, SUPABASE_URL, connect_timeout=DB_CONNECT_TIMEOUT)
+            _slots = threading.BoundedSemaphore(maxconn)
+    return _pool
+
+
+def close_pool():
+    """Close every pooled connection; called on app shutdown"""
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+        _pool = None
+        _last_used.clear()
+        _slots = None
+    with _stats_lock:
+        _open.clear()
+
+
+def _checked(db_pool, conn):
+    """Return conn, or a fresh connection if conn sat idle past DB_PING_AFTER and is dead"""
+    last_used = _last_used.get(id(conn))
+    if last_used is None or time.monotonic() - last_used < DB_PING_AFTER:
+        return conn
+    _bump("pings")
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        _discard(db_pool, conn)
+        return db_pool.getconn()
+
+
+def _discard(db_pool, conn):
+    _bump("discarded")
+    _last_used.pop(id(conn), None)
+    with _stats_lock:
+        _open.discard(id(conn))
+    db_pool.putconn(conn, close=True)
+
+
+@contextmanager
+def get_connection():
+    """Borrow a connection from the pool, blocking up to DB_POOL_TIMEOUT when it is exhausted.
+
+    ThreadedConnectionPool raises instead of waiting when every connection is in use,
+    so a semaphore sized to maxconn bounds concurrent checkouts and queues the rest.
+    Connections are read-only and in autocommit mode, so a read is just the query: no
+    BEGIN before it and no rollback when the connection goes back.
+    """
+    with metrics.phase("pool_wait"):
+        db_pool = init_pool()
+        slots = _slots
+        if not slots.acquire(blocking=False):
+            _bump("waits")
+            if not slots.acquire(timeout=DB_POOL_TIMEOUT):
+                _bump("timeouts")
+                raise psycopg2.OperationalError("Timed out waiting for a pooled database connection")
+    conn = None
+    broken = False
+    tracked = False
+    try:
+        with metrics.phase("pool_wait"):
+            conn = _checked(db_pool, db_pool.getconn())
+            if not conn.autocommit:
+                # First checkout of a new connection
+                conn.set_session(readonly=True, autocommit=True)
+        _bump("checkouts")
+        _track(conn, checked_out=True)
+        tracked = True
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        if conn is not None:
+            if tracked:
+                _track(conn, checked_out=False)
+            if broken or conn.closed:
+                _discard(db_pool, conn)
+            else:
+                _last_used[id(conn)] = time.monotonic()
+                db_pool.putconn(conn)
+                if conn.closed:
+                    # The pool keeps only minconn idle connections and closes the rest
+                    _last_used.pop(id(conn), None)
+                    with _stats_lock:
+                        _open.discard(id(conn))
+        slots.release()
+
+
+def _run_query(query, params=None, columnar=False):
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            with metrics.phase("query"):
+                cursor.execute(query, params or None)
+            with metrics.phase("fetch"):
+                columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                rows = cursor.fetchall() if columns else []
+    if columnar:
+        # Row tuples go to the serializer as they are; no dict per row
+        return {"columns": columns, "data": rows}
+    with metrics.phase("row_conversion"):
+        return [dict(zip(columns, row)) for row in rows]
+
+
+def execute_query_sync(query, params=None, columnar=False, name="query"):
+    """Run a query on a pooled connection and return the rows as dictionaries,
+    or as {"columns": [...], "data": [[...], ...]} when columnar is set.
+
+    name labels the query in metrics and the slow-query log.
+    """
+    start = time.perf_counter()
+    try:
+        result = _run_query(query, params, columnar)
+        metrics.record_query(name, time.perf_counter() - start)
+        return result
+    except psycopg2.Error as e:
+        metrics.record_query(name, time.perf_counter() - start, error=e)
+        return {"error": f"Database query error: {str(e)}"}
+
+
+async def execute_query(query, params=None, columnar=False, name="query"):
+    """Async wrapper around execute_query_sync that keeps blocking I/O off the event loop"""
+    return await run_in_threadpool(execute_query_sync, query, params, columnar, name)
+
+
+def to_columnar(result):
+    """Convert a list of row dicts, or a {"data": [...], ...} page of them, to the columnar shape"""
+    if isinstance(result, list):
+        columns = list(result[0].keys()) if result else []
+        return {"columns": columns, "data": [list(row.values()) for row in result]}
+    if isinstance(result, dict) and isinstance(result.get("data"), list):
+        return {**result, **to_columnar(result["data"])}
+    return result
+
+
+def stream_query(query, params=None, itersize=EXPORT_BATCH_SIZE):
+    """Generator over a server-side (named) cursor: yields the column names, then one tuple per row.
+
+    Rows arrive from Postgres itersize at a time, so memory stays flat however large the
+    result is. The pooled connection is held until the generator is exhausted or closed.
+    """
+    with get_connection() as conn:
+        # A named cursor lives in a transaction, so autocommit is off until it is done
+        conn.autocommit = False
+        try:
+            with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cursor:
+                cursor.itersize = itersize
+                cursor.execute(query, params or None)
+                # A named cursor only knows its columns after the first fetch
+                first = cursor.fetchone()
+                yield [desc[0] for desc in cursor.description]
+                if first is not None:
+                    yield first
+                    for row in cursor:
+                        yield row
+        finally:
+            if not conn.closed:
+                conn.rollback()
+                conn.autocommit = True
+
+
+def pool_stats():
+    """Snapshot of pool usage for the /pool-stats endpoint"""
+    if _pool is None:
+        return {"initialized": False, "min": DB_POOL_MIN, "max": DB_POOL_MAX, **_stats}
+    with _stats_lock:
+        in_use = _in_use
+        opened = len(_open)
+        stats = dict(_stats)
+    return {
+        "initialized": True,
+        "min": _pool.minconn,
+        "max": _pool.maxconn,
+        "in_use": in_use,
+        "idle": opened - in_use,
+        "open": opened,
+        **stats,
+    }
@@ -0,0 +1,38 @@
+def lttb(rows, threshold, x, y):
+    """Largest-Triangle-Three-Buckets downsampling of rows (dicts sorted by x) to threshold points.
+
+    x and y are callables extracting numeric coordinates from a row. The first and last
+    rows are always kept, and each bucket in between keeps the row forming the largest
+    triangle with its neighbours, which preserves peaks and dips that averaging would flatten.
+    """
+    if threshold >= len(rows) or threshold < 3:
+        return list(rows)
+
+    points = [(x(row), y(row)) for row in rows]
+    sampled = [rows[0]]
+    bucket_width = (len(rows) - 2) / (threshold - 2)
+    selected = 0
+    for i in range(threshold - 2):
+        bucket_from = int(i * bucket_width) + 1
+        bucket_to = int((i + 1) * bucket_width) + 1
+
+        # Average of the next bucket is the third triangle vertex
+        next_from = bucket_to
+        next_to = min(int((i + 2) * bucket_width) + 1, len(rows))
+        next_points = points[next_from:next_to] or [points[-1]]
+        avg_x = sum(p[0] for p in next_points) / len(next_points)
+        avg_y = sum(p[1] for p in next_points) / len(next_points)
+
+        ax, ay = points[selected]
+        best_area = -1.0
+        best = bucket_from
+        for j in range(bucket_from, bucket_to):
+            bx, by = points[j]
+            area = abs((ax - avg_x) * (by - ay) - (ax - bx) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        sampled.append(rows[best])
+        selected = best
+    sampled.append(rows[-1])
+    return sampled
@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from snapshots import LATEST_SNAPSHOT, row_time_bounds, valid_at
+
+# Columns an export may return per table; genre_list is left out since genres carries the same data
+EXPORT_TABLES = {
+    "game_stats": ["snapshot_id", "timestamp", "source", "name", "player_count", "price", "price_cents",
+                   "currency", "avg_playtime", "genres"],
+    "creator_stats": ["snapshot_id", "timestamp", "platform", "creator_id", "name", "subscriber_count",
+                      "video_count", "total_views", "game_name", "valid_to_snapshot", "valid_to"],
+    "price_history": ["snapshot_id", "timestamp", "source", "game_id", "name", "price", "price_cents", "currency",
+                      "valid_to_snapshot", "valid_to"],
+}
+# Tables storing change events: a snapshot export returns the rows valid at that snapshot
+CHANGE_ONLY_TABLES = {"creator_stats", "price_history"}
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+ROWS_PER_CHUNK = 500
+
+
+def build_export_query(table, snapshot=None, start=None, end=None):
+    """SELECT for an export; snapshot is a snapshot id or "latest", start/end bound the row timestamp"""
+    query = f"SELECT {', '.join(EXPORT_TABLES[table])} FROM {table} WHERE TRUE"
+    params = []
+    if table in CHANGE_ONLY_TABLES and snapshot is not None:
+        snapshot_sql, params = valid_at(None if snapshot == "latest" else int(snapshot))
+        query += f" AND {snapshot_sql}"
+    elif snapshot == "latest":
+        query += f" AND snapshot_id = {LATEST_SNAPSHOT}"
+    elif snapshot is not None:
+        query += " AND snapshot_id = %s"
+        params.append(int(snapshot))
+    if table == "game_stats" and snapshot is not None:
+        bounds_sql, bounds_params = row_time_bounds(None if snapshot == "latest" else int(snapshot))
+        query += f" AND {bounds_sql}"
+        params += bounds_params
+    if start:
+        query += " AND timestamp >= %s"
+        params.append(start)
+    if end:
+        query += " AND timestamp < %s"
+        params.append(end)
+    return query, params
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def encode_ndjson(columns, rows):
+    for chunk in _chunks(rows):
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), default=_json_value, separators=(",", ":")) + "\n"
+            for row in chunk
+        ).encode()
+
+
+def encode_csv(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for chunk in _chunks(rows):
+        writer.writerows(
+            [value.isoformat() if isinstance(value, (datetime, date)) else value for value in row]
+            for row in chunk
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _chunks(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -2,34 +2,34 @@ import requests
 import psycopg2
 from dotenv import load_dotenv
 import os
+import sys
 from datetime import datetime
 import time
 import re
 import feedparser
-from googleapiclient.discovery import build
+from concurrent.futures import ThreadPoolExecutor
+from schema import apply_migrations
+from snapshots import begin_snapshot, fail_snapshot
+from storage import write_snapshot
+import cache
+import creators
+import upstream
+import http_cache
+import metrics
+import partitions
+import twitch
+import youtube
 
 load_dotenv()
 STEAM_API_KEY = os.getenv("STEAM_API_KEY")
-YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 TWITCH_CLIENT_ID = os.getenv("TWITCH_CLIENT_ID")
 TWITCH_CLIENT_SECRET = os.getenv("TWITCH_CLIENT_SECRET")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
-
-def get_twitch_access_token():
-    try:
-        response = requests.post(
-            "https://id.twitch.tv/oauth2/token",
-            data={
-                "client_id": TWITCH_CLIENT_ID,
-                "client_secret": TWITCH_CLIENT_SECRET,
-                "grant_type": "client_credentials"
-            }
-        )
-        response.raise_for_status()
-        return response.json().get("access_token")
-    except requests.RequestException as e:
-        print(f"Error getting Twitch access token: {e}")
-        return None
+STEAM_WORKERS = int(os.getenv("STEAM_WORKERS", "8"))
+INGEST_METRICS_FILE = os.getenv(
+    "INGEST_METRICS_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "ingest_metrics.prom")
+)
 
 def clean_price(price_str):
     if not price_str or price_str.lower() in ["free", "0", "$0", "$0.00"]:
@@ -40,73 +40,113 @@ def clean_price(price_str):
     print(f"Invalid price format: {price_str}, defaulting to 'N/A'")
     return "N/A"
 
+def price_to_cents(price):
+    """Numeric counterpart of a clean_price string: 0 for "Free", None when unknown.
+    Raises ValueError for anything that is not a string."""
+    if not isinstance(price, str):
+        raise ValueError(f"Expected a clean_price string, got {price!r}")
+    if price == "Free":
+        return 0
+    try:
+        return round(float(price.lstrip("$")) * 100)
+    except ValueError:
+        return None
+
+def fetch_steam_top_apps():
+    """SteamSpy's top 100 apps of the last two weeks, as {appid: {"name": ...}}"""
+    url = "https://steamspy.com/api.php?request=top100in2weeks"
+    response = upstream.get(url)
+    response.raise_for_status()
+    return response.json()
+
 def fetch_steam_games():
     try:
-        url = "https://steamspy.com/api.php?request=top100in2weeks"
-        response = requests.get(url)
-        response.raise_for_status()
-        games = response.json()
+        games = fetch_steam_top_apps()
         print(f"Fetched {len(games)} Steam games")
-        game_data = []
-        for appid, data in list(games.items()):  # Limit to 5 for testing
-            game = fetch_steam_game_details(appid, data.get("name", "Unknown"))
-            game["source"] = "Steam"
-            game_data.append(game)
+        start = time.monotonic()
+        # Every app needs three independent lookups; queue them all and let the per-host
+        # rate limiters in upstream pace each API instead of sleeping between apps.
+        with ThreadPoolExecutor(max_workers=STEAM_WORKERS) as executor:
+            pending = [
+                (appid, data.get("name", "Unknown"), [executor.submit(fetch, appid) for fetch in STEAM_DETAIL_FETCHERS])
+                for appid, data in games.items()
+            ]
+            game_data = []
+            for appid, name, futures in pending:
+                game = build_steam_game(appid, name, [future.result for future in futures])
+                if game is not None:
+                    game["source"] = "Steam"
+                    game_data.append(game)
+        elapsed = time.monotonic() - start
+        print(f"Fetched details for {len(game_data)} of {len(games)} Steam apps in {elapsed:.1f}s "
+              f"({len(games) / elapsed if elapsed else 0:.2f} apps/sec)")
+        upstream.print_stats()
         return game_data
     except requests.RequestException as e:
         print(f"Error fetching Steam games: {e}")
         return []
 
-def fetch_steam_game_details(appid, name):
-    try:
-        player_url = f"https://api.steampowered.com/ISteamUserStats/GetNumberOfCurrentPlayers/v1/?key={STEAM_API_KEY}&appid={appid}"
-        player_response = requests.get(player_url)
-        player_response.raise_for_status()
-        player_count = player_response.json().get("response", {}).get("player_count", 0)
+def fetch_steam_player_count(appid):
+    player_url = f"https://api.steampowered.com/ISteamUserStats/GetNumberOfCurrentPlayers/v1/?key={STEAM_API_KEY}&appid={appid}"
+    player_response = upstream.get(player_url)
+    player_response.raise_for_status()
+    return player_response.json().get("response", {}).get("player_count", 0)
 
-        price_url = f"https://store.steampowered.com/api/appdetails?appids={appid}"
-        price_response = requests.get(price_url)
-        price_response.raise_for_status()
-        app_data = price_response.json()[str(appid)]
-        if not app_data.get("success", False):
-            raise ValueError("Steam API returned unsuccessful response")
-        app_data = app_data.get("data", {})
-        raw_price = app_data.get("price_overview", {}).get("final_formatted", "Free")
-        price = clean_price(raw_price)
-        genres = ", ".join([genre["description"] for genre in app_data.get("genres", [])]) or "N/A"
+def fetch_steam_store_details(appid):
+    price_url = f"https://store.steampowered.com/api/appdetails?appids={appid}"
+    price_response = upstream.get(price_url)
+    price_response.raise_for_status()
+    app_data = price_response.json()[str(appid)]
+    if not app_data.get("success", False):
+        raise ValueError("Steam API returned unsuccessful response")
+    app_data = app_data.get("data", {})
+    price_overview = app_data.get("price_overview", {})
+    raw_price = price_overview.get("final_formatted", "Free")
+    price = clean_price(raw_price)
+    # "final" is already in the currency's minor unit; no price_overview means free to play
+    price_cents = price_overview.get("final", 0)
+    currency = price_overview.get("currency")
+    genres = ", ".join([genre["description"] for genre in app_data.get("genres", [])]) or "N/A"
+    return price, price_cents, currency, genres
 
-        steamspy_url = f"https://steamspy.com/api.php?request=appdetails&appid={appid}"
-        steamspy_response = requests.get(steamspy_url)
-        steamspy_response.raise_for_status()
-        steamspy_data = steamspy_response.json()
-        avg_playtime = steamspy_data.get("average_2weeks", 0) / 60.0
+def fetch_steamspy_playtime(appid):
+    steamspy_url = f"https://steamspy.com/api.php?request=appdetails&appid={appid}"
+    steamspy_response = upstream.get(steamspy_url)
+    steamspy_response.raise_for_status()
+    steamspy_data = steamspy_response.json()
+    return steamspy_data.get("average_2weeks", 0) / 60.0
 
-        time.sleep(1)
+STEAM_DETAIL_FETCHERS = (fetch_steam_player_count, fetch_steam_store_details, fetch_steamspy_playtime)
+
+def build_steam_game(appid, name, results):
+    """Assemble a game dict from the three detail lookups; results are zero-arg callables.
+
+    Returns None when a lookup failed, so the game is left out of the snapshot rather
+    than written with placeholder zeros.
+    """
+    try:
+        player_count, (price, price_cents, currency, genres), avg_playtime = [result() for result in results]
         return {
             "game_id": str(appid),
             "name": name,
             "player_count": player_count,
             "price": price,
+            "price_cents": price_cents,
+            "currency": currency,
             "avg_playtime": avg_playtime,
             "genres": genres,
             "timestamp": datetime.now().isoformat()
         }
-    except (requests.RequestException, ValueError) as e:
+    except (requests.RequestException, ValueError, KeyError) as e:
         print(f"Error fetching Steam data for {name}: {e}")
-        return {
-            "game_id": str(appid),
-            "name": name,
-            "player_count": 0,
-            "price": "N/A",
-            "avg_playtime": 0.0,
-            "genres": "N/A",
-            "timestamp": datetime.now().isoformat()
-        }
+        return None
 
 def fetch_itch_games():
     try:
         url = "https://itch.io/games/top-rated.rss"
-        feed = feedparser.parse(url)
+        response = upstream.get(url)
+        response.raise_for_status()
+        feed = feedparser.parse(response.content)
         game_data = []
         for entry in feed.entries[:3]:  # Limit to 3 for testing
             # Handle link safely
@@ -130,6 +170,8 @@ def fetch_itch_games():
                 "name": name,
                 "player_count": 0,
                 "price": price,
+                "price_cents": price_to_cents(price),
+                "currency": None,
                 "avg_playtime": 0.0,
                 "genres": genres,
                 "timestamp": datetime.now().isoformat(),
@@ -141,176 +183,132 @@ def fetch_itch_games():
         print(f"Error fetching itch.io games: {e}")
         return []
 
-def fetch_youtube_creators(game_name):
-    try:
-        youtube = build("youtube", "v3", developerKey=YOUTUBE_API_KEY)
-        search_response = youtube.search().list(
-            q=game_name,
-            part="snippet",
-            type="channel",
-            maxResults=2  # Limit for testing
-        ).execute()
-        creator_data = []
-        for item in search_response.get("items", []):
-            channel_id = item["snippet"]["channelId"]
-            channel_response = youtube.channels().list(
-                part="snippet,statistics",
-                id=channel_id
-            ).execute()
-            channel = channel_response.get("items", [{}])[0]
-            stats = channel.get("statistics", {})
-            creator_data.append({
-                "creator_id": channel_id,
-                "name": channel.get("snippet", {}).get("title", "Unknown"),
-                "platform": "YouTube",
-                "subscriber_count": int(stats.get("subscriberCount", 0)),
-                "video_count": int(stats.get("videoCount", 0)),
-                "total_views": int(stats.get("viewCount", 0)),
-                "game_name": game_name,
-                "timestamp": datetime.now().isoformat()
-            })
-        print(f"Fetched {len(creator_data)} YouTube creators for {game_name}")
-        return creator_data
-    except Exception as e:
-        print(f"Error fetching YouTube creators for {game_name}: {e}")
-        return []
+def fetch_creators(game_names):
+    """Creators of every game from each configured platform, deduplicated across games,
+    and the platforms whose discovery was incomplete"""
+    if not (TWITCH_CLIENT_ID and TWITCH_CLIENT_SECRET):
+        print("Twitch credentials are not configured, skipping Twitch creators")
+    youtube.reset_quota()
+    twitch_requests_before = twitch.get_client().request_count
+    creator_data, stats = creators.discover(game_names)
+    print(f"Fetched {stats['rows']} creator rows for {stats['games']} games: {stats['creators']} distinct creators, "
+          f"{stats['searches']} searches and {stats['profiles_fetched']} profiles fetched, the rest cached")
+    calls = ", ".join(f"{count} {method}" for method, count in sorted(youtube.quota["calls"].items()))
+    print(f"YouTube quota used this run: {youtube.quota['units']} units ({calls or 'no calls'})")
+    print(f"Twitch requests this run: {twitch.get_client().request_count - twitch_requests_before}")
+    if stats["incomplete"]:
+        print(f"Creator discovery incomplete for {', '.join(stats['incomplete'])}; keeping their current rows")
+    return creator_data, stats["incomplete"]
 
-def fetch_twitch_creators(game_name):
+def start_snapshot():
+    try:
+        conn = psycopg2.connect(SUPABASE_URL)
         try:
-            access_token = get_twitch_access_token()
-            if not access_token:
-                return []
-            headers = {
-                "Client-ID": TWITCH_CLIENT_ID,
-                "Authorization": f"Bearer {access_token}"
-            }
-            game_response = requests.get(
-                f"https://api.twitch.tv/helix/games?name={game_name}",
-                headers=headers
-            )
-            game_response.raise_for_status()
-            game_id = game_response.json().get("data", [{}])[0].get("id")
-            if not game_id:
-                return []
-
-            streams_response = requests.get(
-                f"https://api.twitch.tv/helix/streams?game_id={game_id}&first=2",
-                headers=headers
-            )
-            streams_response.raise_for_status()
-            creator_data = []
-            for stream in streams_response.json().get("data", []):
-                user_id = stream["user_id"]
-                user_response = requests.get(
-                    f"https://api.twitch.tv/helix/users?id={user_id}",
-                    headers=headers
-                )
-                user_response.raise_for_status()
-                user = user_response.json().get("data", [{}])[0]
-                videos_response = requests.get(
-                    f"https://api.twitch.tv/helix/videos?user_id={user_id}&first=10",  # Increased to 10
-                    headers=headers
-                )
-                videos_response.raise_for_status()
-                videos = videos_response.json().get("data", [])
-                total_views = sum(v["view_count"] for v in videos) if videos else 0
-                creator_data.append({
-                    "creator_id": user_id,
-                    "name": user.get("display_name", "Unknown"),
-                    "platform": "Twitch",
-                    "subscriber_count": 0,
-                    "video_count": len(videos),
-                    "total_views": total_views,
-                    "game_name": game_name,
-                    "timestamp": datetime.now().isoformat()
-                })
-            print(f"Fetched {len(creator_data)} Twitch creators for {game_name}")
-            return creator_data
-        except requests.RequestException as e:
-            print(f"Error fetching Twitch creators for {game_name}: {e}")
-            return []
+            apply_migrations(conn)
+            with conn.cursor() as cursor:
+                snapshot_id = begin_snapshot(cursor)
+            conn.commit()
+        finally:
+            conn.close()
+        print(f"Started ingest snapshot {snapshot_id}")
+        return snapshot_id
+    except psycopg2.Error as e:
+        print(f"Could not start ingest snapshot: {e}")
+        return None
 
 def fetch_game_data():
-    steam_games = fetch_steam_games()
-    itch_games = fetch_itch_games()
+    try:
+        with metrics.ingest_stage("total"):
+            run_ingest()
+    finally:
+        export_ingest_metrics()
+
+def run_ingest():
+    snapshot_id = start_snapshot()
+    if snapshot_id is None:
+        return
+
+    with metrics.ingest_stage("fetch_games"):
+        steam_games = fetch_steam_games()
+        itch_games = fetch_itch_games()
     game_data = steam_games + itch_games
     print(f"Total games fetched: {len(game_data)}")
     print("Sample games:")
     for game in game_data[:3]:
         print(f"- {game['name']} ({game['source']})")
 
-    creator_data = []
-    # Get game names for creator fetching
-    game_names = [game["name"] for game in game_data[:2]]  # Limit to 2 games for testing
-    for game_name in game_names:
-        creator_data.extend(fetch_youtube_creators(game_name))
-        creator_data.extend(fetch_twitch_creators(game_name))
-        time.sleep(1)
+    with metrics.ingest_stage("fetch_creators"):
+        creator_data, incomplete = fetch_creators([game["name"] for game in game_data])
 
     print(f"Total creators fetched: {len(creator_data)}")
     print("Sample creators:")
     for creator in creator_data[:3]:
         print(f"- {creator['name']} ({creator['platform']})")
+    http_cache.print_stats()
 
-    try:
-        conn = psycopg2.connect(SUPABASE_URL)
-        cursor = conn.cursor()
+    write_and_publish(snapshot_id, game_data, creator_data, kept_platforms=incomplete)
 
-        for game in game_data:
+def write_and_publish(snapshot_id, game_data, creator_data, kept_platforms=()):
+    """Write a started snapshot and publish it, or mark it failed; returns True on success.
+    Creators of kept_platforms missing from creator_data stay current."""
+    try:
+        with metrics.ingest_stage("write"):
+            conn = psycopg2.connect(SUPABASE_URL)
             try:
-                cursor.execute("""
-                    INSERT INTO game_stats (name, player_count, price, avg_playtime, genres, timestamp, source)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    game["name"],
-                    game["player_count"],
-                    game["price"],
-                    game["avg_playtime"],
-                    game["genres"],
-                    game["timestamp"],
-                    game["source"]
-                ))
-                cursor.execute("""
-                    INSERT INTO price_history (game_id, name, price, timestamp, source)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
-                    game["game_id"],
-                    game["name"],
-                    game["price"],
-                    game["timestamp"],
-                    game["source"]
-                ))
-            except psycopg2.IntegrityError:
-                print(f"Skipping duplicate game entry for {game['name']}")
-                conn.rollback()
-                continue
+                counts = write_snapshot(conn, snapshot_id, game_data, creator_data, kept_platforms)
+            finally:
+                conn.close()
+        for table, table_counts in counts.items():
+            metrics.INGEST_ROWS.set(table_counts["inserted"], table=table)
+            if table_counts["skipped"]:
+                print(f"Skipped {table_counts['skipped']} duplicate {table} rows")
+            if table_counts.get("duplicates"):
+                print(f"Skipped {table_counts['duplicates']} duplicate {table} rows")
+            if table_counts.get("unchanged"):
+                print(f"{table}: {table_counts['unchanged']} unchanged, {table_counts['closed']} closed")
+        print(f"Data inserted successfully, published snapshot {snapshot_id}")
+        cache.publish_snapshot(snapshot_id)
+        return True
+    except psycopg2.Error as e:
+        print(f"Database insertion error: {e}")
+        mark_snapshot_failed(snapshot_id)
+        return False
 
-        for creator in creator_data:
-            try:
-                cursor.execute("""
-                    INSERT INTO creator_stats (creator_id, name, platform, subscriber_count, video_count, total_views, game_name, timestamp)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    creator["creator_id"],
-                    creator["name"],
-                    creator["platform"],
-                    creator["subscriber_count"],
-                    creator["video_count"],
-                    creator["total_views"],
-                    creator["game_name"],
-                    creator["timestamp"]
-                ))
-            except psycopg2.IntegrityError:
-                print(f"Skipping duplicate creator entry for {creator['name']}")
-                conn.rollback()
-                continue
+def export_ingest_metrics():
+    """Per-upstream timings and counts for the run, in Prometheus textfile format"""
+    try:
+        metrics.write_textfile(INGEST_METRICS_FILE)
+        print(f"Wrote ingest metrics to {INGEST_METRICS_FILE}")
+    except OSError as e:
+        print(f"Could not write ingest metrics: {e}")
 
+def maintain_partitions():
+    """Create upcoming partitions and apply retention; runs on its own schedule, never as
+    part of an ingest, so a slow or failing archive cannot hold up a snapshot"""
+    conn = psycopg2.connect(SUPABASE_URL)
+    try:
+        archived = partitions.maintain(conn)
+    finally:
+        conn.close()
+    if archived:
+        print(f"Archived {len(archived)} partitions")
+    return archived
+
+def mark_snapshot_failed(snapshot_id):
+    try:
+        conn = psycopg2.connect(SUPABASE_URL)
+        with conn.cursor() as cursor:
+            fail_snapshot(cursor, snapshot_id)
         conn.commit()
-        cursor.close()
         conn.close()
-        print("Data inserted successfully")
     except psycopg2.Error as e:
-        print(f"Database insertion error: {e}")
+        print(f"Could not mark snapshot {snapshot_id} as failed: {e}")
 
 if __name__ == "__main__":
-    fetch_game_data()
\ No newline at end of file
+    if "--daemon" in sys.argv:
+        import scheduler
+        scheduler.run()
+    elif "--maintain" in sys.argv:
+        maintain_partitions()
+    else:
+        fetch_game_data()
\ No newline at end of file
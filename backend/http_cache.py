@@ -0,0 +1,162 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+HTTP_CACHE_DIR = os.getenv(
+    "HTTP_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+)
+
+
+def json_body(response):
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+def steam_appdetails_ok(response):
+    """Steam answers 200 with {"<appid>": {"success": false}} when it has no details to give"""
+    body = json_body(response)
+    return isinstance(body, dict) and bool(body) and all(
+        isinstance(app, dict) and app.get("success") for app in body.values()
+    )
+
+
+def steamspy_appdetails_ok(response):
+    """SteamSpy answers 200 with an empty record (name null) for apps it does not know yet"""
+    body = json_body(response)
+    return isinstance(body, dict) and bool(body.get("name"))
+
+
+# First matching pattern wins. A TTL of 0 means always fetch fresh (and never store),
+# which is what volatile data such as current player counts needs. The optional check
+# tells a real answer from a soft failure sent with a 200; only real answers are stored.
+CACHE_RULES = [
+    (re.compile(r"api\.steampowered\.com/ISteamUserStats/GetNumberOfCurrentPlayers"), 0, None),
+    (re.compile(r"store\.steampowered\.com/api/appdetails"), 24 * 3600, steam_appdetails_ok),
+    (re.compile(r"steamspy\.com/api\.php\?request=appdetails"), 12 * 3600, steamspy_appdetails_ok),
+    (re.compile(r"steamspy\.com/api\.php\?request=top100in2weeks"), 3600, None),
+    (re.compile(r"itch\.io/games/top-rated\.rss"), 6 * 3600, None),
+]
+
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def ttl_for(url):
+    for pattern, ttl, _ in CACHE_RULES:
+        if pattern.search(url):
+            return ttl
+    return 0
+
+
+def cacheable(url, response):
+    """Whether a 200 response for url passes its rule's check and may be stored"""
+    for pattern, _, check in CACHE_RULES:
+        if pattern.search(url):
+            return response.status_code == 200 and (check is None or check(response))
+    return False
+
+
+class HttpCache:
+    """Persistent response cache in a single SQLite file, safe to share between threads"""
+
+    def __init__(self, directory=HTTP_CACHE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "http_cache.sqlite")
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                fetched_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "stores": 0}
+
+    def record(self, outcome):
+        """Count how a lookup was answered: hits, misses or revalidated"""
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def get(self, url):
+        """Cached entry as (response, is_fresh), or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, headers, body, expires_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        status, headers, body, expires_at = row
+        return to_response(url, status, json.loads(headers), body), expires_at > time.time()
+
+    def store(self, url, response, ttl):
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (url, status, headers, body, fetched_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, response.status_code, json.dumps(headers), response.content, now, now + ttl)
+            )
+            self._conn.commit()
+            self.stats["stores"] += 1
+
+    def refresh(self, url, ttl):
+        """Extend an entry after the upstream answered 304 Not Modified"""
+        with self._lock:
+            self._conn.execute("UPDATE responses SET expires_at = ? WHERE url = ?", (time.time() + ttl, url))
+            self._conn.commit()
+
+
+def to_response(url, status, headers, body):
+    response = requests.Response()
+    response.url = url
+    response.status_code = status
+    response.headers.update(headers)
+    response._content = body
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    return response
+
+
+def conditional_headers(cached):
+    """If-None-Match / If-Modified-Since for revalidating a stale entry"""
+    headers = {}
+    if cached.headers.get("ETag"):
+        headers["If-None-Match"] = cached.headers["ETag"]
+    if cached.headers.get("Last-Modified"):
+        headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+    return headers
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache()
+        return _cache
+
+
+def print_stats():
+    if _cache is None:
+        return
+    stats = _cache.stats
+    print(f"HTTP cache: {stats['hits']} hits, {stats['revalidated']} revalidated (304), "
+          f"{stats['misses']} misses, {stats['stores']} stored")
@@ -1,69 +1,72 @@
-from http.server import BaseHTTPRequestHandler
-import json
-from urllib.parse import urlparse
+"""Vercel entry point: serves the FastAPI app from app.py as a serverless function.
 
-class handler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        
-        path = urlparse(self.path).path
-        
-        if path == '/':
-            response = {
-                "message": "GamePulse API is running!",
-                "endpoints": [
-                    "/trending-games",
-                    "/top-genres",
-                    "/playtime-insights",
-                    "/affordable-games",
-                    "/top-creators"
-                ]
-            }
-        elif path == '/trending-games':
-            response = {
-                "message": "Trending games endpoint",
-                "data": [],
-                "status": "working"
-            }
-        elif path == '/top-genres':
-            response = {
-                "message": "Top genres endpoint",
-                "data": [],
-                "status": "working"
-            }
-        elif path == '/playtime-insights':
-            response = {
-                "message": "Playtime insights endpoint",
-                "data": [],
-                "status": "working"
-            }
-        elif path == '/affordable-games':
-            response = {
-                "message": "Affordable games endpoint",
-                "data": [],
-                "status": "working"
-            }
-        elif path == '/top-creators':
-            response = {
-                "message": "Top creators endpoint",
-                "data": [],
-                "status": "working"
-            }
-        else:
-            response = {
-                "error": "Endpoint not found",
-                "path": path,
-                "available_endpoints": [
-                    "/trending-games",
-                    "/top-genres",
-                    "/playtime-insights",
-                    "/affordable-games",
-                    "/top-creators"
-                ]
-            }
-        
-        self.wfile.write(json.dumps(response).encode())
-        return 
\ No newline at end of file
+Only the standard library is imported here. app.py and its dependencies load on the
+first request, so an instance starts without paying for FastAPI, psycopg2 and orjson
+imports until it has a request to serve. The app and its connection pool live in module
+globals, so warm invocations reuse both.
+"""
+import os
+import time
+
+# Each instance serves one request at a time and many may run at once, so keep every
+# instance's pool small; connections open on the first query, not at startup.
+os.environ.setdefault("DB_POOL_MIN", "0")
+os.environ.setdefault("DB_POOL_MAX", "2")
+
+_app = None
+startup = {"cold": True, "app_import_seconds": None, "first_request_seconds": None}
+
+
+def load_app():
+    """Import app.py once per instance"""
+    global _app
+    if _app is None:
+        start = time.perf_counter()
+        from app import app as fastapi_app
+        _app = fastapi_app
+        startup["app_import_seconds"] = round(time.perf_counter() - start, 4)
+    return _app
+
+
+async def _lifespan(receive, send):
+    # Nothing to set up before the first request; db.get_connection creates the pool lazily
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _app is not None:
+                import db
+                db.close_pool()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI callable Vercel's Python runtime invokes per request"""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+
+    if not startup["cold"]:
+        await load_app()(scope, receive, send)
+        return
+
+    # Report the cold start on the first response in a Server-Timing header
+    startup["cold"] = False
+    start = time.perf_counter()
+    fastapi_app = load_app()
+
+    async def send_with_timing(message):
+        if message["type"] == "http.response.start":
+            elapsed = time.perf_counter() - start
+            startup["first_request_seconds"] = round(elapsed, 4)
+            headers = list(message.get("headers", []))
+            headers.append((b"server-timing", (
+                f"cold-import;dur={startup['app_import_seconds'] * 1000:.1f}, "
+                f"cold-total;dur={elapsed * 1000:.1f}"
+            ).encode()))
+            message = {**message, "headers": headers}
+        await send(message)
+
+    await fastapi_app(scope, receive, send_with_timing)
@@ -0,0 +1,204 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+slow_query_log = logging.getLogger("gamepulse.slow_query")
+
+# Per-request scratch space, set by the HTTP middleware. It holds a mutable dict so that
+# code running in worker threads (which see a copy of the context) can still report back.
+request_context = contextvars.ContextVar("request_context", default=None)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_labels(self.labelnames, key)} {value}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def values(self):
+        """Current values keyed by their label dict, for reports outside Prometheus"""
+        with self._lock:
+            return [(dict(zip(self.labelnames, key)), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            cumulative, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    cumulative[i] += 1
+            self._values[key] = (cumulative, total + value, count + 1)
+
+    def _render_value(self, key, value):
+        cumulative, total, count = value
+        lines = [
+            f"{self.name}_bucket{_labels(self.labelnames, key, [('le', bound)])} {bucket_count}"
+            for bound, bucket_count in zip(self.buckets, cumulative)
+        ]
+        lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', '+Inf')])} {count}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def render():
+    """Every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path):
+    """Write the registry for node_exporter's textfile collector; the rename keeps scrapes atomic"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def phase(name):
+    """Time one phase of the current API request; does nothing outside a request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        context = request_context.get()
+        if context is not None:
+            REQUEST_PHASE_SECONDS.observe(time.perf_counter() - start, endpoint=context["endpoint"], phase=name)
+
+
+@contextmanager
+def ingest_stage(stage):
+    """Time a stage of an ingest run into INGEST_STAGE_SECONDS"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        INGEST_STAGE_SECONDS.set(round(time.perf_counter() - start, 3), stage=stage)
+
+
+def record_query(name, seconds, error=None):
+    """Record one database query; errors are counted and slow queries logged as JSON"""
+    DB_QUERY_SECONDS.observe(seconds, query=name)
+    context = request_context.get()
+    if error is not None:
+        DB_QUERY_ERRORS.inc(query=name)
+        if context is not None:
+            context["db_error"] = True
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc(query=name)
+        slow_query_log.warning(json.dumps({
+            "event": "slow_query",
+            "query": name,
+            "duration_ms": round(seconds * 1000, 1),
+            "threshold_ms": SLOW_QUERY_MS,
+            "endpoint": context["endpoint"] if context else None,
+            "error": str(error) if error is not None else None,
+        }))
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "gamepulse_http_request_duration_seconds", "End-to-end API request latency",
+    ("endpoint", "method", "status"))
+HTTP_REQUEST_ERRORS = Counter(
+    "gamepulse_http_request_errors_total",
+    "Failed API requests, including database errors returned as a 200 {error} payload",
+    ("endpoint", "kind"))
+REQUEST_PHASE_SECONDS = Histogram(
+    "gamepulse_request_phase_seconds",
+    "API time per phase: pool_wait, query, fetch, row_conversion, serialization",
+    ("endpoint", "phase"))
+DB_QUERY_SECONDS = Histogram(
+    "gamepulse_db_query_duration_seconds", "Database query latency including fetch", ("query",))
+DB_QUERY_ERRORS = Counter("gamepulse_db_query_errors_total", "Failed database queries", ("query",))
+SLOW_QUERIES = Counter("gamepulse_db_slow_queries_total", "Queries slower than SLOW_QUERY_MS", ("query",))
+DB_POOL = Gauge("gamepulse_db_pool_connections", "Database pool connections by state", ("state",))
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    "gamepulse_upstream_request_duration_seconds", "Upstream API request latency", ("host",))
+UPSTREAM_REQUESTS = Counter(
+    "gamepulse_upstream_requests_total", "Upstream API requests by outcome", ("host", "outcome"))
+UPSTREAM_THROTTLE_SECONDS = Counter(
+    "gamepulse_upstream_throttle_seconds_total", "Time spent waiting for an upstream rate budget", ("host",))
+UPSTREAM_RETRIES = Counter("gamepulse_upstream_retries_total", "Upstream request retries", ("host",))
+UPSTREAM_CIRCUIT_OPEN = Gauge(
+    "gamepulse_upstream_circuit_open", "1 while a host's circuit breaker is open or half-open", ("host",))
+INGEST_STAGE_SECONDS = Gauge(
+    "gamepulse_ingest_stage_seconds", "Duration of each stage of the last ingest run", ("stage",))
+INGEST_ROWS = Gauge("gamepulse_ingest_rows", "Rows inserted by the last ingest run", ("table",))
+CREATOR_CACHE_LOOKUPS = Counter(
+    "gamepulse_creator_cache_lookups_total", "Creator search and profile cache lookups", ("section", "outcome"))
+SEARCH_INDEX_DOCUMENTS = Gauge(
+    "gamepulse_search_index_documents", "Documents in the in-process search index", ("kind",))
+SCHEDULER_JOBS = Counter(
+    "gamepulse_scheduler_jobs_total", "Refresh jobs run by the ingest daemon", ("kind", "outcome"))
+SCHEDULER_DEFERRALS = Counter(
+    "gamepulse_scheduler_budget_deferrals_total", "Due jobs postponed because an API budget was spent", ("api",))
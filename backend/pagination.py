@@ -0,0 +1,78 @@
+import base64
+import json
+
+
+def sort_key(order):
+    """The sort order as recorded in a cursor, e.g. ["total_views DESC", "name ASC"]"""
+    return [f"{key} {direction}" for _, direction, key in order]
+
+
+def encode_cursor(values, order, filters=None):
+    """Opaque cursor carrying the sort key of the last row on a page, along with the sort
+    order and filters of the listing it belongs to"""
+    payload = {"sort": sort_key(order), "filters": filters or {}, "after": values}
+    encoded = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(encoded).decode().rstrip("=")
+
+
+def decode_cursor(cursor, order, filters=None):
+    """Sort key values from a cursor; raises ValueError if it is malformed or was issued
+    for another sort order or other filters, since its position means nothing there"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload["after"]
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Malformed cursor") from e
+    if payload.get("sort") != sort_key(order) or not isinstance(values, list) or len(values) != len(order):
+        raise ValueError("Cursor does not match the requested sort order")
+    if payload.get("filters") != (filters or {}):
+        raise ValueError("Cursor does not match the requested filters")
+    return values
+
+
+def order_by(order):
+    """ORDER BY clause for a list of (sql_expression, direction, row_key)"""
+    return " ORDER BY " + ", ".join(f"{expr} {direction}" for expr, direction, _ in order)
+
+
+def keyset_condition(order, values):
+    """WHERE fragment selecting rows strictly after the cursor position.
+
+    Sort directions can be mixed, so this expands to
+    a < x OR (a = x AND (b > y OR (b = y AND ...))), prefixed with a plain bound on the
+    leading column so the matching index scan starts at the cursor instead of the top.
+    """
+    def after(position):
+        expr, direction, _ = order[position]
+        op = "<" if direction == "DESC" else ">"
+        if position == len(order) - 1:
+            return f"{expr} {op} %s", [values[position]]
+        rest_sql, rest_params = after(position + 1)
+        return (
+            f"({expr} {op} %s OR ({expr} = %s AND {rest_sql}))",
+            [values[position], values[position]] + rest_params,
+        )
+
+    lead_expr, lead_direction, _ = order[0]
+    bound = "<=" if lead_direction == "DESC" else ">="
+    sql, params = after(0)
+    return f" AND {lead_expr} {bound} %s AND {sql}", [values[0]] + params
+
+
+def page_size(limit, cursor):
+    """Rows to fetch: paged requests read one row past the page to know whether another follows"""
+    return limit if cursor is None else limit + 1
+
+
+def paginate(rows, limit, order, filters=None):
+    """Wrap one page of rows with the cursor for the next page (None on the last page).
+    rows holds up to limit + 1 rows; the extra one is only a sign that more follow."""
+    if isinstance(rows, dict):
+        return rows
+    next_cursor = None
+    if limit > 0 and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last[key] for _, _, key in order], order, filters)
+    return {"data": rows, "next_cursor": next_cursor}
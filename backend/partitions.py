@@ -0,0 +1,500 @@
+"""Time-range partitioning of the stat tables, with retention and Parquet archival.
+
+    python partitions.py convert --granularity day
+    python partitions.py maintain
+    python partitions.py list
+    python partitions.py archive --older-than-days 90
+    python partitions.py show ../data/archive/game_stats/game_stats_p20260101.parquet
+    python partitions.py attach ../data/archive/game_stats/game_stats_p20260101.parquet
+
+Which column partitions each table:
+
+- game_stats: each row's timestamp.
+- price_history and creator_stats: valid_to, since they only store changes. Their
+  current rows (valid_to IS NULL) live in the default partition, so listings of current
+  data scan just that partition. A row moves into the partition of the day it was
+  replaced, and retention only ever archives history that is no longer current.
+
+convert rewrites a table into a partitioned one in a single transaction. maintain runs
+as its own job, outside ingest: from cron (python fetch_data.py --maintain), or every
+SCHEDULER_MAINTENANCE_INTERVAL in the daemon. It creates partitions PARTITION_PREMAKE
+periods ahead, and, when PARTITION_RETENTION_DAYS is set, archives older partitions.
+If it falls further behind than that, rows of the missing periods land in the default
+partition; creating a period's partition moves them out first. Each table is maintained
+separately, so one failing table is reported without stopping the others.
+
+A primary key on a partitioned table must contain the partition column, and valid_to is
+NULL for current rows, so the tables lose their PRIMARY KEY (id). Every partition gets
+a unique index on id instead; ids stay unique across partitions because they all come
+from the table's sequence, which convert keeps.
+Archiving writes the partition to a zstd-compressed Parquet file under
+PARTITION_ARCHIVE_DIR, then detaches and drops it. Archives can be read back with
+pyarrow or attached again.
+pyarrow is only needed for archiving and is not in requirements.txt.
+"""
+import argparse
+import os
+import re
+from datetime import datetime, timedelta
+
+import psycopg2
+from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+
+load_dotenv()
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+PARTITION_GRANULARITY = os.getenv("PARTITION_GRANULARITY", "day")
+PARTITION_PREMAKE = int(os.getenv("PARTITION_PREMAKE", "3"))
+PARTITION_RETENTION_DAYS = int(os.getenv("PARTITION_RETENTION_DAYS", "0")) or None
+PARTITION_ARCHIVE_DIR = os.getenv(
+    "PARTITION_ARCHIVE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "archive")
+)
+ARCHIVE_BATCH_SIZE = 10000
+
+# table: partition column
+PARTITION_COLUMNS = {
+    "game_stats": "timestamp",
+    "price_history": "valid_to",
+    "creator_stats": "valid_to",
+}
+# The per-snapshot unique keys of migration 002. A unique index on a partitioned table
+# must contain the partition column, so each partition gets its own instead; inserts
+# use ON CONFLICT DO NOTHING without a target, which checks the partition's indexes.
+UNIQUE_KEYS = {
+    "game_stats": ("snapshot_id", "source", "name"),
+    "price_history": ("snapshot_id", "game_id"),
+    "creator_stats": ("snapshot_id", "platform", "creator_id", "game_name"),
+}
+LEGACY_UNIQUE_INDEXES = {
+    "game_stats": "game_stats_snapshot_game_key",
+    "price_history": "price_history_snapshot_game_key",
+    "creator_stats": "creator_stats_snapshot_creator_key",
+}
+GRANULARITIES = ("day", "month")
+BOUND_PATTERN = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+ARCHIVE_NAME_PATTERN = re.compile(r"^(?P<table>[a-z_]+)_p(?P<start>\d{6}|\d{8})\.parquet$")
+
+
+def period_start(value, granularity):
+    """Start of the day or month containing value"""
+    start = datetime(value.year, value.month, value.day)
+    return start.replace(day=1) if granularity == "month" else start
+
+
+def next_period(start, granularity):
+    if granularity == "month":
+        return (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def partition_name(table, start, granularity):
+    return f"{table}_p{start:%Y%m}" if granularity == "month" else f"{table}_p{start:%Y%m%d}"
+
+
+def registered(cursor):
+    """{table: (partition column, granularity, unique index predicate)} of converted tables"""
+    cursor.execute("SELECT table_name, partition_column, granularity, unique_predicate FROM partitioned_tables")
+    return {table: (column, granularity, predicate) for table, column, granularity, predicate in cursor.fetchall()}
+
+
+def list_partitions(cursor, table):
+    """(name, start, end) of a table's range partitions, oldest first; the default partition is left out"""
+    cursor.execute("""
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = %s
+    """, (table,))
+    found = []
+    for name, bound in cursor.fetchall():
+        match = BOUND_PATTERN.search(bound)
+        if match:
+            found.append((name, datetime.fromisoformat(match.group(1)), datetime.fromisoformat(match.group(2))))
+    return sorted(found, key=lambda partition: partition[1])
+
+
+def ensure_unique_index(cursor, table, partition, predicate=None):
+    """The partition's per-snapshot unique index, and the unique id index standing in for
+    the primary key"""
+    where = f" WHERE {predicate}" if predicate else ""
+    cursor.execute(f"""
+        CREATE UNIQUE INDEX IF NOT EXISTS {partition}_key
+        ON {partition} ({", ".join(UNIQUE_KEYS[table])}){where}
+    """)
+    cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {partition}_id_key ON {partition} (id)")
+
+
+def move_from_default(cursor, table, name, start, end):
+    """Move the rows of start..end out of the default partition into the table name, which
+    is not attached yet. Postgres refuses to attach a range the default partition has rows
+    for, which happens once maintenance falls more than PARTITION_PREMAKE periods behind."""
+    column = PARTITION_COLUMNS[table]
+    cursor.execute(f"""
+        WITH moved AS (
+            DELETE FROM {table}_default WHERE {column} >= %s AND {column} < %s
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """, (start, end))
+    return cursor.rowcount
+
+
+def create_partition(cursor, table, start, granularity, predicate=None):
+    """Create the partition for the period starting at start, if it does not exist yet.
+    Rows of that period already in the default partition are moved into it."""
+    name = partition_name(table, start, granularity)
+    end = next_period(start, granularity)
+    cursor.execute("SELECT to_regclass(%s)", (name,))
+    if cursor.fetchone()[0] is None:
+        cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        moved = move_from_default(cursor, table, name, start, end)
+        cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (start, end))
+        if moved:
+            print(f"Moved {moved} rows of {name} out of {table}_default")
+    ensure_unique_index(cursor, table, name, predicate)
+    return name
+
+
+def create_partitions(cursor, table, start, end, granularity, predicate=None):
+    """Partitions for every period from the one holding start through the one holding end"""
+    period = period_start(start, granularity)
+    created = []
+    while period <= end:
+        created.append(create_partition(cursor, table, period, granularity, predicate))
+        period = next_period(period, granularity)
+    return created
+
+
+def ensure_range(conn, start, end):
+    """Make sure every converted table has partitions covering start..end, e.g. before
+    writing backdated rows; rows outside all partitions would land in the default one"""
+    with conn:
+        with conn.cursor() as cursor:
+            for table, (_, granularity, predicate) in registered(cursor).items():
+                create_partitions(cursor, table, start, end, granularity, predicate)
+
+
+def convert(conn, table, granularity=PARTITION_GRANULARITY, now=None):
+    """Rewrite table as a range-partitioned table in one transaction; a no-op once converted.
+
+    Existing rows are copied into one partition per period, non-unique indexes are
+    recreated on the partitioned table, and the per-snapshot unique index becomes one
+    per partition with the same predicate.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}")
+    column = PARTITION_COLUMNS[table]
+    now = now or datetime.now()
+    with conn:
+        with conn.cursor() as cursor:
+            if table in registered(cursor):
+                return False
+            cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+
+            cursor.execute("""
+                SELECT pg_get_expr(i.indpred, i.indrelid)
+                FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = %s
+            """, (LEGACY_UNIQUE_INDEXES[table],))
+            row = cursor.fetchone()
+            predicate = row[0] if row else None
+            cursor.execute("""
+                SELECT indexdef FROM pg_indexes
+                WHERE schemaname = current_schema() AND tablename = %s AND indexdef NOT LIKE 'CREATE UNIQUE %%'
+            """, (table,))
+            index_definitions = [indexdef for indexdef, in cursor.fetchall()]
+            cursor.execute("""
+                SELECT column_name, pg_get_serial_sequence(%s, column_name)
+                FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = %s
+            """, (table, table))
+            sequences = [(name, sequence) for name, sequence in cursor.fetchall() if sequence]
+            cursor.execute(f"SELECT MIN({column}), MAX({column}) FROM {table}")
+            oldest, newest = cursor.fetchone()
+
+            # Keep serial sequences alive when the old table is dropped
+            for _, sequence in sequences:
+                cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+            cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+            cursor.execute(f"""
+                CREATE TABLE {table} (LIKE {table}_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+                PARTITION BY RANGE ({column})
+            """)
+            cursor.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+            ensure_unique_index(cursor, table, f"{table}_default", predicate)
+            create_partitions(cursor, table, min(oldest or now, now), max(newest or now, now) + premake_span(granularity),
+                              granularity, predicate)
+
+            cursor.execute(f"INSERT INTO {table} SELECT * FROM {table}_legacy")
+            copied = cursor.rowcount
+            cursor.execute(f"DROP TABLE {table}_legacy")
+            for name, sequence in sequences:
+                cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.{name}")
+            for indexdef in index_definitions:
+                cursor.execute(indexdef)
+            cursor.execute("""
+                INSERT INTO partitioned_tables (table_name, partition_column, granularity, unique_predicate)
+                VALUES (%s, %s, %s, %s)
+            """, (table, column, granularity, predicate))
+            cursor.execute(f"ANALYZE {table}")
+    print(f"Converted {table} to {granularity} partitions on {column}, {copied} rows copied")
+    return True
+
+
+def premake_span(granularity):
+    return timedelta(days=PARTITION_PREMAKE * (31 if granularity == "month" else 1))
+
+
+def retention_cutoff(cursor, table, column, older_than_days, now):
+    """Partitions ending before this may be archived. For game_stats the cutoff never
+    passes the current snapshot's rows, so a stalled ingest cannot archive live data."""
+    cutoff = now - timedelta(days=older_than_days)
+    if column == "timestamp":
+        cursor.execute("""
+            SELECT s.rows_from FROM ingest_snapshots s
+            JOIN current_snapshot c ON c.snapshot_id = s.snapshot_id
+        """)
+        row = cursor.fetchone()
+        if row and row[0]:
+            cutoff = min(cutoff, row[0])
+    return cutoff
+
+
+def maintain(conn, older_than_days=PARTITION_RETENTION_DAYS, now=None):
+    """Create upcoming partitions of every converted table and apply the retention policy.
+
+    Each table is maintained in its own transactions, so a failure is reported and only
+    holds back that table; the next run retries it.
+    """
+    now = now or datetime.now()
+    with conn:
+        with conn.cursor() as cursor:
+            tables = registered(cursor)
+    for table, (_, granularity, predicate) in tables.items():
+        try:
+            with conn:
+                with conn.cursor() as cursor:
+                    create_partitions(cursor, table, now, now + premake_span(granularity), granularity, predicate)
+                    # Partitions made before the id indexes existed get them here
+                    for name in [f"{table}_default"] + [name for name, _, _ in list_partitions(cursor, table)]:
+                        ensure_unique_index(cursor, table, name, predicate)
+        except psycopg2.Error as e:
+            print(f"Could not create partitions of {table}: {e}")
+    if not older_than_days:
+        return []
+
+    archived = []
+    for table, (column, _, _) in tables.items():
+        try:
+            with conn:
+                with conn.cursor() as cursor:
+                    cutoff = retention_cutoff(cursor, table, column, older_than_days, now)
+                    expired = [(name, start, end) for name, start, end in list_partitions(cursor, table) if end <= cutoff]
+            for name, start, end in expired:
+                archived.append(archive_partition(conn, table, name, start, end))
+        except ImportError as e:
+            print(f"Skipping partition retention: {e}")
+            return archived
+        except psycopg2.Error as e:
+            conn.rollback()
+            print(f"Could not archive partitions of {table}: {e}")
+    return archived
+
+
+# Postgres type (information_schema data_type) -> pyarrow type name; anything else is stored as text
+ARROW_TYPES = {
+    "smallint": "int16",
+    "integer": "int32",
+    "bigint": "int64",
+    "real": "float32",
+    "double precision": "float64",
+    "numeric": "float64",
+    "boolean": "bool_",
+    "text": "string",
+    "character varying": "string",
+    "timestamp without time zone": "timestamp",
+    "date": "date32",
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("archiving partitions needs pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+def arrow_schema(cursor, table):
+    pa = _pyarrow()
+    cursor.execute("""
+        SELECT column_name, data_type, udt_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+        ORDER BY ordinal_position
+    """, (table,))
+    fields = []
+    for name, data_type, udt_name in cursor.fetchall():
+        if data_type == "ARRAY" and udt_name == "_text":
+            arrow_type = pa.list_(pa.string())
+        elif ARROW_TYPES.get(data_type) == "timestamp":
+            arrow_type = pa.timestamp("us")
+        else:
+            arrow_type = getattr(pa, ARROW_TYPES.get(data_type, "string"))()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def archive_path(table, name, directory=PARTITION_ARCHIVE_DIR):
+    return os.path.join(directory, table, f"{name}.parquet")
+
+
+def archive_partition(conn, table, name, start, end, directory=PARTITION_ARCHIVE_DIR):
+    """Write a partition to Parquet, then detach and drop it; the file is complete before
+    anything is removed from the database"""
+    pa = _pyarrow()
+    path = archive_path(table, name, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+
+    with conn.cursor() as cursor:
+        schema = arrow_schema(cursor, table)
+    conn.commit()
+    rows = 0
+    # A named cursor streams the partition from the server instead of loading it at once
+    with conn.cursor(name=f"archive_{name}") as cursor:
+        cursor.execute(f"SELECT {', '.join(schema.names)} FROM {name}")
+        with pa.parquet.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+            while True:
+                batch = cursor.fetchmany(ARCHIVE_BATCH_SIZE)
+                if not batch:
+                    break
+                columns = list(zip(*batch))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(_arrow_values(values, field.type), type=field.type) for values, field in zip(columns, schema)],
+                    schema=schema,
+                ))
+                rows += len(batch)
+    conn.commit()
+    os.replace(tmp_path, path)
+
+    with conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            cursor.execute(f"DROP TABLE {name}")
+            cursor.execute("""
+                INSERT INTO archived_partitions (partition_name, table_name, range_start, range_end, row_count, path)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (partition_name) DO UPDATE
+                SET range_start = EXCLUDED.range_start, range_end = EXCLUDED.range_end,
+                    row_count = EXCLUDED.row_count, path = EXCLUDED.path, archived_at = NOW()
+            """, (name, table, start, end, rows, path))
+    print(f"Archived {name}: {rows} rows to {path}")
+    return name, rows, path
+
+
+def _arrow_values(values, arrow_type):
+    if str(arrow_type) == "string":
+        return [None if value is None else str(value) for value in values]
+    if str(arrow_type) in ("double", "float"):
+        return [None if value is None else float(value) for value in values]
+    return values
+
+
+def parse_archive_name(path):
+    """(table, partition name, period start, granularity) from an archive file name"""
+    match = ARCHIVE_NAME_PATTERN.match(os.path.basename(path))
+    if not match or match.group("table") not in PARTITION_COLUMNS:
+        raise ValueError(f"{path} is not a partition archive (<table>_p<YYYYMMDD|YYYYMM>.parquet)")
+    start_text = match.group("start")
+    granularity = "month" if len(start_text) == 6 else "day"
+    start = datetime.strptime(start_text, "%Y%m" if granularity == "month" else "%Y%m%d")
+    return match.group("table"), os.path.basename(path)[:-len(".parquet")], start, granularity
+
+
+def read_archive(path, columns=None):
+    """An archived partition as a pyarrow Table, e.g. read_archive(path).to_pylist()"""
+    return _pyarrow().parquet.read_table(path, columns=columns)
+
+
+def attach_archive(conn, path):
+    """Load an archive back into a table and attach it as a partition again"""
+    table, name, start, granularity = parse_archive_name(path)
+    data = read_archive(path)
+    with conn:
+        with conn.cursor() as cursor:
+            predicate = registered(cursor).get(table, (None, None, None))[2]
+            cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+            for batch in data.to_batches(ARCHIVE_BATCH_SIZE):
+                rows = list(zip(*(column.to_pylist() for column in batch.columns)))
+                execute_values(cursor, f"INSERT INTO {name} ({', '.join(data.column_names)}) VALUES %s", rows)
+            # Rows written for the period after it was archived landed in the default partition
+            move_from_default(cursor, table, name, start, next_period(start, granularity))
+            cursor.execute(f"""
+                ALTER TABLE {table} ATTACH PARTITION {name}
+                FOR VALUES FROM (%s) TO (%s)
+            """, (start, next_period(start, granularity)))
+            ensure_unique_index(cursor, table, name, predicate)
+            cursor.execute("DELETE FROM archived_partitions WHERE partition_name = %s", (name,))
+    print(f"Attached {name}: {data.num_rows} rows from {path}")
+    return name, data.num_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert_parser = commands.add_parser("convert", help="Partition the stat tables")
+    convert_parser.add_argument("--granularity", choices=GRANULARITIES, default=PARTITION_GRANULARITY)
+    convert_parser.add_argument("--table", action="append", choices=sorted(PARTITION_COLUMNS),
+                                help="Only this table (default: all)")
+    commands.add_parser("maintain", help="Create upcoming partitions and apply PARTITION_RETENTION_DAYS")
+    commands.add_parser("list", help="Partitions and archives of each converted table")
+    archive_parser = commands.add_parser("archive", help="Archive partitions older than a number of days")
+    archive_parser.add_argument("--older-than-days", type=int, required=True)
+    show_parser = commands.add_parser("show", help="Print rows of an archive")
+    show_parser.add_argument("path")
+    show_parser.add_argument("--limit", type=int, default=20)
+    attach_parser = commands.add_parser("attach", help="Attach an archive as a partition again")
+    attach_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        data = read_archive(args.path)
+        print(f"{data.num_rows} rows, columns: {', '.join(data.column_names)}")
+        for row in data.slice(0, args.limit).to_pylist():
+            print(row)
+        return
+
+    from schema import apply_migrations
+
+    conn = psycopg2.connect(SUPABASE_URL)
+    try:
+        apply_migrations(conn)
+        if args.command == "convert":
+            for table in args.table or PARTITION_COLUMNS:
+                if not convert(conn, table, args.granularity):
+                    print(f"{table} is already partitioned")
+        elif args.command == "maintain":
+            maintain(conn)
+        elif args.command == "archive":
+            maintain(conn, older_than_days=args.older_than_days)
+        elif args.command == "attach":
+            attach_archive(conn, args.path)
+        elif args.command == "list":
+            with conn.cursor() as cursor:
+                for table, (column, granularity, _) in registered(cursor).items():
+                    partitions = list_partitions(cursor, table)
+                    print(f"{table}: {len(partitions)} {granularity} partitions on {column}")
+                    for name, start, end in partitions:
+                        print(f"  {name}  {start:%Y-%m-%d} .. {end:%Y-%m-%d}")
+                cursor.execute("SELECT partition_name, row_count, path FROM archived_partitions ORDER BY partition_name")
+                for name, rows, path in cursor.fetchall():
+                    print(f"  archived {name}: {rows} rows in {path}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+
+BUCKET_SIZES = ("hour", "day")
+
+
+def bucket_start(timestamp, bucket_size):
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if bucket_size == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def game_rollup_rows(game_data):
+    """Aggregate one run's player counts per (bucket_size, bucket_start, name, source).
+
+    ON CONFLICT DO UPDATE may touch each row only once per statement, so duplicates
+    inside the run are merged here first.
+    """
+    buckets = {}
+    for game in game_data:
+        for bucket_size in BUCKET_SIZES:
+            key = (bucket_size, bucket_start(game["timestamp"], bucket_size), game["name"], game["source"])
+            players = game["player_count"]
+            seen_at = datetime.fromisoformat(game["timestamp"]) if isinstance(game["timestamp"], str) else game["timestamp"]
+            row = buckets.get(key)
+            if row is None:
+                buckets[key] = [players, players, players, 1, players, seen_at]
+            else:
+                row[0] = min(row[0], players)
+                row[1] = max(row[1], players)
+                row[2] += players
+                row[3] += 1
+                if seen_at >= row[5]:
+                    row[4], row[5] = players, seen_at
+    return [key + tuple(values) for key, values in buckets.items()]
+
+
+def creator_rollup_rows(creator_data):
+    """First and last subscriber/view readings per creator per bucket for one run"""
+    buckets = {}
+    for creator in creator_data:
+        seen_at = datetime.fromisoformat(creator["timestamp"]) if isinstance(creator["timestamp"], str) else creator["timestamp"]
+        reading = (creator["subscriber_count"], creator["total_views"], creator["video_count"], seen_at)
+        for bucket_size in BUCKET_SIZES:
+            key = (bucket_size, bucket_start(seen_at, bucket_size), creator["platform"], creator["creator_id"])
+            first, last = buckets.get(key, (reading, reading))
+            buckets[key] = (min(first, reading, key=lambda r: r[3]), max(last, reading, key=lambda r: r[3]))
+    return [
+        key + (first[0], first[1], first[3], last[0], last[1], last[2], last[3])
+        for key, (first, last) in buckets.items()
+    ]
+
+
+def update_rollups(cursor, game_data, creator_data):
+    """Fold one ingest run into the hourly and daily rollups; call inside the run's transaction"""
+    execute_values(cursor, """
+        INSERT INTO game_stats_rollup AS r (
+            bucket_size, bucket_start, name, source,
+            min_players, max_players, sum_players, sample_count, last_players, last_at
+        )
+        VALUES %s
+        ON CONFLICT (bucket_size, name, source, bucket_start) DO UPDATE SET
+            min_players = LEAST(r.min_players, EXCLUDED.min_players),
+            max_players = GREATEST(r.max_players, EXCLUDED.max_players),
+            sum_players = r.sum_players + EXCLUDED.sum_players,
+            sample_count = r.sample_count + EXCLUDED.sample_count,
+            last_players = CASE WHEN EXCLUDED.last_at >= r.last_at THEN EXCLUDED.last_players ELSE r.last_players END,
+            last_at = GREATEST(r.last_at, EXCLUDED.last_at)
+        -- A reading no newer than the bucket's last one was counted when it was first written
+        WHERE EXCLUDED.last_at > r.last_at
+    """, game_rollup_rows(game_data))
+    execute_values(cursor, """
+        INSERT INTO creator_stats_rollup AS r (
+            bucket_size, bucket_start, platform, creator_id,
+            first_subscribers, first_views, first_at,
+            last_subscribers, last_views, last_video_count, last_at
+        )
+        VALUES %s
+        ON CONFLICT (bucket_size, platform, creator_id, bucket_start) DO UPDATE SET
+            first_subscribers = CASE WHEN EXCLUDED.first_at < r.first_at THEN EXCLUDED.first_subscribers ELSE r.first_subscribers END,
+            first_views = CASE WHEN EXCLUDED.first_at < r.first_at THEN EXCLUDED.first_views ELSE r.first_views END,
+            first_at = LEAST(r.first_at, EXCLUDED.first_at),
+            last_subscribers = CASE WHEN EXCLUDED.last_at >= r.last_at THEN EXCLUDED.last_subscribers ELSE r.last_subscribers END,
+            last_views = CASE WHEN EXCLUDED.last_at >= r.last_at THEN EXCLUDED.last_views ELSE r.last_views END,
+            last_video_count = CASE WHEN EXCLUDED.last_at >= r.last_at THEN EXCLUDED.last_video_count ELSE r.last_video_count END,
+            last_at = GREATEST(r.last_at, EXCLUDED.last_at)
+    """, creator_rollup_rows(creator_data))
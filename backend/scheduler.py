@@ -0,0 +1,488 @@
+"""Long-running ingest mode: refresh each kind of data on its own schedule.
+
+    python fetch_data.py --daemon
+
+A priority queue holds one refresh job per (kind, game). Each game has a tier, based
+on its rank by current players. How soon a job comes back depends on its kind and the
+game's tier: player counts of the hottest games every few minutes, store details and
+creators of the long tail once a day or less. Each job spends from the budget of the
+upstream API it calls, and jobs an exhausted API cannot afford wait for its next
+window. Every PUBLISH_INTERVAL the current state of all games is published as a normal
+ingest snapshot. A game is only published once each of its detail jobs has succeeded,
+and each reading keeps the time it was fetched, not the publish time. The queue, state
+and budgets are checkpointed to disk, so a restart resumes where it left off.
+"""
+import heapq
+import json
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+import creators
+import fetch_data
+import http_cache
+import metrics
+import youtube
+
+load_dotenv()
+SCHEDULER_CHECKPOINT = os.getenv(
+    "SCHEDULER_CHECKPOINT",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "scheduler_state.json")
+)
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "8"))
+PUBLISH_INTERVAL = float(os.getenv("SCHEDULER_PUBLISH_INTERVAL", "300"))
+CHECKPOINT_INTERVAL = float(os.getenv("SCHEDULER_CHECKPOINT_INTERVAL", "60"))
+RETRY_DELAY = float(os.getenv("SCHEDULER_RETRY_DELAY", "300"))
+CATALOG_INTERVAL = float(os.getenv("SCHEDULER_CATALOG_INTERVAL", "3600"))
+# Partition upkeep runs as its own job, so archiving never delays a publish
+MAINTENANCE_INTERVAL = float(os.getenv("SCHEDULER_MAINTENANCE_INTERVAL", str(6 * 3600)))
+# Steam games ranked by current players: the first HOT_GAMES are hot, the next WARM_GAMES warm
+HOT_GAMES = int(os.getenv("SCHEDULER_HOT_GAMES", "10"))
+WARM_GAMES = int(os.getenv("SCHEDULER_WARM_GAMES", "40"))
+
+CHECKPOINT_VERSION = 2
+
+TIERS = ("hot", "warm", "cold")
+# Seconds between refreshes per job kind and tier
+DEFAULT_INTERVALS = {
+    "player_count": {"hot": 300, "warm": 900, "cold": 3600},
+    "store_details": {"hot": 24 * 3600, "warm": 24 * 3600, "cold": 24 * 3600},
+    "playtime": {"hot": 12 * 3600, "warm": 24 * 3600, "cold": 24 * 3600},
+    "creators": {"hot": 6 * 3600, "warm": 24 * 3600, "cold": 72 * 3600},
+}
+# A job refreshing sooner than the HTTP cache keeps its response would only get the cached
+# copy back, so each kind's interval is at least the TTL of the URL it fetches
+CACHED_URLS = {
+    "store_details": "https://store.steampowered.com/api/appdetails?appids=0",
+    "playtime": "https://steamspy.com/api.php?request=appdetails&appid=0",
+}
+# Jobs that fill a Steam game's row; the game is published once all of them have succeeded
+DETAIL_KINDS = ("player_count", "store_details", "playtime")
+# Jobs due at the same moment run in this order
+KIND_PRIORITY = {"catalog": 0, "player_count": 1, "store_details": 2, "playtime": 3, "creators": 4, "maintenance": 5}
+# (units, period in seconds) each API may spend; YouTube is metered in quota units
+DEFAULT_BUDGETS = {
+    "steam": (100000, 86400),
+    "steam_store": (200, 300),
+    "steamspy": (60, 60),
+    "itch": (60, 3600),
+    "twitch": (800, 60),
+    "youtube": (10000, 86400),
+}
+# Creator lookups for one game: a search.list plus a channels.list, and ~4 Helix calls
+YOUTUBE_CREATORS_COST = youtube.QUOTA_COSTS["search.list"] + youtube.QUOTA_COSTS["channels.list"]
+TWITCH_CREATORS_COST = 4
+
+
+def _intervals_from_env():
+    """Parse SCHEDULER_INTERVALS, e.g. "player_count.hot=120,creators.cold=86400" """
+    intervals = {kind: dict(tiers) for kind, tiers in DEFAULT_INTERVALS.items()}
+    for item in filter(None, os.getenv("SCHEDULER_INTERVALS", "").split(",")):
+        name, _, seconds = item.strip().partition("=")
+        kind, _, tier = name.partition(".")
+        intervals[kind][tier] = float(seconds)
+    for kind, url in CACHED_URLS.items():
+        for tier, seconds in intervals[kind].items():
+            intervals[kind][tier] = max(seconds, http_cache.ttl_for(url))
+    return intervals
+
+
+def _budgets_from_env():
+    """Parse SCHEDULER_BUDGETS, e.g. "youtube=5000:86400,steam_store=100" (units[:period])"""
+    budgets = dict(DEFAULT_BUDGETS)
+    for item in filter(None, os.getenv("SCHEDULER_BUDGETS", "").split(",")):
+        api, _, spec = item.strip().partition("=")
+        units, _, period = spec.partition(":")
+        budgets[api] = (float(units), float(period) if period else budgets.get(api, (0, 3600))[1])
+    return budgets
+
+
+INTERVALS = _intervals_from_env()
+BUDGETS = _budgets_from_env()
+
+
+class Budget:
+    """Fixed-window allowance of units per period for one upstream API"""
+
+    def __init__(self, units, period, window_start=0.0, used=0.0):
+        self.units = units
+        self.period = period
+        self.window_start = window_start
+        self.used = used
+
+    def _roll(self, now):
+        if now >= self.window_start + self.period:
+            self.window_start = now
+            self.used = 0.0
+
+    def can_spend(self, cost, now):
+        self._roll(now)
+        return self.used + cost <= self.units
+
+    def spend(self, cost, now):
+        self._roll(now)
+        self.used += cost
+
+    def resets_at(self):
+        return self.window_start + self.period
+
+
+def job_costs(kind):
+    """[(api, units)] a job of this kind spends"""
+    if kind == "catalog":
+        return [("steamspy", 1), ("itch", 1)]
+    if kind == "maintenance":
+        return []
+    if kind == "player_count":
+        return [("steam", 1)]
+    if kind == "store_details":
+        return [("steam_store", 1)]
+    if kind == "playtime":
+        return [("steamspy", 1)]
+    costs = []
+    if youtube.YOUTUBE_API_KEY:
+        costs.append(("youtube", YOUTUBE_CREATORS_COST))
+    if fetch_data.TWITCH_CLIENT_ID and fetch_data.TWITCH_CLIENT_SECRET:
+        costs.append(("twitch", TWITCH_CREATORS_COST))
+    return costs
+
+
+def job_key(kind, game_id=None):
+    return kind if game_id is None else f"{kind}:{game_id}"
+
+
+def parse_key(key):
+    kind, _, game_id = key.partition(":")
+    return kind, game_id or None
+
+
+def default_game(game_id, name):
+    """State of a Steam game before any of its detail jobs have run. fetched_at and
+    failed_at map each detail kind to the time its job last succeeded or failed."""
+    return {
+        "game_id": game_id,
+        "name": name,
+        "source": "Steam",
+        "player_count": 0,
+        "price": "N/A",
+        "price_cents": None,
+        "currency": None,
+        "avg_playtime": 0.0,
+        "genres": "N/A",
+        "fetched_at": {},
+        "failed_at": {},
+    }
+
+
+def is_filled(game):
+    """Whether every detail of the game has been fetched at least once; itch.io games
+    arrive complete with the catalog"""
+    return all(kind in game["fetched_at"] for kind in DETAIL_KINDS) if game["source"] == "Steam" else True
+
+
+class Scheduler:
+    """Refresh queue plus the last known state of every tracked game and its creators"""
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.due = dict(state.get("due", {}))
+        self.games = dict(state.get("games", {}))
+        self.creators = dict(state.get("creators", {}))
+        self.budgets = {
+            api: Budget(units, period, *state.get("budgets", {}).get(api, (0.0, 0.0)))
+            for api, (units, period) in BUDGETS.items()
+        }
+        self.last_publish = state.get("last_publish", 0.0)
+        self.dirty = bool(state.get("dirty", False))
+        self._heap = []
+        self._seq = 0
+        self._tiers = {}
+        self._rank_tiers()
+        for key, due in self.due.items():
+            self._push(key, due)
+        if "catalog" not in self.due:
+            self.schedule("catalog", time.time())
+        if "maintenance" not in self.due:
+            self.schedule("maintenance", time.time())
+
+    @classmethod
+    def load(cls, path=SCHEDULER_CHECKPOINT):
+        try:
+            with open(path) as f:
+                state = json.load(f)
+            if state.get("version") != CHECKPOINT_VERSION:
+                # Older checkpoints hold placeholder games without fetch times; keep only the spend
+                print(f"Checkpoint {path} is from an older version; refetching everything")
+                return cls({"budgets": state.get("budgets", {})})
+            print(f"Resuming from checkpoint {path}: {len(state.get('due', {}))} jobs, "
+                  f"{len(state.get('games', {}))} games")
+            return cls(state)
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable checkpoint {path}: {e}")
+            return cls()
+
+    def checkpoint(self, path=SCHEDULER_CHECKPOINT):
+        """Write the state atomically, so a crash mid-write leaves the previous checkpoint intact"""
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "saved_at": time.time(),
+            "due": self.due,
+            "games": self.games,
+            "creators": self.creators,
+            "budgets": {api: (budget.window_start, budget.used) for api, budget in self.budgets.items()},
+            "last_publish": self.last_publish,
+            "dirty": self.dirty,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def tier(self, game_id):
+        return self._tiers.get(game_id, "cold")
+
+    def _rank_tiers(self):
+        ranked = sorted((game for game in self.games.values() if game["source"] == "Steam"),
+                        key=lambda game: game["player_count"], reverse=True)
+        self._tiers = {}
+        for rank, game in enumerate(ranked):
+            self._tiers[game["game_id"]] = "hot" if rank < HOT_GAMES else "warm" if rank < HOT_GAMES + WARM_GAMES else "cold"
+
+    def _push(self, key, due):
+        kind, game_id = parse_key(key)
+        tier_priority = TIERS.index(self.tier(game_id)) if game_id else 0
+        self._seq += 1
+        heapq.heappush(self._heap, (due, tier_priority, KIND_PRIORITY[kind], self._seq, key))
+
+    def schedule(self, key, due):
+        self.due[key] = due
+        self._push(key, due)
+
+    def seconds_until_next(self, now):
+        while self._heap and self.due.get(self._heap[0][4]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return max(0.0, self._heap[0][0] - now) if self._heap else CATALOG_INTERVAL
+
+    def take_due(self, now, limit):
+        """Pop up to limit due jobs the API budgets can pay for; the rest wait for their budget window"""
+        taken = []
+        deferred = []
+        while self._heap and len(taken) < limit and self._heap[0][0] <= now:
+            due, _, _, _, key = heapq.heappop(self._heap)
+            if self.due.get(key) != due:
+                continue  # superseded by a later schedule() or dropped from the catalog
+            costs = job_costs(parse_key(key)[0])
+            short = [api for api, cost in costs if not self.budgets[api].can_spend(cost, now)]
+            if short:
+                metrics.SCHEDULER_DEFERRALS.inc(api=short[0])
+                deferred.append((key, max(self.budgets[api].resets_at() for api in short)))
+                continue
+            for api, cost in costs:
+                self.budgets[api].spend(cost, now)
+            del self.due[key]
+            taken.append(key)
+        for key, due in deferred:
+            self.schedule(key, due)
+        return taken
+
+    def complete(self, key, ok, result, now):
+        kind, game_id = parse_key(key)
+        metrics.SCHEDULER_JOBS.inc(kind=kind, outcome="ok" if ok else "error")
+        if kind == "catalog":
+            if ok:
+                self._apply_catalog(result, now)
+            self.schedule(key, now + (CATALOG_INTERVAL if ok else RETRY_DELAY))
+            return
+        if kind == "maintenance":
+            self.schedule(key, now + (MAINTENANCE_INTERVAL if ok else RETRY_DELAY))
+            return
+        if game_id not in self.games:
+            return  # dropped from the catalog while the job was running
+        game = self.games[game_id]
+        if ok:
+            if kind == "player_count":
+                game["player_count"] = result
+                self._rank_tiers()
+            elif kind == "store_details":
+                game["price"], game["price_cents"], game["currency"], game["genres"] = result
+            elif kind == "playtime":
+                game["avg_playtime"] = result
+            elif kind == "creators":
+                rows, incomplete = result
+                # A platform cut off by a failure or the YouTube quota keeps its previous rows
+                kept = [row for row in self.creators.get(game["name"], []) if row["platform"] in incomplete]
+                self.creators[game["name"]] = rows + kept
+            if kind in DETAIL_KINDS:
+                game["fetched_at"][kind] = datetime.fromtimestamp(now).isoformat()
+                game["failed_at"].pop(kind, None)
+            self.dirty = True
+        elif kind in DETAIL_KINDS:
+            game["failed_at"][kind] = now
+        interval = INTERVALS[kind][self.tier(game_id)]
+        self.schedule(key, now + (interval if ok else min(interval, RETRY_DELAY)))
+
+    def _apply_catalog(self, result, now):
+        steam_apps, itch_games = result
+        tracked = {str(appid): data.get("name", "Unknown") for appid, data in steam_apps.items()}
+        for game_id in list(self.games):
+            if self.games[game_id]["source"] == "Steam" and game_id not in tracked:
+                self._drop(game_id)
+        for game_id, name in tracked.items():
+            if game_id not in self.games:
+                self.games[game_id] = default_game(game_id, name)
+                # New games get every detail right away; the tiers settle once player counts are in
+                for kind in INTERVALS:
+                    self.schedule(job_key(kind, game_id), now)
+        if itch_games:
+            listed = {game["game_id"]: game for game in itch_games}
+            for game_id in list(self.games):
+                if self.games[game_id]["source"] == "itch.io" and game_id not in listed:
+                    self._drop(game_id)
+            for game_id, game in listed.items():
+                if game_id not in self.games:
+                    self.schedule(job_key("creators", game_id), now)
+                current = self.games.get(game_id)
+                # An unchanged listing keeps its first timestamp, so it is not a new reading
+                if current is None or dict(current, timestamp=game["timestamp"]) != game:
+                    self.games[game_id] = game
+                    self.dirty = True
+
+    def _drop(self, game_id):
+        game = self.games.pop(game_id)
+        self.creators.pop(game["name"], None)
+        for kind in INTERVALS:
+            self.due.pop(job_key(kind, game_id), None)
+
+    def ready(self):
+        """Whether a publish would be complete: no detail job of any game is still waiting for
+        its first run, and at least one game is filled. Games whose first fetch failed are
+        left out of the snapshot rather than holding it back."""
+        if not any(is_filled(game) for game in self.games.values()):
+            return False
+        return all(kind in game["fetched_at"] or kind in game["failed_at"]
+                   for game in self.games.values() if game["source"] == "Steam" for kind in DETAIL_KINDS)
+
+    def snapshot_rows(self):
+        """game_data and creator_data for a snapshot of the filled games.
+
+        Rows carry the time each reading was fetched, so a player count that has not been
+        refreshed since the last publish keeps its timestamp and the rollups do not count
+        it twice. Price rows use the store details' fetch time.
+        """
+        game_data = []
+        names = set()
+        for game in self.games.values():
+            if not is_filled(game):
+                continue
+            row = {key: value for key, value in game.items() if key not in ("fetched_at", "failed_at")}
+            if game["source"] == "Steam":
+                row["timestamp"] = game["fetched_at"]["player_count"]
+                row["price_timestamp"] = game["fetched_at"]["store_details"]
+            game_data.append(row)
+            names.add(game["name"])
+        creator_data = [creator for name, rows in self.creators.items() if name in names for creator in rows]
+        return game_data, creator_data
+
+
+def fetch_creators(game_name):
+    """Creator rows for one game from every configured platform and the platforms whose
+    discovery was incomplete; profiles come from the shared creator cache when another
+    game's job fetched them recently"""
+    creator_data, stats = creators.discover([game_name])
+    return creator_data, stats["incomplete"]
+
+
+def run_job(scheduler, key):
+    """Fetch one job's data; returns (ok, result) and never raises for upstream failures"""
+    kind, game_id = parse_key(key)
+    try:
+        if kind == "catalog":
+            return True, (fetch_data.fetch_steam_top_apps(), fetch_data.fetch_itch_games())
+        if kind == "maintenance":
+            return True, fetch_data.maintain_partitions()
+        game = scheduler.games.get(game_id)
+        if game is None:
+            return False, None
+        if kind == "player_count":
+            return True, fetch_data.fetch_steam_player_count(game_id)
+        if kind == "store_details":
+            return True, fetch_data.fetch_steam_store_details(game_id)
+        if kind == "playtime":
+            return True, fetch_data.fetch_steamspy_playtime(game_id)
+        return True, fetch_creators(game["name"])
+    except Exception as e:
+        # requests and the Google API client raise their own error types; one bad job
+        # must not take the daemon down
+        print(f"Job {key} failed: {e}")
+        return False, None
+
+
+def publish(scheduler):
+    game_data, creator_data = scheduler.snapshot_rows()
+    snapshot_id = fetch_data.start_snapshot()
+    if snapshot_id is None:
+        return False
+    if not fetch_data.write_and_publish(snapshot_id, game_data, creator_data):
+        return False
+    fetch_data.export_ingest_metrics()
+    return True
+
+
+def run(checkpoint_path=SCHEDULER_CHECKPOINT):
+    scheduler = Scheduler.load(checkpoint_path)
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        print("Stopping after the jobs in flight")
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    last_checkpoint = time.time()
+    # Maintenance runs on its own thread, so a slow archive never holds up a batch,
+    # publish or checkpoint; it is collected whenever it has finished
+    maintenance = None
+    with ThreadPoolExecutor(max_workers=SCHEDULER_WORKERS) as executor, \
+            ThreadPoolExecutor(max_workers=1) as maintenance_executor:
+        while not stopping.is_set():
+            if maintenance is not None and maintenance.done():
+                scheduler.complete("maintenance", *maintenance.result(), time.time())
+                maintenance = None
+            now = time.time()
+            batch = scheduler.take_due(now, SCHEDULER_WORKERS * 4)
+            if "maintenance" in batch:
+                batch.remove("maintenance")
+                maintenance = maintenance_executor.submit(run_job, scheduler, "maintenance")
+            if batch:
+                results = list(executor.map(lambda key: run_job(scheduler, key), batch))
+                finished = time.time()
+                for key, (ok, result) in zip(batch, results):
+                    scheduler.complete(key, ok, result, finished)
+                print(f"Ran {len(batch)} jobs, {sum(ok for ok, _ in results)} ok; "
+                      f"next job in {scheduler.seconds_until_next(finished):.0f}s")
+            else:
+                stopping.wait(min(scheduler.seconds_until_next(now), CHECKPOINT_INTERVAL))
+
+            now = time.time()
+            if scheduler.dirty and scheduler.ready() and now - scheduler.last_publish >= PUBLISH_INTERVAL:
+                if publish(scheduler):
+                    scheduler.dirty = False
+                scheduler.last_publish = now
+            if now - last_checkpoint >= CHECKPOINT_INTERVAL:
+                scheduler.checkpoint(checkpoint_path)
+                last_checkpoint = now
+    if maintenance is not None:
+        scheduler.complete("maintenance", *maintenance.result(), time.time())
+    scheduler.checkpoint(checkpoint_path)
+    print(f"Checkpoint saved to {checkpoint_path}")
+
+
+if __name__ == "__main__":
+    run()
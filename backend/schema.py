@@ -0,0 +1,378 @@
+import os
+
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+
+# Ordered list of (name, sql). Applied migrations are recorded in schema_migrations,
+# so each one runs exactly once per database. Never edit an entry after it has shipped;
+# append a new one instead.
+MIGRATIONS = [
+    ("001_snapshots", """
+        CREATE TABLE IF NOT EXISTS ingest_snapshots (
+            snapshot_id BIGSERIAL PRIMARY KEY,
+            started_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            finished_at TIMESTAMP,
+            status TEXT NOT NULL DEFAULT 'running',
+            game_count INTEGER,
+            creator_count INTEGER
+        );
+
+        CREATE TABLE IF NOT EXISTS current_snapshot (
+            singleton BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (singleton),
+            snapshot_id BIGINT NOT NULL REFERENCES ingest_snapshots (snapshot_id),
+            published_at TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+
+        ALTER TABLE game_stats ADD COLUMN IF NOT EXISTS snapshot_id BIGINT;
+        ALTER TABLE creator_stats ADD COLUMN IF NOT EXISTS snapshot_id BIGINT;
+        ALTER TABLE price_history ADD COLUMN IF NOT EXISTS snapshot_id BIGINT;
+
+        -- Backfill: every day of existing history becomes one published snapshot
+        INSERT INTO ingest_snapshots (started_at, finished_at, status)
+        SELECT MIN(ts), MAX(ts), 'published'
+        FROM (
+            SELECT timestamp AS ts FROM game_stats
+            UNION ALL
+            SELECT timestamp AS ts FROM creator_stats
+        ) history
+        GROUP BY DATE(ts)
+        ORDER BY DATE(ts);
+
+        UPDATE game_stats g SET snapshot_id = s.snapshot_id
+        FROM ingest_snapshots s
+        WHERE g.snapshot_id IS NULL AND DATE(g.timestamp) = DATE(s.started_at);
+
+        UPDATE creator_stats c SET snapshot_id = s.snapshot_id
+        FROM ingest_snapshots s
+        WHERE c.snapshot_id IS NULL AND DATE(c.timestamp) = DATE(s.started_at);
+
+        UPDATE price_history p SET snapshot_id = s.snapshot_id
+        FROM ingest_snapshots s
+        WHERE p.snapshot_id IS NULL AND DATE(p.timestamp) = DATE(s.started_at);
+
+        INSERT INTO current_snapshot (snapshot_id)
+        SELECT MAX(snapshot_id) FROM ingest_snapshots HAVING MAX(snapshot_id) IS NOT NULL
+        ON CONFLICT (singleton) DO NOTHING;
+
+        CREATE INDEX IF NOT EXISTS game_stats_snapshot_players_idx
+            ON game_stats (snapshot_id, player_count DESC, name);
+        CREATE INDEX IF NOT EXISTS creator_stats_snapshot_idx
+            ON creator_stats (snapshot_id);
+        CREATE INDEX IF NOT EXISTS price_history_snapshot_idx
+            ON price_history (snapshot_id);
+    """),
+    ("002_snapshot_unique_keys", """
+        -- One row per game / creator per snapshot, so bulk inserts can use ON CONFLICT.
+        -- Backfilled days may hold several historical runs, so only snapshots created
+        -- after this migration are constrained.
+        DO $$
+        DECLARE
+            last_backfilled BIGINT;
+        BEGIN
+            SELECT COALESCE(MAX(snapshot_id), 0) INTO last_backfilled FROM ingest_snapshots;
+            EXECUTE format(
+                'CREATE UNIQUE INDEX IF NOT EXISTS game_stats_snapshot_game_key '
+                'ON game_stats (snapshot_id, source, name) WHERE snapshot_id > %s',
+                last_backfilled);
+            EXECUTE format(
+                'CREATE UNIQUE INDEX IF NOT EXISTS price_history_snapshot_game_key '
+                'ON price_history (snapshot_id, game_id) WHERE snapshot_id > %s',
+                last_backfilled);
+            EXECUTE format(
+                'CREATE UNIQUE INDEX IF NOT EXISTS creator_stats_snapshot_creator_key '
+                'ON creator_stats (snapshot_id, platform, creator_id, game_name) WHERE snapshot_id > %s',
+                last_backfilled);
+        END $$;
+    """),
+    ("003_genre_index", """
+        ALTER TABLE game_stats ADD COLUMN IF NOT EXISTS genre_list TEXT[];
+
+        -- Split like storage.split_genres: on commas, trimmed, without empty entries
+        UPDATE game_stats
+        SET genre_list = CASE
+            WHEN genres IS NULL OR genres IN ('', 'N/A') THEN '{}'::TEXT[]
+            ELSE ARRAY(SELECT genre FROM UNNEST(REGEXP_SPLIT_TO_ARRAY(BTRIM(genres), '\\s*,\\s*')) AS genre WHERE genre <> '')
+        END
+        WHERE genre_list IS NULL;
+
+        CREATE INDEX IF NOT EXISTS game_stats_genre_list_idx
+            ON game_stats USING GIN (genre_list);
+
+        -- Per-snapshot genre totals, written at ingest so /top-genres is a primary key range read
+        CREATE TABLE IF NOT EXISTS genre_stats (
+            snapshot_id BIGINT NOT NULL,
+            genre TEXT NOT NULL,
+            total_players BIGINT NOT NULL,
+            game_count INTEGER NOT NULL,
+            PRIMARY KEY (snapshot_id, genre)
+        );
+
+        -- A genre listed twice for one game counts once, as in storage.genre_totals
+        INSERT INTO genre_stats (snapshot_id, genre, total_players, game_count)
+        SELECT snapshot_id, genre, SUM(player_count), COUNT(*)
+        FROM game_stats, LATERAL (SELECT DISTINCT UNNEST(genre_list)) AS game_genres (genre)
+        WHERE snapshot_id IS NOT NULL
+        GROUP BY snapshot_id, genre
+        ON CONFLICT (snapshot_id, genre) DO NOTHING;
+
+        CREATE INDEX IF NOT EXISTS genre_stats_snapshot_players_idx
+            ON genre_stats (snapshot_id, total_players DESC);
+    """),
+    ("004_numeric_prices", """
+        ALTER TABLE game_stats ADD COLUMN IF NOT EXISTS price_cents INTEGER;
+        ALTER TABLE game_stats ADD COLUMN IF NOT EXISTS currency TEXT;
+        ALTER TABLE price_history ADD COLUMN IF NOT EXISTS price_cents INTEGER;
+        ALTER TABLE price_history ADD COLUMN IF NOT EXISTS currency TEXT;
+
+        -- clean_price only ever produced 'Free', '$<amount>' or 'N/A'; 'N/A' stays NULL
+        UPDATE game_stats SET
+            price_cents = CASE
+                WHEN price = 'Free' THEN 0
+                ELSE ROUND(CAST(SUBSTRING(price FROM 2) AS NUMERIC) * 100)
+            END,
+            currency = CASE WHEN price = 'Free' THEN NULL ELSE 'USD' END
+        WHERE price_cents IS NULL
+        AND (price = 'Free' OR price ~ '^\\$(\\d+\\.?\\d{0,2}|\\.\\d{1,2})$');
+
+        UPDATE price_history SET
+            price_cents = CASE
+                WHEN price = 'Free' THEN 0
+                ELSE ROUND(CAST(SUBSTRING(price FROM 2) AS NUMERIC) * 100)
+            END,
+            currency = CASE WHEN price = 'Free' THEN NULL ELSE 'USD' END
+        WHERE price_cents IS NULL
+        AND (price = 'Free' OR price ~ '^\\$(\\d+\\.?\\d{0,2}|\\.\\d{1,2})$');
+
+        CREATE INDEX IF NOT EXISTS game_stats_snapshot_price_idx
+            ON game_stats (snapshot_id, price_cents);
+        CREATE INDEX IF NOT EXISTS price_history_game_price_idx
+            ON price_history (game_id, timestamp, price_cents);
+    """),
+    ("005_rollups", """
+        CREATE TABLE IF NOT EXISTS game_stats_rollup (
+            bucket_size TEXT NOT NULL,
+            bucket_start TIMESTAMP NOT NULL,
+            name TEXT NOT NULL,
+            source TEXT NOT NULL,
+            min_players INTEGER NOT NULL,
+            max_players INTEGER NOT NULL,
+            sum_players BIGINT NOT NULL,
+            sample_count INTEGER NOT NULL,
+            last_players INTEGER NOT NULL,
+            last_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (bucket_size, name, source, bucket_start)
+        );
+
+        CREATE TABLE IF NOT EXISTS creator_stats_rollup (
+            bucket_size TEXT NOT NULL,
+            bucket_start TIMESTAMP NOT NULL,
+            platform TEXT NOT NULL,
+            creator_id TEXT NOT NULL,
+            first_subscribers BIGINT NOT NULL,
+            first_views BIGINT NOT NULL,
+            first_at TIMESTAMP NOT NULL,
+            last_subscribers BIGINT NOT NULL,
+            last_views BIGINT NOT NULL,
+            last_video_count INTEGER NOT NULL,
+            last_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (bucket_size, platform, creator_id, bucket_start)
+        );
+
+        INSERT INTO game_stats_rollup
+        SELECT bucket_size, DATE_TRUNC(bucket_size, timestamp), name, source,
+            MIN(player_count), MAX(player_count), SUM(player_count), COUNT(*),
+            (ARRAY_AGG(player_count ORDER BY timestamp DESC))[1], MAX(timestamp)
+        FROM game_stats, (VALUES ('hour'), ('day')) AS sizes (bucket_size)
+        WHERE player_count IS NOT NULL AND source IS NOT NULL
+        GROUP BY bucket_size, DATE_TRUNC(bucket_size, timestamp), name, source
+        ON CONFLICT DO NOTHING;
+
+        INSERT INTO creator_stats_rollup
+        SELECT bucket_size, DATE_TRUNC(bucket_size, timestamp), platform, creator_id,
+            (ARRAY_AGG(subscriber_count ORDER BY timestamp ASC))[1],
+            (ARRAY_AGG(total_views ORDER BY timestamp ASC))[1],
+            MIN(timestamp),
+            (ARRAY_AGG(subscriber_count ORDER BY timestamp DESC))[1],
+            (ARRAY_AGG(total_views ORDER BY timestamp DESC))[1],
+            (ARRAY_AGG(video_count ORDER BY timestamp DESC))[1],
+            MAX(timestamp)
+        FROM creator_stats, (VALUES ('hour'), ('day')) AS sizes (bucket_size)
+        GROUP BY bucket_size, DATE_TRUNC(bucket_size, timestamp), platform, creator_id
+        ON CONFLICT DO NOTHING;
+    """),
+    ("006_keyset_indexes", """
+        -- Match the ORDER BY of each paginated listing so every page is an index range scan
+        CREATE INDEX IF NOT EXISTS game_stats_snapshot_trending_idx
+            ON game_stats (snapshot_id, player_count DESC, name, source);
+        DROP INDEX IF EXISTS game_stats_snapshot_players_idx;
+
+        CREATE INDEX IF NOT EXISTS creator_stats_snapshot_views_idx
+            ON creator_stats (snapshot_id, total_views DESC, name, platform, creator_id, game_name);
+        CREATE INDEX IF NOT EXISTS creator_stats_snapshot_subscribers_idx
+            ON creator_stats (snapshot_id, subscriber_count DESC, name, platform, creator_id, game_name);
+        CREATE INDEX IF NOT EXISTS creator_stats_snapshot_engagement_idx
+            ON creator_stats (
+                snapshot_id,
+                (CASE WHEN video_count > 0 THEN total_views::FLOAT / video_count ELSE 0 END) DESC,
+                name, platform, creator_id, game_name
+            );
+    """),
+    ("007_change_only_history", """
+        -- price_history and creator_stats now store change events. A row is valid from the
+        -- snapshot (and timestamp) that wrote it until valid_to_snapshot / valid_to, and a
+        -- NULL valid_to_snapshot marks the current row for its key.
+        ALTER TABLE price_history ADD COLUMN IF NOT EXISTS valid_to TIMESTAMP;
+        ALTER TABLE price_history ADD COLUMN IF NOT EXISTS valid_to_snapshot BIGINT;
+        ALTER TABLE creator_stats ADD COLUMN IF NOT EXISTS valid_to TIMESTAMP;
+        ALTER TABLE creator_stats ADD COLUMN IF NOT EXISTS valid_to_snapshot BIGINT;
+
+        -- Until now every snapshot held a full copy, so each older row was valid until the
+        -- next snapshot; only rows of the published snapshot stay current
+        CREATE TEMPORARY TABLE next_snapshots ON COMMIT DROP AS
+        SELECT snapshot_id,
+            LEAD(snapshot_id) OVER (ORDER BY snapshot_id) AS next_id,
+            LEAD(started_at) OVER (ORDER BY snapshot_id) AS next_started_at
+        FROM ingest_snapshots;
+
+        UPDATE price_history p SET valid_to_snapshot = n.next_id, valid_to = n.next_started_at
+        FROM next_snapshots n
+        WHERE p.snapshot_id = n.snapshot_id AND n.next_id IS NOT NULL
+            AND p.snapshot_id < (SELECT snapshot_id FROM current_snapshot);
+
+        UPDATE creator_stats c SET valid_to_snapshot = n.next_id, valid_to = n.next_started_at
+        FROM next_snapshots n
+        WHERE c.snapshot_id = n.snapshot_id AND n.next_id IS NOT NULL
+            AND c.snapshot_id < (SELECT snapshot_id FROM current_snapshot);
+
+        CREATE INDEX IF NOT EXISTS price_history_current_idx
+            ON price_history (game_id) WHERE valid_to_snapshot IS NULL;
+        CREATE INDEX IF NOT EXISTS creator_stats_current_key_idx
+            ON creator_stats (platform, creator_id, game_name) WHERE valid_to_snapshot IS NULL;
+        CREATE INDEX IF NOT EXISTS creator_stats_valid_to_idx
+            ON creator_stats (valid_to_snapshot) WHERE valid_to_snapshot IS NOT NULL;
+
+        -- Listings read the current rows, not one snapshot's rows
+        DROP INDEX IF EXISTS creator_stats_snapshot_views_idx;
+        DROP INDEX IF EXISTS creator_stats_snapshot_subscribers_idx;
+        DROP INDEX IF EXISTS creator_stats_snapshot_engagement_idx;
+        CREATE INDEX IF NOT EXISTS creator_stats_current_views_idx
+            ON creator_stats (total_views DESC, name, platform, creator_id, game_name)
+            WHERE valid_to_snapshot IS NULL;
+        CREATE INDEX IF NOT EXISTS creator_stats_current_subscribers_idx
+            ON creator_stats (subscriber_count DESC, name, platform, creator_id, game_name)
+            WHERE valid_to_snapshot IS NULL;
+        CREATE INDEX IF NOT EXISTS creator_stats_current_engagement_idx
+            ON creator_stats (
+                (CASE WHEN video_count > 0 THEN total_views::FLOAT / video_count ELSE 0 END) DESC,
+                name, platform, creator_id, game_name
+            )
+            WHERE valid_to_snapshot IS NULL;
+    """),
+    ("008_partitioning", """
+        -- The time range of each snapshot's game_stats rows. Readers add it to their
+        -- snapshot filter so a time-partitioned game_stats only scans those partitions.
+        ALTER TABLE ingest_snapshots ADD COLUMN IF NOT EXISTS rows_from TIMESTAMP;
+        ALTER TABLE ingest_snapshots ADD COLUMN IF NOT EXISTS rows_to TIMESTAMP;
+
+        UPDATE ingest_snapshots s SET rows_from = g.rows_from, rows_to = g.rows_to
+        FROM (
+            SELECT snapshot_id, MIN(timestamp) AS rows_from, MAX(timestamp) AS rows_to
+            FROM game_stats
+            WHERE snapshot_id IS NOT NULL
+            GROUP BY snapshot_id
+        ) g
+        WHERE s.snapshot_id = g.snapshot_id;
+
+        -- Tables converted by partitions.py, and partitions it archived to Parquet
+        CREATE TABLE IF NOT EXISTS partitioned_tables (
+            table_name TEXT PRIMARY KEY,
+            partition_column TEXT NOT NULL,
+            granularity TEXT NOT NULL CHECK (granularity IN ('day', 'month')),
+            unique_predicate TEXT,
+            converted_at TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+
+        CREATE TABLE IF NOT EXISTS archived_partitions (
+            partition_name TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            range_start TIMESTAMP NOT NULL,
+            range_end TIMESTAMP NOT NULL,
+            row_count BIGINT NOT NULL,
+            path TEXT NOT NULL,
+            archived_at TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+    """),
+    ("009_closed_row_indexes", """
+        -- A pinned snapshot's state (valid_at with a snapshot id) is the current rows plus
+        -- the rows closed after it; index the closed rows by when they were closed
+        DROP INDEX IF EXISTS creator_stats_valid_to_idx;
+        CREATE INDEX IF NOT EXISTS creator_stats_closed_idx
+            ON creator_stats (valid_to_snapshot, snapshot_id) WHERE valid_to_snapshot IS NOT NULL;
+        CREATE INDEX IF NOT EXISTS price_history_closed_idx
+            ON price_history (valid_to_snapshot, snapshot_id) WHERE valid_to_snapshot IS NOT NULL;
+    """),
+    ("010_genre_list_split", """
+        -- 003 split on ', ' while ingest splits on ',' and trims, so backfilled rows whose
+        -- genres lacked the space got different genres. Resplit them and recount their snapshots.
+        CREATE TEMPORARY TABLE resplit (snapshot_id BIGINT) ON COMMIT DROP;
+
+        WITH updated AS (
+            UPDATE game_stats
+            SET genre_list = ARRAY(
+                SELECT genre FROM UNNEST(REGEXP_SPLIT_TO_ARRAY(BTRIM(genres), '\\s*,\\s*')) AS genre WHERE genre <> ''
+            )
+            WHERE genres IS NOT NULL AND genres NOT IN ('', 'N/A')
+                AND genre_list IS DISTINCT FROM ARRAY(
+                    SELECT genre FROM UNNEST(REGEXP_SPLIT_TO_ARRAY(BTRIM(genres), '\\s*,\\s*')) AS genre WHERE genre <> ''
+                )
+            RETURNING snapshot_id
+        )
+        INSERT INTO resplit SELECT DISTINCT snapshot_id FROM updated WHERE snapshot_id IS NOT NULL;
+
+        DELETE FROM genre_stats WHERE snapshot_id IN (SELECT snapshot_id FROM resplit);
+
+        INSERT INTO genre_stats (snapshot_id, genre, total_players, game_count)
+        SELECT snapshot_id, genre, SUM(player_count), COUNT(*)
+        FROM game_stats, LATERAL (SELECT DISTINCT UNNEST(genre_list)) AS game_genres (genre)
+        WHERE snapshot_id IN (SELECT snapshot_id FROM resplit)
+        GROUP BY snapshot_id, genre;
+    """),
+]
+
+
+def apply_migrations(conn):
+    """Apply any migrations the database has not seen yet, each in its own transaction"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                name TEXT PRIMARY KEY,
+                applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+        """)
+        conn.commit()
+        cursor.execute("SELECT name FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+
+    for name, sql in MIGRATIONS:
+        if name in applied:
+            continue
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(sql)
+                cursor.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (name,))
+            conn.commit()
+            print(f"Applied migration {name}")
+        except psycopg2.Error:
+            conn.rollback()
+            raise
+
+
+if __name__ == "__main__":
+    conn = psycopg2.connect(SUPABASE_URL)
+    try:
+        apply_migrations(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,292 @@
+"""In-process search and autocomplete over the current snapshot's games, creators and genres.
+
+Two structures back a query:
+
+- A prefix trie over the words of every name, so "coun str" finds "Counter-Strike 2"
+  while the user is still typing.
+- A trigram index over the words of every name. It catches typos ("conter strike") when
+  prefixes alone find fewer than limit results.
+
+The index lives in process memory and is refreshed when the published snapshot changes.
+The new snapshot's documents are diffed against the indexed ones, so only added and
+removed names touch the trie and trigram postings. Queries never touch the database.
+"""
+import asyncio
+import heapq
+import re
+import time
+import unicodedata
+
+import metrics
+from db import execute_query
+from snapshots import row_time_bounds, valid_at
+
+KINDS = ("game", "creator", "genre")
+SEARCH_MAX_LIMIT = 50
+# Minimum share of trigrams a fuzzy match needs in common with the query, as in pg_trgm
+FUZZY_THRESHOLD = 0.3
+MATCH_EXACT, MATCH_PREFIX, MATCH_WORDS, MATCH_FUZZY = range(4)
+MATCH_NAMES = ("exact", "prefix", "words", "fuzzy")
+NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text):
+    """Lowercase words of text with accents and punctuation removed"""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode().lower()
+    return NON_ALNUM.sub(" ", text).split()
+
+
+def trigrams(words):
+    """pg_trgm-style trigrams: each word padded with two spaces in front and one behind"""
+    found = set()
+    for word in words:
+        padded = f"  {word} "
+        found.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return found
+
+
+class TrieNode:
+    __slots__ = ("children", "keys")
+
+    def __init__(self):
+        self.children = {}
+        # Keys of every document with a word starting with the path to this node
+        self.keys = set()
+
+
+class SearchIndex:
+    """Documents keyed by (kind, id); each one a dict with at least type, name and weight"""
+
+    def __init__(self):
+        self.documents = {}
+        self.snapshot_id = None
+        self.root = TrieNode()
+        self.postings = {}
+        self._words = {}
+        self._phrases = {}
+        self._trigram_counts = {}
+        self._popularity = {}
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, key, document):
+        words = normalize(document["name"])
+        self.documents[key] = document
+        self._words[key] = words
+        self._phrases[key] = " ".join(words)
+        for word in set(words):
+            node = self.root
+            for char in word:
+                node = node.children.setdefault(char, TrieNode())
+                node.keys.add(key)
+        grams = trigrams(words)
+        self._trigram_counts[key] = len(grams)
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(key)
+
+    def remove(self, key):
+        words = self._words.pop(key)
+        del self.documents[key]
+        del self._phrases[key]
+        del self._trigram_counts[key]
+        for word in set(words):
+            path = [self.root]
+            for char in word:
+                # Gone already when another of the document's words shared this prefix
+                child = path[-1].children.get(char)
+                if child is None:
+                    break
+                child.keys.discard(key)
+                path.append(child)
+            # Prune the branch back up to the first node another document still uses
+            for depth in range(len(path) - 1, 0, -1):
+                if path[depth].keys:
+                    break
+                del path[depth - 1].children[word[depth - 1]]
+        for gram in trigrams(words):
+            keys = self.postings[gram]
+            keys.discard(key)
+            if not keys:
+                del self.postings[gram]
+
+    def update(self, documents, snapshot_id):
+        """Make the index hold exactly documents ({key: document}); returns (added, removed, changed)"""
+        removed = [key for key in self.documents if key not in documents]
+        for key in removed:
+            self.remove(key)
+        added = changed = 0
+        for key, document in documents.items():
+            current = self.documents.get(key)
+            if current is None:
+                self.add(key, document)
+                added += 1
+            elif current != document:
+                if current["name"] == document["name"]:
+                    self.documents[key] = document
+                else:
+                    self.remove(key)
+                    self.add(key, document)
+                changed += 1
+        # Weights are player counts, views or players per genre; scale each kind to 0..1
+        max_weight = {}
+        for document in self.documents.values():
+            max_weight[document["type"]] = max(max_weight.get(document["type"], 0), document["weight"] or 0)
+        self._popularity = {key: (document["weight"] or 0) / (max_weight[document["type"]] or 1)
+                            for key, document in self.documents.items()}
+        self.snapshot_id = snapshot_id
+        return added, len(removed), changed
+
+    def _prefix_matches(self, words):
+        """Keys of documents where every query word prefixes one of the document's words"""
+        matches = None
+        for word in sorted(set(words), key=len, reverse=True):
+            node = self.root
+            for char in word:
+                node = node.children.get(char)
+                if node is None:
+                    return set()
+            matches = set(node.keys) if matches is None else matches & node.keys
+            if not matches:
+                break
+        return matches or set()
+
+    def _fuzzy_matches(self, words):
+        """{key: similarity} of documents sharing at least FUZZY_THRESHOLD of their trigrams with the query"""
+        grams = trigrams(words)
+        shared = {}
+        for gram in grams:
+            for key in self.postings.get(gram, ()):
+                shared[key] = shared.get(key, 0) + 1
+        scores = {}
+        for key, count in shared.items():
+            similarity = count / (len(grams) + self._trigram_counts[key] - count)
+            if similarity >= FUZZY_THRESHOLD:
+                scores[key] = similarity
+        return scores
+
+    def search(self, query, limit=10, kinds=KINDS, fuzzy=True):
+        """Best matches first: exact names, then names starting with the query, then names
+        containing every query word as a word prefix, then typo-tolerant trigram matches.
+        Ties go to the more popular document."""
+        words = normalize(query)
+        if not words:
+            return []
+        phrase = " ".join(words)
+        phrases = self._phrases
+        popularity = self._popularity
+        ranked = {}
+        for key in self._prefix_matches(words):
+            if key[0] not in kinds:
+                continue
+            name = phrases[key]
+            match = MATCH_EXACT if name == phrase else MATCH_PREFIX if name.startswith(phrase) else MATCH_WORDS
+            ranked[key] = (match, -popularity[key], name)
+        if fuzzy and len(ranked) < limit and len(phrase) >= 3:
+            for key, similarity in self._fuzzy_matches(words).items():
+                if key[0] in kinds and key not in ranked:
+                    ranked[key] = (MATCH_FUZZY, -similarity - popularity[key] / 10, phrases[key])
+
+        results = []
+        for key in heapq.nsmallest(limit, ranked, key=ranked.get):
+            document = {field: value for field, value in self.documents[key].items() if field != "weight"}
+            results.append({**document, "match": MATCH_NAMES[ranked[key][0]]})
+        return results
+
+
+def game_documents(rows):
+    return {
+        ("game", f"{row['source']}:{row['name']}"): {
+            "type": "game", "name": row["name"], "source": row["source"], "player_count": row["player_count"],
+            "genres": row["genres"], "weight": row["player_count"],
+        }
+        for row in rows
+    }
+
+
+def creator_documents(rows):
+    """One document per creator, listing every game they were found under"""
+    documents = {}
+    for row in rows:
+        key = ("creator", f"{row['platform']}:{row['creator_id']}")
+        document = documents.get(key)
+        if document is None:
+            documents[key] = {
+                "type": "creator", "name": row["name"], "platform": row["platform"], "creator_id": row["creator_id"],
+                "subscriber_count": row["subscriber_count"], "total_views": row["total_views"],
+                "games": [row["game_name"]], "weight": row["total_views"],
+            }
+        elif row["game_name"] not in document["games"]:
+            document["games"].append(row["game_name"])
+    for document in documents.values():
+        document["games"].sort()
+    return documents
+
+
+def genre_documents(rows):
+    return {
+        ("genre", row["genre"]): {
+            "type": "genre", "name": row["genre"], "total_players": row["total_players"],
+            "game_count": row["game_count"], "weight": row["total_players"],
+        }
+        for row in rows
+    }
+
+
+async def load_documents(snapshot_id):
+    """Every searchable document of a snapshot, or an {"error": ...} payload"""
+    bounds_sql, bounds_params = row_time_bounds(snapshot_id)
+    creators_sql, creators_params = valid_at(snapshot_id)
+    games, creators, genres = await asyncio.gather(
+        execute_query(f"""
+            SELECT DISTINCT ON (name, source) name, source, player_count, genres
+            FROM game_stats
+            WHERE snapshot_id = %s AND {bounds_sql}
+            ORDER BY name, source, player_count DESC
+        """, [snapshot_id] + bounds_params, name="search:games"),
+        execute_query(f"""
+            SELECT platform, creator_id, name, subscriber_count, total_views, game_name
+            FROM creator_stats
+            WHERE {creators_sql}
+        """, creators_params, name="search:creators"),
+        execute_query("""
+            SELECT genre, total_players, game_count
+            FROM genre_stats
+            WHERE snapshot_id = %s
+        """, [snapshot_id], name="search:genres"),
+    )
+    for result in (games, creators, genres):
+        if isinstance(result, dict):
+            return result
+    return {**game_documents(games), **creator_documents(creators), **genre_documents(genres)}
+
+
+_index = SearchIndex()
+_refresh_lock = None
+
+
+async def current_index(snapshot_id):
+    """The index, brought up to snapshot_id first if a new snapshot has been published.
+
+    One request refreshes while the others wait on the lock. If loading fails, the index
+    of the previous snapshot keeps serving, and an {"error": ...} payload is returned
+    only when there is none yet.
+    """
+    global _refresh_lock
+    if snapshot_id is None or snapshot_id == _index.snapshot_id:
+        return _index
+    if _refresh_lock is None:
+        _refresh_lock = asyncio.Lock()
+    async with _refresh_lock:
+        if snapshot_id == _index.snapshot_id:
+            return _index
+        start = time.perf_counter()
+        documents = await load_documents(snapshot_id)
+        if isinstance(documents, dict) and "error" in documents:
+            return _index if _index.snapshot_id is not None else documents
+        added, removed, changed = _index.update(documents, snapshot_id)
+        print(f"Search index at snapshot {snapshot_id}: {len(_index)} documents "
+              f"({added} added, {removed} removed, {changed} changed) in {time.perf_counter() - start:.3f}s")
+        for kind in KINDS:
+            metrics.SEARCH_INDEX_DOCUMENTS.set(sum(1 for key in _index.documents if key[0] == kind), kind=kind)
+    return _index
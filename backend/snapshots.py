@@ -0,0 +1,69 @@
+# SQL fragment resolving the published snapshot. The pointer table holds a single row,
+# so Postgres evaluates this once per query and the snapshot_id indexes do the rest.
+LATEST_SNAPSHOT = "(SELECT snapshot_id FROM current_snapshot)"
+# Current rows of a change-only table. Both columns are set together; the first matches
+# the partial indexes, the second keeps a table partitioned by valid_to in its default partition.
+CURRENT_ROWS = "valid_to_snapshot IS NULL AND valid_to IS NULL"
+
+
+def valid_at(snapshot_id=None, at=None):
+    """WHERE condition rebuilding the state of a change-only table (price_history, creator_stats).
+
+    Rows are valid from the snapshot and timestamp that wrote them until valid_to_snapshot /
+    valid_to. Pass a snapshot id or a point in time; with neither, the current rows, which
+    are always the published snapshot's state since ingest writes and publishes atomically.
+    """
+    if at is not None:
+        return "timestamp <= %s AND (valid_to IS NULL OR valid_to > %s)", [at, at]
+    if snapshot_id is not None:
+        # Current rows through their partial indexes, plus rows closed after the snapshot
+        # through the (valid_to_snapshot, snapshot_id) index. When the pinned snapshot is the
+        # published one, the second branch is an empty index range.
+        return f"""(({CURRENT_ROWS} AND snapshot_id <= %s)
+            OR (valid_to_snapshot > %s AND snapshot_id <= %s))""", [snapshot_id, snapshot_id, snapshot_id]
+    return CURRENT_ROWS, []
+
+
+def row_time_bounds(snapshot_id=None):
+    """WHERE condition bounding game_stats.timestamp to the range a snapshot's rows were
+    stamped with. Redundant next to snapshot_id = ..., but it lets Postgres skip the
+    partitions of a time-partitioned game_stats that cannot hold the snapshot."""
+    snapshot = LATEST_SNAPSHOT if snapshot_id is None else "%s"
+    params = [] if snapshot_id is None else [snapshot_id, snapshot_id]
+    return f"""timestamp BETWEEN
+        (SELECT COALESCE(rows_from, '-infinity') FROM ingest_snapshots WHERE snapshot_id = {snapshot})
+        AND (SELECT COALESCE(rows_to, 'infinity') FROM ingest_snapshots WHERE snapshot_id = {snapshot})""", params
+
+
+def begin_snapshot(cursor):
+    """Register a new ingest run and return its snapshot id"""
+    cursor.execute("""
+        INSERT INTO ingest_snapshots (started_at, status)
+        VALUES (NOW(), 'running')
+        RETURNING snapshot_id
+    """)
+    return cursor.fetchone()[0]
+
+
+def publish_snapshot(cursor, snapshot_id, game_count, creator_count, rows_from=None, rows_to=None):
+    """Mark a run finished and point readers at it; commit together with the run's rows.
+    rows_from/rows_to is the timestamp range of the run's game_stats rows."""
+    cursor.execute("""
+        UPDATE ingest_snapshots
+        SET finished_at = NOW(), status = 'published', game_count = %s, creator_count = %s,
+            rows_from = %s, rows_to = %s
+        WHERE snapshot_id = %s
+    """, (game_count, creator_count, rows_from, rows_to, snapshot_id))
+    cursor.execute("""
+        INSERT INTO current_snapshot (singleton, snapshot_id, published_at)
+        VALUES (TRUE, %s, NOW())
+        ON CONFLICT (singleton) DO UPDATE
+        SET snapshot_id = EXCLUDED.snapshot_id, published_at = EXCLUDED.published_at
+    """, (snapshot_id,))
+
+
+def fail_snapshot(cursor, snapshot_id):
+    cursor.execute(
+        "UPDATE ingest_snapshots SET finished_at = NOW(), status = 'failed' WHERE snapshot_id = %s",
+        (snapshot_id,)
+    )
@@ -0,0 +1,182 @@
+import os
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+
+from snapshots import CURRENT_ROWS, publish_snapshot
+from rollups import update_rollups
+
+BULK_PAGE_SIZE = int(os.getenv("BULK_PAGE_SIZE", "1000"))
+
+GAME_STATS_COLUMNS = ("name", "player_count", "price", "price_cents", "currency", "avg_playtime", "genres", "genre_list", "timestamp", "source", "snapshot_id")
+PRICE_HISTORY_COLUMNS = ("game_id", "name", "price", "price_cents", "currency", "timestamp", "source", "snapshot_id")
+GENRE_STATS_COLUMNS = ("snapshot_id", "genre", "total_players", "game_count")
+CREATOR_STATS_COLUMNS = ("creator_id", "name", "platform", "subscriber_count", "video_count", "total_views", "game_name", "timestamp", "snapshot_id")
+# Tables that store change events: (key columns, tracked value columns). A run writes a row
+# only for keys whose tracked values differ from their current row.
+CHANGE_TRACKED = {
+    "price_history": (("game_id",), ("name", "price", "price_cents", "currency")),
+    "creator_stats": (("platform", "creator_id", "game_name"), ("name", "subscriber_count", "video_count", "total_views")),
+}
+# Serializes writers, so two ingest runs never compare against the same current rows
+WRITE_LOCK_ID = 7_041_553
+
+
+def split_genres(genres):
+    """Normalize the ", "-joined genres string into a list; "N/A" means no genres"""
+    if not genres or genres == "N/A":
+        return []
+    return [genre.strip() for genre in genres.split(",") if genre.strip()]
+
+
+def unique_games(game_data):
+    """First entry per (source, name), the same key as game_stats_snapshot_game_key, so
+    derived tables do not double count rows the insert skips as duplicates"""
+    games = {}
+    for game in game_data:
+        games.setdefault((game["source"], game["name"]), game)
+    return list(games.values())
+
+
+def genre_totals(game_data, snapshot_id):
+    """genre_stats rows for one snapshot: summed player counts and game counts per genre"""
+    totals = {}
+    for game in unique_games(game_data):
+        for genre in dict.fromkeys(split_genres(game["genres"])):
+            players, games = totals.get(genre, (0, 0))
+            totals[genre] = (players + game["player_count"], games + 1)
+    return [(snapshot_id, genre, players, games) for genre, (players, games) in totals.items()]
+
+
+def insert_rows(cursor, table, columns, rows, page_size=BULK_PAGE_SIZE):
+    """Multi-row INSERT in pages of page_size; rows hitting a unique key are skipped.
+
+    Returns the number of rows actually inserted.
+    """
+    if not rows:
+        return 0
+    query = f"""
+        INSERT INTO {table} ({", ".join(columns)})
+        VALUES %s
+        ON CONFLICT DO NOTHING
+        RETURNING 1
+    """
+    return len(execute_values(cursor, query, rows, page_size=page_size, fetch=True))
+
+
+def load_current_rows(cursor, table):
+    """{key: tracked values} of every current row of a change-tracked table, in one query"""
+    key_columns, value_columns = CHANGE_TRACKED[table]
+    cursor.execute(f"""
+        SELECT {", ".join(key_columns + value_columns)}
+        FROM {table}
+        WHERE {CURRENT_ROWS}
+    """)
+    width = len(key_columns)
+    return {tuple(row[:width]): tuple(row[width:]) for row in cursor.fetchall()}
+
+
+def diff_rows(table, columns, rows, current, valid_to, keep_missing=None):
+    """Split a run's rows against the current state.
+
+    Returns the rows to insert (new keys and changed values), the (key, valid_to) of each
+    current row to close, and the number of duplicate rows dropped. Within the run the
+    first row per key wins, as it does for the unique snapshot keys. A changed row is
+    closed at the timestamp of the row replacing it and a key missing from the run at
+    valid_to, so the validity ranges of one key never overlap. Missing keys for which
+    keep_missing(key) is true stay open: the run did not look at them.
+    """
+    key_columns, value_columns = CHANGE_TRACKED[table]
+    key_positions = [columns.index(column) for column in key_columns]
+    value_positions = [columns.index(column) for column in value_columns]
+    timestamp_position = columns.index("timestamp")
+    seen = set()
+    changed = []
+    closed = []
+    duplicates = 0
+    for row in rows:
+        key = tuple(row[i] for i in key_positions)
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        previous = current.get(key)
+        if previous == tuple(row[i] for i in value_positions):
+            continue
+        changed.append(row)
+        if previous is not None:
+            closed.append((key, row[timestamp_position]))
+    closed.extend((key, valid_to) for key in current
+                  if key not in seen and not (keep_missing and keep_missing(key)))
+    return changed, closed, duplicates
+
+
+def close_rows(cursor, table, closed, snapshot_id, page_size=BULK_PAGE_SIZE):
+    """End the validity of the current row of each (key, valid_to) at this snapshot"""
+    if not closed:
+        return 0
+    key_columns = CHANGE_TRACKED[table][0]
+    execute_values(cursor, f"""
+        UPDATE {table} t
+        SET valid_to = closed.valid_to::TIMESTAMP, valid_to_snapshot = {int(snapshot_id)}
+        FROM (VALUES %s) AS closed ({", ".join(key_columns)}, valid_to)
+        WHERE t.valid_to_snapshot IS NULL AND t.valid_to IS NULL
+            AND {" AND ".join(f"t.{column} = closed.{column}" for column in key_columns)}
+    """, [key + (valid_to,) for key, valid_to in closed], page_size=page_size)
+    return len(closed)
+
+
+def write_snapshot(conn, snapshot_id, game_data, creator_data, kept_platforms=()):
+    """Write one ingest run and publish it in a single transaction.
+
+    Either every table gets the run's rows and the snapshot pointer moves, or nothing
+    is written. price_history and creator_stats only get rows that changed. Returns
+    inserted and skipped counts per table, plus unchanged, duplicate and closed counts
+    for the change-tracked tables. Current creator_stats rows of kept_platforms, whose
+    discovery was incomplete, are not closed when the run has no row for them.
+    """
+    game_rows = [
+        (g["name"], g["player_count"], g["price"], g["price_cents"], g["currency"], g["avg_playtime"], g["genres"], split_genres(g["genres"]),
+         g["timestamp"], g["source"], snapshot_id)
+        for g in game_data
+    ]
+    price_rows = [
+        (g["game_id"], g["name"], g["price"], g["price_cents"], g["currency"], g.get("price_timestamp", g["timestamp"]),
+         g["source"], snapshot_id)
+        for g in game_data
+    ]
+    creator_rows = [
+        (c["creator_id"], c["name"], c["platform"], c["subscriber_count"], c["video_count"],
+         c["total_views"], c["game_name"], c["timestamp"], snapshot_id)
+        for c in creator_data
+    ]
+
+    counts = {}
+    with conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (WRITE_LOCK_ID,))
+            # Keys missing from the run are closed at its earliest reading
+            run_timestamps = [row["timestamp"] for row in game_data + creator_data if row["timestamp"]]
+            valid_to = min(run_timestamps, default=None) or datetime.now().isoformat()
+            for table, columns, rows in (
+                ("game_stats", GAME_STATS_COLUMNS, game_rows),
+                ("price_history", PRICE_HISTORY_COLUMNS, price_rows),
+                ("creator_stats", CREATOR_STATS_COLUMNS, creator_rows),
+                ("genre_stats", GENRE_STATS_COLUMNS, genre_totals(game_data, snapshot_id)),
+            ):
+                table_counts = {}
+                if table in CHANGE_TRACKED:
+                    keep_missing = (lambda key: key[0] in kept_platforms) if table == "creator_stats" else None
+                    changed, closed, duplicates = diff_rows(table, columns, rows, load_current_rows(cursor, table),
+                                                            valid_to, keep_missing)
+                    table_counts["unchanged"] = len(rows) - len(changed) - duplicates
+                    table_counts["duplicates"] = duplicates
+                    table_counts["closed"] = close_rows(cursor, table, closed, snapshot_id)
+                    rows = changed
+                inserted = insert_rows(cursor, table, columns, rows)
+                counts[table] = {"inserted": inserted, "skipped": len(rows) - inserted, **table_counts}
+            update_rollups(cursor, unique_games(game_data), creator_data)
+            timestamps = [g["timestamp"] for g in game_data if g["timestamp"]]
+            publish_snapshot(cursor, snapshot_id, len(game_rows), len(creator_rows),
+                             min(timestamps, default=None), max(timestamps, default=None))
+    return counts
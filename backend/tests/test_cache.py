@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+import cache
+
+
+@pytest.fixture
+def redis_pointer(monkeypatch):
+    """A fake Redis holding only the snapshot pointer"""
+    store = {}
+
+    async def redis_call(method, *args, **kwargs):
+        assert method == "get"
+        return store.get(args[0])
+
+    monkeypatch.setattr(cache, "_get_redis", lambda: object())
+    monkeypatch.setattr(cache, "_redis_call", redis_call)
+    monkeypatch.setattr(cache, "_snapshot", {"id": None, "checked_at": 0.0})
+    return store
+
+
+def loader(snapshot_id, calls):
+    async def load_snapshot_id():
+        calls.append(snapshot_id)
+        return snapshot_id
+    return load_snapshot_id
+
+
+def test_pointer_in_redis_is_used(redis_pointer):
+    redis_pointer[cache.REDIS_SNAPSHOT_KEY] = b"7"
+    calls = []
+    assert asyncio.run(cache.current_snapshot_id(loader(6, calls))) == 7
+    assert calls == []
+
+
+def test_missing_pointer_falls_back_to_the_database(redis_pointer):
+    calls = []
+    assert asyncio.run(cache.current_snapshot_id(loader(6, calls))) == 6
+    assert calls == [6]
+    # Polled again only after SNAPSHOT_POLL_INTERVAL
+    assert asyncio.run(cache.current_snapshot_id(loader(8, calls))) == 6
+    assert calls == [6]
@@ -0,0 +1,93 @@
+import pytest
+
+import creators
+import youtube
+
+
+class Platform:
+    """Fake search and profile functions that record what they were asked for"""
+
+    def __init__(self, hits):
+        self.hits = hits
+        self.searched = []
+        self.fetched = []
+
+    def searches(self, game_names, per_game):
+        def job(game_name):
+            self.searched.append(game_name)
+            return self.hits[game_name][:per_game]
+        return [(game_name, lambda game_name=game_name: job(game_name)) for game_name in game_names]
+
+    def profiles(self, executor, creator_ids):
+        self.fetched.append(sorted(creator_ids))
+        return {creator_id: {"name": creator_id, "subscriber_count": 1, "video_count": 1, "total_views": 1}
+                for creator_id in creator_ids}
+
+
+@pytest.fixture
+def platform(monkeypatch):
+    platform = Platform({"Game A": ["UC1", "UC2"], "Game B": ["UC2", "UC3"], "Game C": ["UC4"]})
+    monkeypatch.setitem(creators.PLATFORMS, "YouTube", (platform.searches, platform.profiles))
+    monkeypatch.setitem(youtube.quota, "units", 0)
+    monkeypatch.setitem(youtube.quota, "day", None)
+    return platform
+
+
+def discover(tmp_path, game_names):
+    cache = creators.CreatorCache(str(tmp_path / "creator_cache.json"))
+    return creators.discover(game_names, per_game=2, workers=2, platforms=["YouTube"], cache=cache)
+
+
+def test_creator_listed_under_two_games_is_fetched_once(tmp_path, platform):
+    creator_data, stats = discover(tmp_path, ["Game A", "Game B"])
+    assert platform.fetched == [["UC1", "UC2", "UC3"]]
+    assert sorted((row["game_name"], row["creator_id"]) for row in creator_data) == [
+        ("Game A", "UC1"), ("Game A", "UC2"), ("Game B", "UC2"), ("Game B", "UC3")]
+    assert stats["creators"] == 3
+    assert stats["incomplete"] == []
+
+
+def test_cached_searches_and_profiles_are_not_fetched_again(tmp_path, platform):
+    discover(tmp_path, ["Game A"])
+    creator_data, stats = discover(tmp_path, ["Game A", "Game B"])
+    assert platform.searched.count("Game A") == 1
+    assert platform.fetched == [["UC1", "UC2"], ["UC3"]]
+    assert stats["searches"] == 1
+    assert stats["profiles_fetched"] == 1
+    assert len(creator_data) == 4
+
+
+def test_expired_entries_are_fetched_again(tmp_path, platform, monkeypatch):
+    discover(tmp_path, ["Game A"])
+    monkeypatch.setattr(creators, "CREATOR_SEARCH_TTL", 0)
+    monkeypatch.setattr(creators, "CREATOR_PROFILE_TTL", 0)
+    discover(tmp_path, ["Game A"])
+    assert platform.searched == ["Game A", "Game A"]
+    assert platform.fetched == [["UC1", "UC2"], ["UC1", "UC2"]]
+
+
+def test_searches_stop_at_the_youtube_quota(tmp_path, platform, monkeypatch):
+    cost = youtube.QUOTA_COSTS["search.list"]
+    monkeypatch.setattr(youtube, "YOUTUBE_DAILY_QUOTA", 2 * cost + youtube.YOUTUBE_PROFILE_RESERVE)
+    creator_data, stats = discover(tmp_path, ["Game A", "Game B", "Game C"])
+    assert sorted(platform.searched) == ["Game A", "Game B"]
+    assert {row["game_name"] for row in creator_data} == {"Game A", "Game B"}
+    assert stats["incomplete"] == ["YouTube"]
+
+
+def test_search_over_the_quota_raises(monkeypatch):
+    monkeypatch.setitem(youtube.quota, "units", 0)
+    monkeypatch.setitem(youtube.quota, "day", None)
+    monkeypatch.setattr(youtube, "YOUTUBE_DAILY_QUOTA", youtube.QUOTA_COSTS["search.list"])
+    with pytest.raises(youtube.QuotaExhausted):
+        youtube.search_channels("Game A")
+    assert youtube.quota["units"] == 0
+
+
+def test_failed_profile_lookup_marks_the_platform_incomplete(tmp_path, platform, monkeypatch):
+    def fail(executor, creator_ids):
+        raise RuntimeError("boom")
+    monkeypatch.setitem(creators.PLATFORMS, "YouTube", (platform.searches, fail))
+    creator_data, stats = discover(tmp_path, ["Game A"])
+    assert creator_data == []
+    assert stats["incomplete"] == ["YouTube"]
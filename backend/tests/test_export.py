@@ -0,0 +1,69 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import export
+from export import EXPORT_TABLES, build_export_query, encode_csv, encode_ndjson
+from snapshots import valid_at
+
+COLUMNS = ["name", "price", "timestamp"]
+ROWS = [
+    ("Dota 2", Decimal("0"), datetime(2026, 1, 2, 3, 4, 5)),
+    ('Half-Life: "Alyx", Deluxe', Decimal("59.99"), None),
+    ("Line\nbreak", None, datetime(2026, 1, 2)),
+]
+
+
+def test_game_stats_export_filters_by_snapshot_and_time():
+    query, params = build_export_query("game_stats", "7", "2026-01-01", "2026-02-01")
+    assert query.startswith(f"SELECT {', '.join(EXPORT_TABLES['game_stats'])} FROM game_stats WHERE TRUE")
+    assert " AND snapshot_id = %s" in query
+    assert query.endswith(" AND timestamp >= %s AND timestamp < %s")
+    assert params == [7, 7, 7, "2026-01-01", "2026-02-01"]
+
+
+def test_latest_snapshot_needs_no_parameters():
+    query, params = build_export_query("game_stats", "latest")
+    assert f"snapshot_id = {export.LATEST_SNAPSHOT}" in query
+    assert params == []
+
+
+def test_change_only_export_rebuilds_the_snapshot_state():
+    snapshot_sql, snapshot_params = valid_at(7)
+    assert build_export_query("price_history", "7") == (
+        f"SELECT {', '.join(EXPORT_TABLES['price_history'])} FROM price_history WHERE TRUE AND {snapshot_sql}",
+        snapshot_params)
+
+
+def test_unfiltered_export_selects_every_row():
+    assert build_export_query("creator_stats") == (
+        f"SELECT {', '.join(EXPORT_TABLES['creator_stats'])} FROM creator_stats WHERE TRUE", [])
+
+
+def test_ndjson_keeps_row_and_column_order(monkeypatch):
+    monkeypatch.setattr(export, "ROWS_PER_CHUNK", 2)
+    chunks = list(encode_ndjson(COLUMNS, iter(ROWS)))
+    assert len(chunks) == 2
+    lines = b"".join(chunks).decode().splitlines()
+    assert [list(json.loads(line)) for line in lines] == [COLUMNS] * 3
+    assert [json.loads(line) for line in lines] == [
+        {"name": "Dota 2", "price": 0.0, "timestamp": "2026-01-02T03:04:05"},
+        {"name": 'Half-Life: "Alyx", Deluxe', "price": 59.99, "timestamp": None},
+        {"name": "Line\nbreak", "price": None, "timestamp": "2026-01-02T00:00:00"},
+    ]
+
+
+def test_csv_quotes_commas_quotes_and_newlines(monkeypatch):
+    monkeypatch.setattr(export, "ROWS_PER_CHUNK", 2)
+    chunks = list(encode_csv(COLUMNS, iter(ROWS)))
+    assert len(chunks) == 2
+    assert b"".join(chunks).decode() == (
+        "name,price,timestamp\r\n"
+        "Dota 2,0,2026-01-02T03:04:05\r\n"
+        '"Half-Life: ""Alyx"", Deluxe",59.99,\r\n'
+        '"Line\nbreak",,2026-01-02T00:00:00\r\n'
+    )
+
+
+def test_csv_of_no_rows_is_just_the_header():
+    assert b"".join(encode_csv(COLUMNS, iter([]))) == b"name,price,timestamp\r\n"
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app import check_history_params, creator_deltas
+from downsample import lttb
+from rollups import bucket_start, creator_rollup_rows, game_rollup_rows
+
+START = datetime(2026, 1, 1)
+
+
+def series(values):
+    return [{"x": i, "y": value} for i, value in enumerate(values)]
+
+
+def test_lttb_keeps_ends_and_peaks():
+    rows = series([0, 1, 0, 0, 50, 0, 0, 1, 0, -40, 0, 0])
+    sampled = lttb(rows, 5, lambda row: row["x"], lambda row: row["y"])
+    assert len(sampled) == 5
+    assert sampled[0] is rows[0] and sampled[-1] is rows[-1]
+    assert rows[4] in sampled and rows[9] in sampled
+    assert [row["x"] for row in sampled] == sorted(row["x"] for row in sampled)
+
+
+@pytest.mark.parametrize("threshold", [2, 12, 100])
+def test_lttb_returns_everything_below_three_or_above_length(threshold):
+    rows = series(range(12))
+    assert lttb(rows, threshold, lambda row: row["x"], lambda row: row["y"]) == rows
+
+
+def test_bucket_start():
+    assert bucket_start("2026-01-01T13:45:10", "hour") == datetime(2026, 1, 1, 13)
+    assert bucket_start(datetime(2026, 1, 1, 13, 45), "day") == START
+
+
+def test_game_rollup_rows_merge_readings_per_bucket():
+    games = [
+        {"name": "Dota 2", "source": "Steam", "player_count": 100, "timestamp": "2026-01-01T10:10:00"},
+        {"name": "Dota 2", "source": "Steam", "player_count": 300, "timestamp": "2026-01-01T10:50:00"},
+        {"name": "Dota 2", "source": "Steam", "player_count": 200, "timestamp": "2026-01-01T11:05:00"},
+    ]
+    rows = {row[:4]: row[4:] for row in game_rollup_rows(games)}
+    assert rows[("hour", datetime(2026, 1, 1, 10), "Dota 2", "Steam")] == (
+        100, 300, 400, 2, 300, datetime(2026, 1, 1, 10, 50))
+    assert rows[("day", START, "Dota 2", "Steam")] == (100, 300, 600, 3, 200, datetime(2026, 1, 1, 11, 5))
+    assert len(rows) == 3
+
+
+def test_creator_rollup_rows_keep_first_and_last_reading():
+    creators = [
+        {"platform": "YouTube", "creator_id": "UC1", "subscriber_count": s, "total_views": v, "video_count": n,
+         "timestamp": t}
+        for s, v, n, t in [(20, 2000, 6, "2026-01-01T12:00:00"), (10, 1000, 5, "2026-01-01T09:00:00")]
+    ]
+    (row,) = [row for row in creator_rollup_rows(creators) if row[0] == "day"]
+    assert row == ("day", START, "YouTube", "UC1", 10, 1000, datetime(2026, 1, 1, 9),
+                   20, 2000, 6, datetime(2026, 1, 1, 12))
+
+
+def creator_point(day, platform, subscribers, views, first_subscribers, first_views):
+    return {"bucket_start": START + timedelta(days=day), "platform": platform, "subscriber_count": subscribers,
+            "total_views": views, "video_count": 1, "first_subscribers": first_subscribers, "first_views": first_views}
+
+
+def test_creator_deltas_are_between_returned_points_per_platform():
+    rows = [
+        creator_point(0, "YouTube", 110, 1000, 100, 900),
+        creator_point(0, "Twitch", 50, 300, 50, 250),
+        creator_point(5, "YouTube", 150, 1600, 140, 1500),
+    ]
+    points = creator_deltas(rows)
+    assert [(p["subscriber_delta"], p["views_delta"]) for p in points] == [(10, 100), (0, 50), (40, 600)]
+    assert "first_subscribers" not in points[0]
+
+
+@pytest.mark.parametrize("bucket, points", [("week", 200), ("day", 2), ("hour", 0)])
+def test_history_params_are_checked(bucket, points):
+    with pytest.raises(HTTPException) as error:
+        check_history_params(bucket, points)
+    assert error.value.status_code == 400
+
+
+def test_history_params_accept_rollup_buckets():
+    check_history_params("hour", 3)
+    check_history_params("day", 200)
@@ -0,0 +1,37 @@
+import json
+
+import http_cache
+import upstream
+
+APPDETAILS = "https://store.steampowered.com/api/appdetails?appids=10"
+STEAMSPY = "https://steamspy.com/api.php?request=appdetails&appid=10"
+
+
+def response(body, status=200):
+    return http_cache.to_response("https://example.com", status, {}, json.dumps(body).encode())
+
+
+def test_appdetails_soft_failure_is_not_cached():
+    assert http_cache.cacheable(APPDETAILS, response({"10": {"success": True, "data": {}}}))
+    assert not http_cache.cacheable(APPDETAILS, response({"10": {"success": False}}))
+    assert not http_cache.cacheable(APPDETAILS, response(None))
+
+
+def test_steamspy_unknown_app_is_not_cached():
+    assert http_cache.cacheable(STEAMSPY, response({"appid": 10, "name": "Counter-Strike"}))
+    assert not http_cache.cacheable(STEAMSPY, response({"appid": 10, "name": None}))
+
+
+def test_only_ok_responses_of_cached_urls_are_stored():
+    assert not http_cache.cacheable(APPDETAILS, response({"10": {"success": True}}, status=500))
+    assert not http_cache.cacheable("https://example.com/other", response({}))
+    assert http_cache.cacheable("https://steamspy.com/api.php?request=top100in2weeks", response({}))
+
+
+def test_fresh_entry_is_served_and_counted_as_a_hit(tmp_path, monkeypatch):
+    cache = http_cache.HttpCache(str(tmp_path))
+    monkeypatch.setattr(http_cache, "get_cache", lambda: cache)
+    cache.store(STEAMSPY, response({"appid": 10, "name": "Counter-Strike"}), ttl=60)
+    assert upstream.get(STEAMSPY).json()["name"] == "Counter-Strike"
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 0
@@ -0,0 +1,33 @@
+import metrics
+
+
+def test_render_prometheus_text(monkeypatch):
+    monkeypatch.setattr(metrics, "REGISTRY", [])
+    requests_total = metrics.Counter("test_requests_total", "Requests", ("host",))
+    pool = metrics.Gauge("test_pool_connections", "Pool connections", ("state",))
+    latency = metrics.Histogram("test_latency_seconds", "Latency", ("endpoint",), buckets=(0.1, 1.0))
+
+    requests_total.inc(host="api.steampowered.com")
+    requests_total.inc(2, host="api.steampowered.com")
+    requests_total.inc(host='say "hi"\n')
+    pool.set(4, state="idle")
+    latency.observe(0.05, endpoint="/api/games")
+    latency.observe(0.5, endpoint="/api/games")
+    latency.observe(3.0, endpoint="/api/games")
+
+    assert metrics.render() == "\n".join([
+        "# HELP test_requests_total Requests",
+        "# TYPE test_requests_total counter",
+        'test_requests_total{host="api.steampowered.com"} 3',
+        'test_requests_total{host="say \\"hi\\"\\n"} 1',
+        "# HELP test_pool_connections Pool connections",
+        "# TYPE test_pool_connections gauge",
+        'test_pool_connections{state="idle"} 4',
+        "# HELP test_latency_seconds Latency",
+        "# TYPE test_latency_seconds histogram",
+        'test_latency_seconds_bucket{endpoint="/api/games",le="0.1"} 1',
+        'test_latency_seconds_bucket{endpoint="/api/games",le="1.0"} 2',
+        'test_latency_seconds_bucket{endpoint="/api/games",le="+Inf"} 3',
+        'test_latency_seconds_sum{endpoint="/api/games"} 3.55',
+        'test_latency_seconds_count{endpoint="/api/games"} 3',
+    ]) + "\n"
@@ -0,0 +1,76 @@
+import pytest
+
+from pagination import decode_cursor, encode_cursor, keyset_condition, page_size, paginate
+
+ORDER = [
+    ("player_count", "DESC", "player_count"),
+    ("name", "ASC", "name"),
+    ("source", "ASC", "source"),
+]
+
+
+def test_keyset_condition_expands_mixed_directions():
+    sql, params = keyset_condition(ORDER, [100, "Dota 2", "Steam"])
+    assert sql == (
+        " AND player_count <= %s AND (player_count < %s OR (player_count = %s AND "
+        "(name > %s OR (name = %s AND source > %s))))"
+    )
+    assert params == [100, 100, 100, "Dota 2", "Dota 2", "Steam"]
+
+
+def test_keyset_condition_single_column():
+    sql, params = keyset_condition([("genre", "ASC", "genre")], ["Action"])
+    assert sql == " AND genre >= %s AND genre > %s"
+    assert params == ["Action", "Action"]
+
+
+FILTERS = {"genre": "MOBA", "source": None}
+
+
+def test_cursor_round_trip():
+    values = [100, "Dota 2", "Steam"]
+    assert decode_cursor(encode_cursor(values, ORDER, FILTERS), ORDER, FILTERS) == values
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", encode_cursor([1, 2], ORDER[:2]), encode_cursor({"a": 1}, ORDER)])
+def test_decode_cursor_rejects_bad_cursors(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, ORDER)
+
+
+def test_cursor_of_another_sort_order_is_rejected():
+    by_name = [("name", "DESC", "name"), ("player_count", "ASC", "player_count"), ("source", "ASC", "source")]
+    cursor = encode_cursor(["Dota 2", 100, "Steam"], by_name)
+    with pytest.raises(ValueError, match="sort order"):
+        decode_cursor(cursor, ORDER)
+
+
+def test_cursor_of_other_filters_is_rejected():
+    cursor = encode_cursor([100, "Dota 2", "Steam"], ORDER, FILTERS)
+    with pytest.raises(ValueError, match="filters"):
+        decode_cursor(cursor, ORDER, {"genre": "RPG", "source": None})
+
+
+def rows(count):
+    return [{"player_count": 100 - i, "name": f"Game {i}", "source": "Steam"} for i in range(count)]
+
+
+def test_page_size_reads_one_extra_row_when_paging():
+    assert page_size(10, None) == 10
+    assert page_size(10, "") == 11
+
+
+def test_paginate_returns_cursor_when_more_rows_follow():
+    page = paginate(rows(3), 2, ORDER, FILTERS)
+    assert page["data"] == rows(2)
+    assert decode_cursor(page["next_cursor"], ORDER, FILTERS) == [99, "Game 1", "Steam"]
+
+
+def test_paginate_full_last_page_has_no_cursor():
+    page = paginate(rows(2), 2, ORDER)
+    assert page == {"data": rows(2), "next_cursor": None}
+
+
+def test_paginate_passes_errors_through():
+    error = {"error": "db down"}
+    assert paginate(error, 2, ORDER) is error
@@ -0,0 +1,103 @@
+from datetime import datetime
+
+import psycopg2
+
+import partitions
+
+
+class Cursor:
+    """Records statements; to_regclass finds only the partitions in existing"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self.result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        query = " ".join(query.split())
+        self.conn.statements.append(query)
+        for table in self.conn.failing:
+            if f"{table}_p" in query and query.startswith("CREATE TABLE"):
+                raise psycopg2.OperationalError(f"{table} is locked")
+        if query.startswith("SELECT to_regclass"):
+            self.result = [(params[0] if params[0] in self.conn.existing else None,)]
+        elif query.startswith("SELECT table_name"):
+            self.result = [(table, "timestamp", "day", None) for table in self.conn.tables]
+        elif query.startswith("SELECT child.relname"):
+            self.result = []
+        elif query.startswith("WITH moved"):
+            self.rowcount = self.conn.default_rows
+        else:
+            self.rowcount = 0
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+
+class Connection:
+    def __init__(self, tables=("game_stats",), existing=(), default_rows=0, failing=()):
+        self.tables = tables
+        self.existing = set(existing)
+        self.default_rows = default_rows
+        self.failing = failing
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.commits += 1
+        else:
+            self.rollbacks += 1
+        return False
+
+    def cursor(self):
+        return Cursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+DAY = datetime(2026, 1, 5)
+
+
+def test_new_partition_takes_its_rows_from_the_default_before_attaching():
+    conn = Connection(default_rows=3)
+    with conn.cursor() as cursor:
+        assert partitions.create_partition(cursor, "game_stats", DAY, "day") == "game_stats_p20260105"
+    steps = [statement.split(" (")[0] for statement in conn.statements[1:4]]
+    assert steps == [
+        "CREATE TABLE game_stats_p20260105",
+        "WITH moved AS",
+        "ALTER TABLE game_stats ATTACH PARTITION game_stats_p20260105 FOR VALUES FROM",
+    ]
+    assert "DELETE FROM game_stats_default WHERE timestamp >= %s AND timestamp < %s" in conn.statements[2]
+    assert conn.statements[2].endswith("INSERT INTO game_stats_p20260105 SELECT * FROM moved")
+
+
+def test_existing_partition_only_gets_its_indexes():
+    conn = Connection(existing={"game_stats_p20260105"})
+    with conn.cursor() as cursor:
+        partitions.create_partition(cursor, "game_stats", DAY, "day")
+    assert not any(statement.startswith(("CREATE TABLE", "WITH moved", "ALTER TABLE")) for statement in conn.statements)
+    assert "CREATE UNIQUE INDEX IF NOT EXISTS game_stats_p20260105_id_key ON game_stats_p20260105 (id)" in conn.statements
+
+
+def test_maintain_reports_a_failing_table_and_keeps_going(capsys):
+    conn = Connection(tables=("game_stats", "creator_stats"), failing=("game_stats",))
+    assert partitions.maintain(conn, older_than_days=None, now=DAY) == []
+    assert "Could not create partitions of game_stats" in capsys.readouterr().out
+    assert any(statement.startswith("CREATE TABLE creator_stats_p20260105") for statement in conn.statements)
+    assert conn.rollbacks == 1
@@ -0,0 +1,61 @@
+import threading
+
+import psycopg2
+import pytest
+
+import db
+
+
+class Connection:
+    def __init__(self, fail_set_session=False):
+        self.autocommit = False
+        self.closed = 0
+        self.fail_set_session = fail_set_session
+
+    def set_session(self, **kwargs):
+        if self.fail_set_session:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        self.autocommit = kwargs["autocommit"]
+
+
+class Pool:
+    minconn = 1
+    maxconn = 2
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def getconn(self):
+        return self.conn
+
+    def putconn(self, conn, close=False):
+        if close:
+            conn.closed = 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    def install(conn):
+        monkeypatch.setattr(db, "_pool", Pool(conn))
+        monkeypatch.setattr(db, "_slots", threading.BoundedSemaphore(2))
+        monkeypatch.setattr(db, "_in_use", 0)
+        monkeypatch.setattr(db, "_open", set())
+        monkeypatch.setattr(db, "_last_used", {})
+        monkeypatch.setattr(db, "_stats", dict.fromkeys(db._stats, 0))
+    return install
+
+
+def test_checkout_is_tracked_until_returned(pool):
+    pool(Connection())
+    with db.get_connection():
+        assert (db.pool_stats()["in_use"], db.pool_stats()["open"]) == (1, 1)
+    assert (db.pool_stats()["in_use"], db.pool_stats()["idle"]) == (0, 1)
+
+
+def test_connection_failing_before_checkout_is_not_untracked(pool):
+    pool(Connection(fail_set_session=True))
+    with pytest.raises(psycopg2.OperationalError):
+        with db.get_connection():
+            pass
+    stats = db.pool_stats()
+    assert (stats["in_use"], stats["open"], stats["discarded"]) == (0, 0, 1)
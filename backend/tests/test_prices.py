@@ -0,0 +1,19 @@
+import pytest
+
+from fetch_data import clean_price, price_to_cents
+
+
+@pytest.mark.parametrize("price, cents", [("Free", 0), ("$19.99", 1999), ("$5", 500), ("N/A", None)])
+def test_price_to_cents(price, cents):
+    assert price_to_cents(price) == cents
+
+
+def test_missing_price_is_a_value_error():
+    with pytest.raises(ValueError):
+        price_to_cents(None)
+
+
+@pytest.mark.parametrize("raw, price", [("", "Free"), ("$0.00", "Free"), ("$19.99", "$19.99"), ("19.99", "$19.99"),
+                                        ("19,99€", "N/A")])
+def test_clean_price(raw, price):
+    assert clean_price(raw) == price
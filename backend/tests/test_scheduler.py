@@ -0,0 +1,96 @@
+from datetime import datetime
+
+import pytest
+
+import scheduler
+from scheduler import DETAIL_KINDS, Budget, Scheduler
+
+NOW = 1_767_225_600.0  # 2026-01-01
+
+
+def test_budget_spends_within_its_window():
+    budget = Budget(10, 60)
+    assert budget.can_spend(10, NOW)
+    budget.spend(8, NOW)
+    assert budget.can_spend(2, NOW + 30)
+    assert not budget.can_spend(3, NOW + 30)
+    assert budget.resets_at() == NOW + 60
+
+
+def test_budget_resets_after_its_period():
+    budget = Budget(10, 60)
+    budget.spend(10, NOW)
+    assert not budget.can_spend(1, NOW + 59)
+    assert budget.can_spend(10, NOW + 60)
+    assert budget.resets_at() == NOW + 120
+
+
+def test_budget_resumes_from_a_checkpoint():
+    budget = Budget(10, 60, window_start=NOW, used=9.0)
+    assert not budget.can_spend(2, NOW + 1)
+
+
+def test_take_due_defers_jobs_until_the_budget_window(monkeypatch):
+    monkeypatch.setattr(scheduler, "job_costs", lambda kind: [("steam", 1)])
+    jobs = Scheduler()
+    jobs.budgets["steam"] = Budget(1, 300)
+    jobs.schedule("player_count:10", NOW)
+    jobs.schedule("player_count:20", NOW)
+    # catalog and maintenance were scheduled for the real current time, after NOW
+    assert jobs.take_due(NOW, limit=10) == ["player_count:10"]
+    assert jobs.due["player_count:20"] == NOW + 300
+
+
+CATALOG = ({"10": {"name": "Dota 2"}, "20": {"name": "Deadlock"}}, [])
+RESULTS = {"player_count": 500, "store_details": ("$9.99", 999, "USD", "MOBA"), "playtime": 1.5}
+
+
+def filled_scheduler():
+    jobs = Scheduler()
+    jobs.complete("catalog", True, CATALOG, NOW)
+    return jobs
+
+
+def test_publish_waits_for_every_detail_job():
+    jobs = filled_scheduler()
+    assert not jobs.ready()
+    assert jobs.snapshot_rows() == ([], [])
+    for kind in DETAIL_KINDS:
+        jobs.complete(f"{kind}:10", True, RESULTS[kind], NOW)
+    assert not jobs.ready()  # Deadlock has not been fetched yet
+    for kind in DETAIL_KINDS:
+        jobs.complete(f"{kind}:20", kind != "store_details", RESULTS[kind], NOW)
+    assert jobs.ready()
+    game_data, _ = jobs.snapshot_rows()
+    assert [game["name"] for game in game_data] == ["Dota 2"]
+
+
+def test_rows_keep_the_time_each_field_was_fetched():
+    jobs = filled_scheduler()
+    for kind in DETAIL_KINDS:
+        jobs.complete(f"{kind}:10", True, RESULTS[kind], NOW)
+    jobs.complete("player_count:10", True, 700, NOW + 300)
+    (game,), _ = jobs.snapshot_rows()
+    assert game["player_count"] == 700
+    assert game["timestamp"] == datetime.fromtimestamp(NOW + 300).isoformat()
+    assert game["price_timestamp"] == datetime.fromtimestamp(NOW).isoformat()
+    assert "fetched_at" not in game and "failed_at" not in game
+    # A publish without a new reading repeats the same timestamp, so rollups skip it
+    assert jobs.snapshot_rows()[0][0]["timestamp"] == game["timestamp"]
+
+
+def test_incomplete_platform_keeps_its_previous_creators():
+    jobs = filled_scheduler()
+    youtube_row = {"creator_id": "UC1", "platform": "YouTube", "game_name": "Dota 2"}
+    twitch_row = {"creator_id": "42", "platform": "Twitch", "game_name": "Dota 2"}
+    jobs.complete("creators:10", True, ([youtube_row, twitch_row], []), NOW)
+    new_twitch_row = {"creator_id": "43", "platform": "Twitch", "game_name": "Dota 2"}
+    jobs.complete("creators:10", True, ([new_twitch_row], ["YouTube"]), NOW + 60)
+    assert jobs.creators["Dota 2"] == [new_twitch_row, youtube_row]
+
+
+@pytest.mark.parametrize("kind", sorted(scheduler.CACHED_URLS))
+def test_cached_kinds_refresh_no_sooner_than_the_cache(kind):
+    ttl = scheduler.http_cache.ttl_for(scheduler.CACHED_URLS[kind])
+    assert ttl > 0
+    assert all(seconds >= ttl for seconds in scheduler.INTERVALS[kind].values())
@@ -0,0 +1,98 @@
+import pytest
+
+from search import SearchIndex, creator_documents, game_documents, genre_documents, normalize, trigrams
+
+GAMES = [
+    {"name": "Counter-Strike 2", "source": "Steam", "player_count": 900000, "genres": "Action, FPS"},
+    {"name": "Counter Attack", "source": "itch.io", "player_count": 50, "genres": "Action"},
+    {"name": "Dota 2", "source": "Steam", "player_count": 600000, "genres": "MOBA"},
+    {"name": "Stardew Valley", "source": "Steam", "player_count": 40000, "genres": "Simulation, RPG"},
+    {"name": "Strike Strike", "source": "itch.io", "player_count": 10, "genres": "Action"},
+]
+CREATORS = [
+    {"platform": "YouTube", "creator_id": "UC1", "name": "Counter Tips", "subscriber_count": 10, "total_views": 500,
+     "game_name": "Counter-Strike 2"},
+    {"platform": "YouTube", "creator_id": "UC1", "name": "Counter Tips", "subscriber_count": 10, "total_views": 500,
+     "game_name": "Dota 2"},
+]
+GENRES = [{"genre": "Action", "total_players": 900060, "game_count": 3}]
+
+
+def documents(games=GAMES):
+    return {**game_documents(games), **creator_documents(CREATORS), **genre_documents(GENRES)}
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.update(documents(), snapshot_id=1)
+    return index
+
+
+def names(results):
+    return [result["name"] for result in results]
+
+
+def test_normalize_and_trigrams():
+    assert normalize("Pokémon: Let's Go!") == ["pokemon", "let", "s", "go"]
+    assert trigrams(["go"]) == {"  g", " go", "go "}
+
+
+def test_prefix_ranks_exact_then_prefix_then_popularity(index):
+    results = index.search("counter", kinds=("game",))
+    assert names(results) == ["Counter-Strike 2", "Counter Attack"]
+    assert [result["match"] for result in results] == ["prefix", "prefix"]
+    assert index.search("dota 2")[0]["match"] == "exact"
+
+
+def test_multi_word_query_matches_word_prefixes_in_any_order(index):
+    assert names(index.search("str coun", kinds=("game",))) == ["Counter-Strike 2"]
+    assert index.search("str coun")[0]["match"] == "words"
+
+
+def test_kinds_filter_and_weight_is_hidden(index):
+    results = index.search("counter", kinds=("creator",))
+    assert names(results) == ["Counter Tips"]
+    assert results[0]["games"] == ["Counter-Strike 2", "Dota 2"]
+    assert "weight" not in results[0]
+
+
+def test_typo_falls_back_to_trigrams(index):
+    results = index.search("stardw valley")
+    assert names(results) == ["Stardew Valley"]
+    assert results[0]["match"] == "fuzzy"
+    assert index.search("stardw valley", fuzzy=False) == []
+
+
+def test_remove_prunes_the_trie_and_postings(index):
+    index.remove(("game", "itch.io:Strike Strike"))
+    index.remove(("game", "Steam:Counter-Strike 2"))
+    assert index.search("strike") == []
+    # "st" is still used by Stardew Valley, the "str" branch is gone
+    assert "r" not in index.root.children["s"].children["t"].children
+    assert all(("game", "Steam:Counter-Strike 2") not in keys for keys in index.postings.values())
+
+
+def dump(node, path=""):
+    """Every trie path with the keys stored at it"""
+    found = {path: frozenset(node.keys)}
+    for char, child in node.children.items():
+        found.update(dump(child, path + char))
+    return found
+
+
+def test_incremental_update_equals_fresh_build(index):
+    games = [dict(game) for game in GAMES if game["name"] != "Dota 2"]
+    games[0]["player_count"] = 1
+    games.append({"name": "Deadlock", "source": "Steam", "player_count": 100000, "genres": "MOBA"})
+    added, removed, changed = index.update(documents(games), snapshot_id=2)
+    assert (added, removed, changed) == (1, 1, 1)
+
+    fresh = SearchIndex()
+    fresh.update(documents(games), snapshot_id=2)
+    assert index.documents == fresh.documents
+    assert dump(index.root) == dump(fresh.root)
+    assert index.postings == fresh.postings
+    assert index._popularity == fresh._popularity
+    for query in ("counter", "dead", "dota", "stardw"):
+        assert index.search(query) == fresh.search(query)
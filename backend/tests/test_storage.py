@@ -0,0 +1,71 @@
+from storage import CREATOR_STATS_COLUMNS, PRICE_HISTORY_COLUMNS, diff_rows
+
+RUN_START = "2026-01-02T00:00:00"
+
+
+def price_row(game_id, price, timestamp="2026-01-02T00:05:00"):
+    return (game_id, f"Game {game_id}", price, round(price * 100), "USD", timestamp, "Steam", 2)
+
+
+def current_prices(*prices):
+    return {(game_id,): (f"Game {game_id}", price, round(price * 100), "USD") for game_id, price in prices}
+
+
+def test_new_key_is_inserted_without_closing():
+    row = price_row("10", 9.99)
+    changed, closed, duplicates = diff_rows("price_history", PRICE_HISTORY_COLUMNS, [row], {}, RUN_START)
+    assert changed == [row]
+    assert closed == []
+    assert duplicates == 0
+
+
+def test_unchanged_row_is_skipped():
+    rows = [price_row("10", 9.99)]
+    changed, closed, _ = diff_rows("price_history", PRICE_HISTORY_COLUMNS, rows, current_prices(("10", 9.99)), RUN_START)
+    assert changed == []
+    assert closed == []
+
+
+def test_changed_row_closes_at_the_replacing_row_timestamp():
+    row = price_row("10", 4.99, timestamp="2026-01-02T00:07:00")
+    changed, closed, _ = diff_rows("price_history", PRICE_HISTORY_COLUMNS, [row], current_prices(("10", 9.99)), RUN_START)
+    assert changed == [row]
+    assert closed == [(("10",), "2026-01-02T00:07:00")]
+
+
+def test_key_missing_from_run_closes_at_run_start():
+    rows = [price_row("10", 9.99)]
+    current = current_prices(("10", 9.99), ("20", 19.99))
+    changed, closed, _ = diff_rows("price_history", PRICE_HISTORY_COLUMNS, rows, current, RUN_START)
+    assert changed == []
+    assert closed == [(("20",), RUN_START)]
+
+
+def test_first_row_per_key_wins_and_duplicates_are_counted():
+    first = price_row("10", 4.99)
+    rows = [first, price_row("10", 1.99), price_row("10", 4.99)]
+    changed, closed, duplicates = diff_rows("price_history", PRICE_HISTORY_COLUMNS, rows, current_prices(("10", 9.99)), RUN_START)
+    assert changed == [first]
+    assert closed == [(("10",), first[5])]
+    assert duplicates == 2
+
+
+def test_creator_key_includes_game():
+    def creator_row(game_name, views):
+        return ("UC1", "Channel", "YouTube", 100, 10, views, game_name, "2026-01-02T00:05:00", 2)
+
+    current = {("YouTube", "UC1", "Game A"): ("Channel", 100, 10, 500)}
+    rows = [creator_row("Game A", 500), creator_row("Game B", 500)]
+    changed, closed, duplicates = diff_rows("creator_stats", CREATOR_STATS_COLUMNS, rows, current, RUN_START)
+    assert changed == [rows[1]]
+    assert closed == []
+    assert duplicates == 0
+
+
+def test_missing_key_is_kept_open_when_its_platform_was_not_looked_at():
+    current = {("YouTube", "UC1", "Game A"): ("Channel", 100, 10, 500),
+               ("Twitch", "42", "Game A"): ("Streamer", 50, 5, 200)}
+    changed, closed, _ = diff_rows("creator_stats", CREATOR_STATS_COLUMNS, [], current, RUN_START,
+                                   keep_missing=lambda key: key[0] == "YouTube")
+    assert changed == []
+    assert closed == [(("Twitch", "42", "Game A"), RUN_START)]
@@ -0,0 +1,104 @@
+import json
+from urllib.parse import parse_qsl, urlparse
+
+import pytest
+
+import http_cache
+import twitch
+import upstream
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class StubSession:
+    """Answers Twitch requests from handlers by path and records each call"""
+
+    def __init__(self, handlers):
+        self.handlers = handlers
+        self.calls = []
+
+    def request(self, method, url, params=None, headers=None, **kwargs):
+        path = urlparse(url).path
+        self.calls.append((method, path, list(params or []) + parse_qsl(urlparse(url).query), headers or {}))
+        status, body = self.handlers[path](self.calls[-1])
+        return http_cache.to_response(url, status, {}, json.dumps(body).encode())
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(upstream.time, "monotonic", clock)
+    monkeypatch.setattr(upstream.time, "sleep", clock.sleep)
+    return clock
+
+
+@pytest.fixture
+def session(monkeypatch, clock):
+    tokens = iter(f"token-{n}" for n in range(1, 10))
+
+    def token(call):
+        return 200, {"access_token": next(tokens), "expires_in": 3600}
+
+    def ids(call, key):
+        return [value for name, value in call[2] if name == key]
+
+    def helix(call):
+        if call[3]["Authorization"] == "Bearer token-1" and session.revoked:
+            return 401, {"message": "Invalid OAuth token"}
+        endpoint = call[1].rsplit("/", 1)[1]
+        if endpoint == "games":
+            return 200, {"data": [{"id": f"g-{name}", "name": name.upper()} for name in ids(call, "name")]}
+        return 200, {"data": [{"id": user_id, "display_name": user_id} for user_id in ids(call, "id")]}
+
+    session = StubSession({"/oauth2/token": token, "/helix/games": helix, "/helix/users": helix})
+    session.revoked = False
+    for host in ("id.twitch.tv", "api.twitch.tv"):
+        monkeypatch.setattr(upstream.host_for(host), "session", session)
+    return session
+
+
+def token_calls(session):
+    return [call for call in session.calls if call[1] == "/oauth2/token"]
+
+
+def test_app_token_is_cached_until_shortly_before_it_expires(session, clock):
+    client = twitch.TwitchClient("client", "secret")
+    assert client.access_token() == "token-1"
+    clock.now += 3600 - twitch.TOKEN_REFRESH_MARGIN - 1
+    assert client.access_token() == "token-1"
+    clock.now += 1
+    assert client.access_token() == "token-2"
+    assert len(token_calls(session)) == 2
+
+
+def test_unauthorized_helix_call_refreshes_the_token_once(session):
+    client = twitch.TwitchClient("client", "secret")
+    client.access_token()
+    session.revoked = True
+    assert client.get_users(["42"]) == {"42": {"id": "42", "display_name": "42"}}
+    helix_calls = [call for call in session.calls if call[1] == "/helix/users"]
+    assert [call[3]["Authorization"] for call in helix_calls] == ["Bearer token-1", "Bearer token-2"]
+    assert len(token_calls(session)) == 2
+
+
+def test_lookups_are_batched_by_100_ids(session):
+    client = twitch.TwitchClient("client", "secret")
+    user_ids = [str(n) for n in range(250)]
+    users = client.get_users(user_ids + user_ids[:10])
+    assert sorted(users) == sorted(user_ids)
+    batches = [len(call[2]) for call in session.calls if call[1] == "/helix/users"]
+    assert batches == [100, 100, 50]
+
+    names = [f"game {n}" for n in range(150)]
+    assert client.get_game_ids(names) == {name: f"g-{name}" for name in names}
+    assert [len(call[2]) for call in session.calls if call[1] == "/helix/games"] == [100, 50]
+    assert len(token_calls(session)) == 1
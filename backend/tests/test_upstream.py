@@ -0,0 +1,126 @@
+import pytest
+import requests
+
+import upstream
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats():
+    upstream.reset_stats()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(upstream.time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_threshold_failures(clock):
+    breaker = upstream.CircuitBreaker(threshold=3, cooldown=60)
+    assert [breaker.record(False) for _ in range(3)] == [False, False, True]
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = upstream.CircuitBreaker(threshold=2, cooldown=60)
+    breaker.record(False)
+    breaker.record(True)
+    assert not breaker.record(False)
+    assert breaker.state == "closed"
+
+
+def test_half_open_trial_closes_or_reopens(clock):
+    breaker = upstream.CircuitBreaker(threshold=1, cooldown=60)
+    breaker.record(False)
+    clock.now += 60
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()  # only one trial at a time
+    assert breaker.record(False)
+    assert breaker.state == "open"
+
+    clock.now += 60
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+class FailingSession:
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        raise self.error
+
+
+def test_non_network_errors_settle_a_half_open_trial(clock):
+    host = upstream.host_for("breaker-test.example")
+    host.breaker.record(False)
+    host.breaker.state = "open"
+    clock.now += host.breaker.cooldown
+    session = FailingSession(requests.TooManyRedirects("redirect loop"))
+    with pytest.raises(requests.TooManyRedirects):
+        upstream.request("GET", "https://breaker-test.example/", session=session)
+    assert session.calls == 1  # not worth retrying
+    assert host.breaker.state == "open"
+
+
+def test_connection_errors_are_retried(clock, monkeypatch):
+    monkeypatch.setattr(upstream.time, "sleep", lambda seconds: None)
+    session = FailingSession(requests.ConnectionError("refused"))
+    with pytest.raises(requests.ConnectionError):
+        upstream.request("GET", "https://retry-test.example/", session=session)
+    assert session.calls == upstream.MAX_RETRIES + 1
+    host_stats = upstream.stats()["retry-test.example"]
+    assert (host_stats["requests"], host_stats["errors"], host_stats["retries"]) == (1, 1, upstream.MAX_RETRIES)
+
+
+def test_rate_limiter_spends_burst_then_waits(clock, monkeypatch):
+    def sleep(seconds):
+        clock.now += seconds
+
+    monkeypatch.setattr(upstream.time, "sleep", sleep)
+    limiter = upstream.RateLimiter(rate=2.0, burst=2)
+    assert limiter.acquire() == 0.0
+    assert limiter.acquire() == 0.0
+    assert limiter.acquire() == pytest.approx(0.5)
+
+
+def test_rate_limiter_backs_off_and_recovers(clock):
+    limiter = upstream.RateLimiter(rate=10.0, burst=5)
+    limiter.slow_down()
+    limiter.slow_down()
+    assert limiter.rate == 2.5
+    for _ in range(100):
+        limiter.slow_down()
+    assert limiter.rate == 10.0 / 32
+    for _ in range(40):
+        limiter.speed_up()
+    assert limiter.rate == 10.0
+
+
+def test_retry_after_pauses_every_caller(clock, monkeypatch):
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr(upstream.time, "sleep", sleep)
+    limiter = upstream.RateLimiter(rate=10.0, burst=5)
+    limiter.slow_down(pause=3.0)
+    limiter.acquire()
+    assert slept[0] == pytest.approx(3.0)
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+import upstream
+
+load_dotenv()
+TWITCH_CLIENT_ID = os.getenv("TWITCH_CLIENT_ID")
+TWITCH_CLIENT_SECRET = os.getenv("TWITCH_CLIENT_SECRET")
+
+TOKEN_URL = "https://id.twitch.tv/oauth2/token"
+HELIX_URL = "https://api.twitch.tv/helix"
+HELIX_BATCH_SIZE = 100
+# Refresh the app token this many seconds before Twitch says it expires
+TOKEN_REFRESH_MARGIN = 300
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class TwitchClient:
+    """Helix client holding one app access token; connections come from upstream's per-host sessions"""
+
+    def __init__(self, client_id=TWITCH_CLIENT_ID, client_secret=TWITCH_CLIENT_SECRET):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self._token = None
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
+        self.request_count = 0
+
+    def access_token(self, force_refresh=False):
+        """Cached app access token, refreshed shortly before expires_in runs out"""
+        with self._token_lock:
+            if force_refresh or not self._token or time.monotonic() >= self._token_expires_at:
+                response = upstream.post(
+                    TOKEN_URL,
+                    data={
+                        "client_id": self.client_id,
+                        "client_secret": self.client_secret,
+                        "grant_type": "client_credentials"
+                    }
+                )
+                self.request_count += 1
+                response.raise_for_status()
+                payload = response.json()
+                self._token = payload.get("access_token")
+                expires_in = payload.get("expires_in", 3600)
+                self._token_expires_at = time.monotonic() + max(0, expires_in - TOKEN_REFRESH_MARGIN)
+            return self._token
+
+    def helix(self, path, params):
+        """GET a Helix endpoint; params is a list of (key, value) pairs so keys may repeat"""
+        for attempt in range(2):
+            headers = {
+                "Client-ID": self.client_id,
+                "Authorization": f"Bearer {self.access_token(force_refresh=attempt > 0)}"
+            }
+            response = upstream.get(f"{HELIX_URL}/{path}", params=params, headers=headers)
+            self.request_count += 1
+            # A revoked or expired token gets one refresh before giving up
+            if response.status_code != 401:
+                break
+        response.raise_for_status()
+        return response.json().get("data", [])
+
+    def get_game_ids(self, game_names):
+        """Map game names to Twitch category ids, 100 names per request"""
+        ids = {}
+        lookup = {name.lower(): name for name in game_names}
+        for batch in chunked(list(dict.fromkeys(game_names)), HELIX_BATCH_SIZE):
+            for game in self.helix("games", [("name", name) for name in batch]):
+                name = lookup.get(game.get("name", "").lower())
+                if name:
+                    ids[name] = game["id"]
+        return ids
+
+    def get_streams(self, game_id, first=2):
+        return self.helix("streams", [("game_id", game_id), ("first", first)])
+
+    def get_users(self, user_ids):
+        """Map user ids to user objects, 100 ids per request"""
+        users = {}
+        for batch in chunked(list(dict.fromkeys(user_ids)), HELIX_BATCH_SIZE):
+            for user in self.helix("users", [("id", user_id) for user_id in batch]):
+                users[user["id"]] = user
+        return users
+
+    def get_videos(self, user_id, first=10):
+        # Helix only accepts a single user_id for /videos, so this one cannot be batched
+        return self.helix("videos", [("user_id", user_id), ("first", first)])
+
+    def get_streamers(self, game_id, first=2):
+        """User ids of the top live streams of a game"""
+        return [stream["user_id"] for stream in self.get_streams(game_id, first=first)]
+
+
+def user_profile(user, videos):
+    """Profile fields of a user and their recent videos, in the fetch_data creator row format"""
+    return {
+        "name": user.get("display_name", "Unknown"),
+        "subscriber_count": 0,
+        "video_count": len(videos),
+        "total_views": sum(v["view_count"] for v in videos),
+    }
+
+
+_client = None
+
+
+def get_client():
+    """Process-wide client, so the token and connections survive across calls"""
+    global _client
+    if _client is None:
+        _client = TwitchClient()
+    return _client
@@ -0,0 +1,356 @@
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+import http_cache
+import metrics
+
+load_dotenv()
+
+# Requests per second and burst size per upstream host. SteamSpy asks for at most one
+# request per second; the Steam store allows roughly 200 appdetails calls per 5 minutes.
+DEFAULT_RATE_LIMITS = {
+    "api.steampowered.com": (20.0, 20),
+    "store.steampowered.com": (200 / 300, 20),
+    "steamspy.com": (1.0, 1),
+    "api.twitch.tv": (10.0, 10),
+    "id.twitch.tv": (1.0, 1),
+    "itch.io": (1.0, 1),
+}
+FALLBACK_RATE_LIMIT = (5.0, 5)
+# Benchmarks point every upstream at a local stub server, e.g. http://127.0.0.1:8900
+UPSTREAM_BASE_URL = os.getenv("UPSTREAM_BASE_URL")
+
+CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "20"))
+POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", "16"))
+MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "30"))
+# Consecutive failed requests that open a host's circuit, and how long it stays open
+BREAKER_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("UPSTREAM_BREAKER_COOLDOWN", "60"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Network errors worth another attempt; anything else from requests fails the call at once
+RETRY_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+# Responses that mean the upstream wants us to slow down
+PUSHBACK_STATUSES = {429, 503}
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised without touching the network while a host's circuit breaker is open"""
+
+
+def _rate_limits_from_env():
+    """Parse UPSTREAM_RATE_LIMITS, e.g. "steamspy.com=1,store.steampowered.com=0.5:10" (rate[:burst])"""
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for item in filter(None, os.getenv("UPSTREAM_RATE_LIMITS", "").split(",")):
+        host, _, spec = item.strip().partition("=")
+        rate, _, burst = spec.partition(":")
+        limits[host] = (float(rate), int(burst) if burst else max(1, int(float(rate))))
+    return limits
+
+
+RATE_LIMITS = _rate_limits_from_env()
+
+
+class RateLimiter:
+    """Token bucket shared by every thread talking to one host.
+
+    The configured rate is a ceiling. Pushback from the host halves the current rate,
+    and every successful request wins a little of it back (AIMD), so a struggling
+    upstream gets breathing room without us guessing its real limit.
+    """
+
+    def __init__(self, rate, burst):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available; returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return waited
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def slow_down(self, pause=0.0):
+        """Multiplicative decrease, plus a pause for every thread when the host sent Retry-After"""
+        with self._lock:
+            self.rate = max(self.max_rate / 32, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            if pause:
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+
+    def speed_up(self):
+        """Additive increase back towards the configured rate"""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class CircuitBreaker:
+    """Per-host breaker: open after BREAKER_THRESHOLD consecutive failures, then let a
+    single trial request through once BREAKER_COOLDOWN has passed"""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.state = "closed"
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record(self, ok):
+        """Returns True when this result opened the circuit"""
+        with self._lock:
+            if ok:
+                self.failures = 0
+                self.state = "closed"
+                return False
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.threshold):
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+
+class Host:
+    """Everything the client keeps per upstream host"""
+
+    def __init__(self, name):
+        self.name = name
+        self.limiter = RateLimiter(*RATE_LIMITS.get(name, FALLBACK_RATE_LIMIT))
+        self.breaker = CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+
+_hosts = {}
+_hosts_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def host_for(name):
+    with _hosts_lock:
+        if name not in _hosts:
+            _hosts[name] = Host(name)
+        return _hosts[name]
+
+
+def _host_stats(host):
+    return _stats.setdefault(host, {"requests": 0, "errors": 0, "seconds": 0.0, "throttled_seconds": 0.0,
+                                    "retries": 0, "pushback": 0, "circuit_opens": 0, "rejected": 0})
+
+
+def _record(host, elapsed, waited, ok, retries=0, pushback=0, opened=False):
+    metrics.UPSTREAM_REQUEST_SECONDS.observe(elapsed, host=host)
+    metrics.UPSTREAM_REQUESTS.inc(host=host, outcome="ok" if ok else "error")
+    if waited:
+        metrics.UPSTREAM_THROTTLE_SECONDS.inc(waited, host=host)
+    if retries:
+        metrics.UPSTREAM_RETRIES.inc(retries, host=host)
+    with _stats_lock:
+        stats = _host_stats(host)
+        stats["requests"] += 1
+        stats["seconds"] += elapsed
+        stats["throttled_seconds"] += waited
+        stats["retries"] += retries
+        stats["pushback"] += pushback
+        stats["circuit_opens"] += int(opened)
+        if not ok:
+            stats["errors"] += 1
+
+
+def _count_rejected(host):
+    metrics.UPSTREAM_REQUESTS.inc(host=host, outcome="circuit_open")
+    with _stats_lock:
+        _host_stats(host)["rejected"] += 1
+
+
+def retry_after(response):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def rewrite_url(url):
+    """https://host/path?query as {UPSTREAM_BASE_URL}/host/path?query when a stub server is configured"""
+    if not UPSTREAM_BASE_URL:
+        return url
+    parsed = urlparse(url)
+    query = f"?{parsed.query}" if parsed.query else ""
+    return f"{UPSTREAM_BASE_URL.rstrip('/')}/{parsed.netloc}{parsed.path}{query}"
+
+
+def request(method, url, session=None, **kwargs):
+    """Issue an HTTP request through the host's pooled keep-alive session.
+
+    Each attempt takes a token from the host's rate budget. 429s, 5xx responses,
+    timeouts, connection errors and truncated bodies are retried up to MAX_RETRIES times, waiting for
+    Retry-After when the host sends one and a jittered backoff otherwise. After
+    BREAKER_THRESHOLD consecutive failures the host's circuit opens, and calls fail fast
+    with CircuitOpenError until the cooldown has passed. The last response is returned
+    whatever its status, and the last network error is re-raised.
+    """
+    name = urlparse(url).hostname
+    host = host_for(name)
+    if not host.breaker.allow():
+        _count_rejected(name)
+        raise CircuitOpenError(f"Circuit open for {name} after repeated failures")
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    session = session or host.session
+
+    waited = 0.0
+    pushback = 0
+    start = time.monotonic()
+    for attempt in range(MAX_RETRIES + 1):
+        waited += host.limiter.acquire()
+        error = None
+        response = None
+        try:
+            response = session.request(method, rewrite_url(url), **kwargs)
+        except requests.RequestException as e:
+            # Every failure has to reach breaker.record below, or a half-open trial is never settled
+            error = e
+            if not isinstance(e, RETRY_ERRORS):
+                break
+        if response is not None and response.status_code not in RETRY_STATUSES:
+            host.limiter.speed_up()
+            break
+        delay = backoff(attempt)
+        if response is not None and response.status_code in PUSHBACK_STATUSES:
+            pushback += 1
+            pause = retry_after(response)
+            host.limiter.slow_down(pause or 0.0)
+            if pause is not None:
+                delay = pause
+        if attempt == MAX_RETRIES or delay > BACKOFF_MAX:
+            break
+        time.sleep(delay)
+
+    ok = response is not None and response.status_code < 500 and response.status_code != 429
+    opened = host.breaker.record(ok)
+    metrics.UPSTREAM_CIRCUIT_OPEN.set(int(host.breaker.state != "closed"), host=name)
+    if opened:
+        print(f"Circuit opened for {name}, failing fast for {BREAKER_COOLDOWN:.0f}s")
+    _record(name, time.monotonic() - start - waited, waited, ok and response.ok, attempt, pushback, opened)
+    if response is None:
+        raise error
+    return response
+
+
+def get(url, **kwargs):
+    """GET through the on-disk HTTP cache when http_cache has a TTL for the URL.
+
+    Fresh entries are served without touching the network or the rate budget; stale ones
+    are revalidated with If-None-Match / If-Modified-Since. Only 200s passing the
+    rule's check are stored, so soft failures are fetched again next time.
+    """
+    cache_key = requests.Request("GET", url, params=kwargs.get("params")).prepare().url
+    ttl = http_cache.ttl_for(cache_key)
+    if ttl <= 0:
+        return request("GET", url, **kwargs)
+
+    cache = http_cache.get_cache()
+    cached = cache.get(cache_key)
+    if cached is not None and not http_cache.cacheable(cache_key, cached[0]):
+        cached = None  # a soft failure stored before its rule had a check
+    if cached is not None and cached[1]:
+        cache.record("hits")
+        return cached[0]
+    if cached is not None:
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers.update(http_cache.conditional_headers(cached[0]))
+        kwargs["headers"] = headers
+
+    response = request("GET", url, **kwargs)
+    if cached is not None and response.status_code == 304:
+        cache.record("revalidated")
+        cache.refresh(cache_key, ttl)
+        return cached[0]
+    cache.record("misses")
+    if http_cache.cacheable(cache_key, response):
+        cache.store(cache_key, response, ttl)
+    return response
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def stats():
+    """Per-host request counts, timings, and current adaptive rate and circuit state"""
+    with _stats_lock:
+        snapshot = {host: dict(values) for host, values in _stats.items()}
+    with _hosts_lock:
+        hosts = dict(_hosts)
+    for name, values in snapshot.items():
+        if name in hosts:
+            values["rate"] = round(hosts[name].limiter.rate, 3)
+            values["circuit"] = hosts[name].breaker.state
+    return snapshot
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def print_stats():
+    for host, values in sorted(stats().items()):
+        print(
+            f"  {host}: {values['requests']} requests, {values['errors']} errors, {values['retries']} retries, "
+            f"{values['seconds']:.1f}s in flight, {values['throttled_seconds']:.1f}s throttled, "
+            f"rate {values.get('rate', 0)}/s, circuit {values.get('circuit', 'closed')}"
+        )
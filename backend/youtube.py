@@ -0,0 +1,125 @@
+import os
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from dotenv import load_dotenv
+from googleapiclient.discovery import build
+
+import upstream
+
+load_dotenv()
+YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
+# Units this process may spend per quota day, and how many of them searches leave for
+# the channels.list calls that fetch the profiles they find
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+YOUTUBE_PROFILE_RESERVE = int(os.getenv("YOUTUBE_PROFILE_RESERVE", "50"))
+# The quota resets at midnight Pacific time
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+CHANNELS_BATCH_SIZE = 50
+# Quota cost per call, from the YouTube Data API v3 quota table (default budget: 10,000/day)
+QUOTA_COSTS = {
+    "search.list": 100,
+    "channels.list": 1,
+}
+
+_local = threading.local()
+_quota_lock = threading.Lock()
+quota = {"units": 0, "calls": {}, "day": None}
+
+
+class QuotaExhausted(Exception):
+    """Raised instead of making a call that would go over YOUTUBE_DAILY_QUOTA"""
+
+
+def get_youtube():
+    """Build the API client once per thread from the discovery document bundled with
+    google-api-python-client, so startup needs no network round trip. The client's
+    httplib2 transport is not thread-safe, hence one per thread."""
+    if getattr(_local, "youtube", None) is None:
+        client_options = None
+        if upstream.UPSTREAM_BASE_URL:
+            client_options = {"api_endpoint": upstream.rewrite_url("https://youtube.googleapis.com/")}
+        _local.youtube = build(
+            "youtube", "v3",
+            developerKey=YOUTUBE_API_KEY,
+            static_discovery=True,
+            cache_discovery=False,
+            client_options=client_options,
+        )
+    return _local.youtube
+
+
+def _roll():
+    today = datetime.now(QUOTA_TIMEZONE).date().isoformat()
+    if quota["day"] != today:
+        quota.update(units=0, calls={}, day=today)
+
+
+def _charge(method, reserve=0):
+    """Count a call against the quota, or raise QuotaExhausted if it would leave fewer
+    than reserve units of the day's quota"""
+    with _quota_lock:
+        _roll()
+        if quota["units"] + QUOTA_COSTS[method] + reserve > YOUTUBE_DAILY_QUOTA:
+            raise QuotaExhausted(f"YouTube quota of {YOUTUBE_DAILY_QUOTA} units reached ({method})")
+        quota["units"] += QUOTA_COSTS[method]
+        quota["calls"][method] = quota["calls"].get(method, 0) + 1
+
+
+def units_left(reserve=0):
+    with _quota_lock:
+        _roll()
+        return max(0, YOUTUBE_DAILY_QUOTA - reserve - quota["units"])
+
+
+def reset_quota():
+    with _quota_lock:
+        quota["units"] = 0
+        quota["calls"] = {}
+
+
+def search_channels(game_name, max_results=2):
+    """Channel ids of the top channel search hits for a game"""
+    _charge("search.list", reserve=YOUTUBE_PROFILE_RESERVE)
+    search_response = get_youtube().search().list(
+        q=game_name,
+        part="snippet",
+        type="channel",
+        maxResults=max_results
+    ).execute()
+    return [item["snippet"]["channelId"] for item in search_response.get("items", [])]
+
+
+def get_channels(channel_ids):
+    """Map channel ids to channel resources, 50 ids per channels.list call"""
+    channels = {}
+    unique_ids = list(dict.fromkeys(channel_ids))
+    for start in range(0, len(unique_ids), CHANNELS_BATCH_SIZE):
+        batch = unique_ids[start:start + CHANNELS_BATCH_SIZE]
+        _charge("channels.list")
+        channel_response = get_youtube().channels().list(
+            part="snippet,statistics",
+            id=",".join(batch),
+            maxResults=CHANNELS_BATCH_SIZE
+        ).execute()
+        for channel in channel_response.get("items", []):
+            channels[channel["id"]] = channel
+    return channels
+
+
+def channel_profile(channel):
+    """Profile fields of a channel resource, in the fetch_data creator row format"""
+    stats = channel.get("statistics", {})
+    return {
+        "name": channel.get("snippet", {}).get("title", "Unknown"),
+        "subscriber_count": int(stats.get("subscriberCount", 0)),
+        "video_count": int(stats.get("videoCount", 0)),
+        "total_views": int(stats.get("viewCount", 0)),
+    }
+
+
+def fetch_profiles(channel_ids):
+    """Map channel ids to profiles; ids the API does not return are left out"""
+    return {channel_id: channel_profile(channel) for channel_id, channel in get_channels(channel_ids).items()}
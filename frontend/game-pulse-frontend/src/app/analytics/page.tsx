@@ -38,12 +38,11 @@ export default function Analytics() {
     const fetchData = async () => {
       try {
         setLoading(true);
-        const [gamesResponse, creatorsResponse] = await Promise.all([
-          axios.get("/api/trending-games?limit=100"),
-          axios.get("/api/top-creators?limit=50")
-        ]);
-        setGames(gamesResponse.data);
-        setCreators(creatorsResponse.data);
+        const { data } = await axios.get(
+          "/api/dashboard?panels=trending_games,top_creators&trending_limit=100&creators_limit=50"
+        );
+        setGames(data.trending_games);
+        setCreators(data.top_creators);
       } catch (error: unknown) {
         setError("Failed to fetch analytics data");
         console.error("Error fetching data:", error);
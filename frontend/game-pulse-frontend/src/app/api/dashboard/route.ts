@@ -0,0 +1,16 @@
+import { NextRequest, NextResponse } from 'next/server';
+
+export async function GET(request: NextRequest) {
+  try {
+    const { searchParams } = new URL(request.url);
+
+    const url = `${process.env.BACKEND_URL || 'https://game-pulse-6y4hoj1ei-mihir-dharaiyas-projects.vercel.app'}/dashboard?${searchParams.toString()}`;
+    const response = await fetch(url);
+    const data = await response.json();
+
+    return NextResponse.json(data);
+  } catch (error) {
+    console.error('Error fetching dashboard:', error);
+    return NextResponse.json({ error: 'Failed to fetch dashboard' }, { status: 500 });
+  }
+}
@@ -66,15 +66,14 @@ export default function Home() {
         setLoading(true);
         const genreParam = selectedGenre ? `&genre=${encodeURIComponent(selectedGenre)}` : "";
         const sourceParam = selectedSource ? `&source=${encodeURIComponent(selectedSource)}` : "";
-        const [gamesResponse, genresResponse, playtimeResponse] = await Promise.all([
-          axios.get(`/api/trending-games?limit=12${genreParam}${sourceParam}`),
-          axios.get("/api/top-genres"),
-          axios.get("/api/playtime-insights")
-        ]);
-        setGames(gamesResponse.data);
-        setFilteredGames(gamesResponse.data);
-        setGenres(genresResponse.data);
-        setPlaytimeInsights(playtimeResponse.data);
+        // One request for all panels, so they always come from the same data snapshot
+        const { data } = await axios.get(
+          `/api/dashboard?panels=trending_games,top_genres,playtime_insights&trending_limit=12${genreParam}${sourceParam}`
+        );
+        setGames(data.trending_games);
+        setFilteredGames(data.trending_games);
+        setGenres(data.top_genres);
+        setPlaytimeInsights(data.playtime_insights);
       } catch (error: unknown) {
         setError("Failed to fetch dashboard data");
         console.error("Error fetching data:", error);